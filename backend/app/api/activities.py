@@ -1,29 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import File, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+from datetime import date, timedelta
+import io
+import json
+from .. import exporter, importer
 from ..crud import activities as crud
 from ..schemas import activities as schemas
-from ..schemas import users as users_schemas
-from ..database import SessionLocal
+from ..schemas import authentication as auth_schemas
+from ..database import SessionLocal, async_engine, get_async_db
+from ..pagination import MAX_PAGE_SIZE
+from ..registry import ActivityTypeRegistry, get_activity_types
+from ..responses import (
+    ORJSONResponse,
+    etag_matches,
+    make_etag,
+    response_fields,
+    serialize_rows,
+)
 from ..api.authentication import authenticate_user, oauth2_scheme
 
 router = APIRouter()
 
-
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+ACTIVITY_FIELDS = response_fields(schemas.Activity)
 
 
 # Dependency to get current active user
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = authenticate_user(db, token)
+    user = await authenticate_user(db, token)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -33,74 +42,369 @@ def get_current_user(
     return user
 
 
+# Filters shared by the listing routes, compiled into one SQL query
+class ActivityFilters:
+    def __init__(
+        self,
+        type: List[str] | None = Query(
+            None, description="Activity type names or ids, repeatable"
+        ),
+        day: date | None = Query(None, alias="date"),
+        date_from: date | None = None,
+        date_to: date | None = Query(None, description="Exclusive"),
+        name_prefix: str | None = None,
+        order: str = Query("desc", regex="^(asc|desc)$"),
+        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str | None = None,
+    ):
+        if day is not None:
+            date_from, date_to = day, day + timedelta(days=1)
+        if date_from and date_to and date_from > date_to:
+            raise HTTPException(
+                status_code=400, detail="date_from must not be after date_to"
+            )
+        self.types = type
+        self.date_from = date_from
+        self.date_to = date_to
+        self.name_prefix = name_prefix
+        self.order = order
+        self.limit = limit
+        self.cursor = cursor
+
+
+# Run the filtered query and return one page of rows, serialized by orjson
+# without per-row pydantic validation. The ETag covers the user's data
+# version and the query, so If-None-Match is answered with 304 from the
+# version alone, without querying the activities. The version read here
+# also keys the result cache, so it is read once per request.
+async def list_activities(
+    request: Request,
+    db: AsyncSession,
+    user_id: int,
+    filters: ActivityFilters,
+    types: ActivityTypeRegistry,
+):
+    version = await crud.get_data_version_async(db, user_id)
+    query = sorted(request.query_params.multi_items())
+    etag = make_etag(user_id, version, query)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        type_ids = types.resolve(filters.types) if filters.types else None
+        items, next_cursor = await crud.query_activities_async(
+            db,
+            user_id,
+            type_ids=type_ids,
+            date_from=filters.date_from,
+            date_to=filters.date_to,
+            name_prefix=filters.name_prefix,
+            order=filters.order,
+            limit=filters.limit,
+            cursor=filters.cursor,
+            known_version=version,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return ORJSONResponse(
+        serialize_rows(items, ACTIVITY_FIELDS), headers=headers
+    )
+
+
 # Route to fetch all activities
-@router.get("/activities/", response_model=List[schemas.Activity])
-def get_activities(
-    db: Session = Depends(get_db),
-    current_user: users_schemas.User = Depends(get_current_user),
+@router.get(
+    "/activities/",
+    response_model=List[schemas.Activity],
+    response_class=ORJSONResponse,
+)
+async def get_activities(
+    request: Request,
+    filters: ActivityFilters = Depends(),
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.get_activities(db, current_user.id)
+    return await list_activities(
+        request, db, current_user.id, filters, types
+    )
 
 
 # Route to fetch all activities
-@router.put("/activities/", response_model=List[schemas.Activity])
-def get_activities_params(
-    type: str | None = None,
-    date: str | None = None,
-    db: Session = Depends(get_db),
-    current_user: users_schemas.User = Depends(get_current_user),
-):
-    if type is None and date is None:
-        return crud.get_activities(db, current_user.id)
-    elif type is None:
-        return crud.get_activities_by_date(db, current_user.id, date)
-    elif date is None:
-        return crud.get_activities_by_type(db, current_user.id, type)
-    else:
-        return crud.get_activities_by_time_date(
-            db, current_user.id, type, date
+@router.put(
+    "/activities/",
+    response_model=List[schemas.Activity],
+    response_class=ORJSONResponse,
+)
+async def get_activities_params(
+    request: Request,
+    filters: ActivityFilters = Depends(),
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    return await list_activities(
+        request, db, current_user.id, filters, types
+    )
+
+
+# Route to fetch all activity types, served from the in-memory registry
+@router.get("/activities/types", response_model=List[schemas.ActivityType])
+async def get_activity_types_list(
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+):
+    return types.all()
+
+
+# Route to fetch time totals per activity type and per day
+@router.get("/activities/stats", response_model=schemas.ActivityStats)
+async def get_activity_stats(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(
+            status_code=400, detail="date_from must not be after date_to"
+        )
+    return await crud.get_activity_stats_async(
+        db, current_user.id, date_from, date_to
+    )
+
+
+# Per-item result of a batch request; items that were not found or not
+# valid still report the id they asked for
+def batch_result(
+    index: int, status: int, activity=None, detail=None, id=None
+):
+    return schemas.ActivityBatchResult(
+        index=index,
+        id=activity.id if activity is not None else id,
+        status=status,
+        detail=detail,
+        activity=activity,
+    )
+
+
+# Route to create many activities in one transaction
+@router.post(
+    "/activities/batch/create",
+    response_model=List[schemas.ActivityBatchResult],
+)
+async def create_activities(
+    batch: schemas.ActivityBatchCreate,
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    results = [None] * len(batch.items)
+    valid = []
+    for index, item in enumerate(batch.items):
+        if item.user_id != current_user.id:
+            results[index] = batch_result(
+                index, 403, detail="Activity belongs to another user"
+            )
+        elif types.get(item.type_id) is None:
+            results[index] = batch_result(
+                index, 400, detail="Unknown activity type"
+            )
+        else:
+            valid.append(index)
+    if valid:
+        created = await crud.create_activities_async(
+            db, [batch.items[index] for index in valid]
         )
+        for index, activity in zip(valid, created):
+            results[index] = batch_result(index, 201, activity)
+    return results
+
+
+# Route to partially update many activities in one transaction
+@router.post(
+    "/activities/batch/update",
+    response_model=List[schemas.ActivityBatchResult],
+)
+async def update_activities(
+    batch: schemas.ActivityBatchUpdate,
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    results = [None] * len(batch.items)
+    valid = []
+    for index, patch in enumerate(batch.items):
+        if patch.type_id is not None and types.get(patch.type_id) is None:
+            results[index] = batch_result(
+                index, 400, detail="Unknown activity type", id=patch.id
+            )
+        else:
+            valid.append(index)
+    updated = {}
+    if valid:
+        updated = await crud.update_activities_async(
+            db, current_user.id, [batch.items[index] for index in valid]
+        )
+    for index in valid:
+        activity = updated.get(batch.items[index].id)
+        if activity is None:
+            results[index] = batch_result(
+                index,
+                404,
+                detail="Activity not found",
+                id=batch.items[index].id,
+            )
+        else:
+            results[index] = batch_result(index, 200, activity)
+    return results
+
+
+# Route to delete many activities in one transaction
+@router.post(
+    "/activities/batch/delete",
+    response_model=List[schemas.ActivityBatchResult],
+)
+async def delete_activities(
+    batch: schemas.ActivityBatchIds,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    deleted = await crud.delete_activities_async(
+        db, current_user.id, batch.ids
+    )
+    return [
+        batch_result(index, 200, id=activity_id)
+        if activity_id in deleted
+        else batch_result(
+            index, 404, detail="Activity not found", id=activity_id
+        )
+        for index, activity_id in enumerate(batch.ids)
+    ]
+
+
+# Route to fetch many activities by ID with one query
+@router.post(
+    "/activities/batch/get",
+    response_model=List[schemas.ActivityBatchResult],
+)
+async def get_activities_batch(
+    batch: schemas.ActivityBatchIds,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    found = await crud.get_activities_by_ids_async(
+        db, current_user.id, batch.ids
+    )
+    return [
+        batch_result(index, 200, found[activity_id])
+        if activity_id in found
+        else batch_result(
+            index, 404, detail="Activity not found", id=activity_id
+        )
+        for index, activity_id in enumerate(batch.ids)
+    ]
+
+
+# Route to import activities from a CSV or NDJSON upload. Progress is
+# streamed back as one JSON object per written chunk. The import is a bulk
+# job on the sync engine, so the generator runs in the threadpool.
+@router.post("/activities/import")
+async def import_activities(
+    file: UploadFile = File(...),
+    format: str | None = Query(None, regex="^(csv|ndjson)$"),
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    format = format or importer.detect_format(file.filename)
+    if format is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Unknown file format, pass format=csv or format=ndjson",
+        )
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    type_ids = {type_.id for type_ in types.all()}
+
+    def progress():
+        db = SessionLocal()
+        try:
+            for report in importer.import_activities(
+                db, current_user.id, stream, format, type_ids
+            ):
+                yield json.dumps(report) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+# Route to export all activities of the user, streamed from a server-side
+# cursor so memory does not grow with the history size
+@router.get("/activities/export")
+async def export_activities(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
+):
+    return StreamingResponse(
+        exporter.stream_activities(async_engine, current_user.id, format),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="activities.{format}"'
+            )
+        },
+    )
 
 
 # Route to fetch a single activity by ID
 @router.get("/activities/{activity_id}", response_model=schemas.Activity)
-def get_activity(
+async def get_activity(
     activity_id: int,
-    db: Session = Depends(get_db),
-    current_user: users_schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    activity = crud.get_activity(db, activity_id)
+    activity = await crud.get_activity_async(db, activity_id)
     if activity is None:
         raise HTTPException(status_code=404, detail="Activity not found")
     return activity
 
 
+# Reject activity types that do not exist
+def validate_type(types: ActivityTypeRegistry, type_id: int):
+    if types.get(type_id) is None:
+        raise HTTPException(status_code=400, detail="Unknown activity type")
+
+
 # Route to create a new activity
 @router.post("/activities/", response_model=schemas.Activity)
-def create_activity(
+async def create_activity(
     activity: schemas.ActivityCreate,
-    db: Session = Depends(get_db),
-    current_user: users_schemas.User = Depends(get_current_user),
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.create_activity(db, activity)
+    validate_type(types, activity.type_id)
+    return await crud.create_activity_async(db, activity)
 
 
 # Route to update an existing activity
 @router.put("/activities/{activity_id}", response_model=schemas.Activity)
-def update_activity(
+async def update_activity(
     activity_id: int,
     activity: schemas.ActivityUpdate,
-    db: Session = Depends(get_db),
-    current_user: users_schemas.User = Depends(get_current_user),
+    types: ActivityTypeRegistry = Depends(get_activity_types),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.update_activity(db, activity_id, activity)
+    validate_type(types, activity.type_id)
+    return await crud.update_activity_async(db, activity_id, activity)
 
 
 # Route to delete an activity
 @router.delete("/activities/{activity_id}")
-def delete_activity(
+async def delete_activity(
     activity_id: int,
-    db: Session = Depends(get_db),
-    current_user: users_schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.delete_activity(db, activity_id)
+    return await crud.delete_activity_async(db, activity_id)
@@ -1,53 +1,89 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..crud import authentication as crud_auth
-from ..crud import users as crud_users
+from ..hashing import PasswordHasherBusy
 from ..schemas import authentication as schemas_auth
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # Route to fetch all activities
+# bcrypt runs in the password hashing process pool and is awaited, so a
+# login burst does not block the event loop
 @router.post("/login", response_model=schemas_auth.Token)
 async def create_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    db = SessionLocal()
-    user = crud_auth.get_user_username_password(
-        db, form_data.username, form_data.password
-    )
+    try:
+        user = await crud_auth.get_user_username_password_async(
+            db, form_data.username, form_data.password
+        )
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many login attempts in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = crud_auth.create_access_token(data={"sub": user.username})
-    client_id = crud_users.get_user_by_username(db, user.username).id
+    access_token = crud_auth.create_user_access_token(user)
+    refresh_token = await crud_auth.create_refresh_token_async(db, user.id)
     return schemas_auth.Token(
-        access_token=access_token, token_type="bearer", client_id=client_id
+        access_token=access_token,
+        token_type="bearer",
+        client_id=user.id,
+        refresh_token=refresh_token,
     )  # # nosec B106
 
 
-def authenticate_user(db: Session, token: str):
-    try:
-        username = crud_auth.get_username_from_token(token)
-        if username is None:
-            return None
+# Route to exchange a refresh token for a new access token. No bcrypt here:
+# the refresh token is a random string looked up by its HMAC
+@router.post("/token/refresh", response_model=schemas_auth.Token)
+async def refresh_access_token(
+    request: schemas_auth.RefreshRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rotated = await crud_auth.rotate_refresh_token_async(
+        db, request.refresh_token
+    )
+    if rotated is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token = rotated
+    return schemas_auth.Token(
+        access_token=crud_auth.create_user_access_token(user),
+        token_type="bearer",
+        client_id=user.id,
+        refresh_token=refresh_token,
+    )  # # nosec B106
 
-        return crud_users.get_user_by_username(db, username)
+
+# Route to revoke a refresh token (logout)
+@router.post("/logout")
+async def logout(
+    request: schemas_auth.RefreshRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await crud_auth.revoke_refresh_token_async(db, request.refresh_token)
+    return {"message": "Logged out"}
+
+
+async def authenticate_user(
+    db: AsyncSession, token: str
+) -> schemas_auth.Principal | None:
+    try:
+        return await crud_auth.get_principal_from_token_async(db, token)
     except Exception as e:
         print(f"Error authenticating user: {e}")
         return None
@@ -1,9 +1,37 @@
 from fastapi import APIRouter
+from ..cache import result_cache
+from ..database import database_status
+from ..hashing import hasher
+from ..middleware.leaks import leak_detector
+from ..middleware.queries import query_tracer
 
 router = APIRouter()
 
 
 # Healthcheck
 @router.get("/healthz")
-def healthz():
+async def healthz():
     return {"service": "Activity Tracker", "status": "ok"}
+
+
+# Password hashing pool: queue depth and hash latency
+@router.get("/healthz/hashing")
+async def healthz_hashing():
+    return hasher.stats()
+
+
+# Database connection pool: active settings, connections in use,
+# connections leaked by requests, slow and repeated queries
+@router.get("/healthz/db")
+async def healthz_db():
+    return {
+        **database_status(),
+        "leaks": leak_detector.stats(),
+        "queries": query_tracer.stats(),
+    }
+
+
+# Result cache for activity listings and stats: hits, misses, evictions
+@router.get("/healthz/cache")
+async def healthz_cache():
+    return result_cache.stats()
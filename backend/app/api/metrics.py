@@ -0,0 +1,90 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from .. import metrics
+from ..cache import result_cache
+from ..database import async_engine, engine, pool_stats
+from ..hashing import hasher
+from ..middleware.leaks import leak_detector
+
+router = APIRouter()
+
+# Starlette appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+ENGINES = {"sync": engine, "async": async_engine.sync_engine}
+
+
+# Live pool counters of both engines, read on every scrape
+def pool_values(name: str):
+    def collect():
+        values = {}
+        for label, pool_engine in ENGINES.items():
+            stats = pool_stats(pool_engine)
+            if name in stats:
+                values[(label,)] = stats[name]
+        return values
+
+    return collect
+
+
+metrics.CallbackMetric(
+    metrics.registry,
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ("engine",),
+    pool_values("checkedout"),
+)
+metrics.CallbackMetric(
+    metrics.registry,
+    "db_pool_size",
+    "Configured number of persistent pool connections.",
+    ("engine",),
+    pool_values("size"),
+)
+metrics.CallbackMetric(
+    metrics.registry,
+    "db_pool_checked_in",
+    "Idle connections kept open in the pool.",
+    ("engine",),
+    pool_values("checkedin"),
+)
+metrics.CallbackMetric(
+    metrics.registry,
+    "db_connections_leaked_total",
+    "Connections still checked out when their request ended.",
+    (),
+    lambda: {(): leak_detector.stats()["leaked"]},
+    type="counter",
+)
+metrics.CallbackMetric(
+    metrics.registry,
+    "password_hash_queue_depth",
+    "Password hashing jobs waiting for a worker.",
+    (),
+    lambda: {(): hasher.stats()["queue_depth"]},
+)
+metrics.CallbackMetric(
+    metrics.registry,
+    "password_hash_rejected_total",
+    "Password hashing jobs rejected because the queue was full.",
+    (),
+    lambda: {(): hasher.stats()["rejected"]},
+    type="counter",
+)
+metrics.CallbackMetric(
+    metrics.registry,
+    "result_cache_events_total",
+    "Result cache lookups and evictions.",
+    ("event",),
+    lambda: {
+        (event,): result_cache.stats().get(event, 0)
+        for event in ("hits", "misses", "evictions")
+    },
+    type="counter",
+)
+
+
+# Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.registry.render(), media_type=CONTENT_TYPE)
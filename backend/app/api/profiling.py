@@ -0,0 +1,50 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from ..config import PROFILE_MAX_SECONDS
+from ..profiling import StackSampler, check_token, profile_store, render
+
+
+# Dependency: the profiling token from X-Profile-Token
+async def require_profiling_token(
+    x_profile_token: str | None = Header(None),
+):
+    if not check_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling not allowed")
+
+
+router = APIRouter(
+    prefix="/admin",
+    dependencies=[Depends(require_profiling_token)],
+    include_in_schema=False,
+)
+
+
+# Profile the whole app for a time window and return the collapsed stacks;
+# a copy is kept in the profile store
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_app(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+):
+    sampler = StackSampler().start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        counts = sampler.stop()
+    name = profile_store.save(profile_store.new_name("app"), counts)
+    return PlainTextResponse(render(counts), headers={"X-Profile-Id": name})
+
+
+# Stored profiles, newest first
+@router.get("/profiles")
+async def list_profiles():
+    return profile_store.list()
+
+
+@router.get("/profiles/{name}", response_class=PlainTextResponse)
+async def get_profile(name: str):
+    profile = profile_store.read(name)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile)
@@ -1,28 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from ..crud import users as crud
+from ..crud import authentication as crud_auth
+from ..hashing import PasswordHasherBusy
 from ..schemas import users as schemas
-from ..database import SessionLocal
+from ..schemas import authentication as auth_schemas
+from ..database import get_async_db
 from ..api.authentication import authenticate_user, oauth2_scheme
 
 router = APIRouter()
 
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # Dependency to get current active user
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = authenticate_user(db, token)
+    user = await authenticate_user(db, token)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -34,21 +29,21 @@ def get_current_user(
 
 # Route to fetch all users
 @router.get("/users/", response_model=List[schemas.User])
-def get_users(
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user),
+async def get_users(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.get_users(db)
+    return await crud.get_users_async(db)
 
 
 # Route to fetch a single user by ID
 @router.get("/users/{user_id}", response_model=schemas.User)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    user = crud.get_user(db, user_id)
+    user = await crud.get_user_async(db, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -56,36 +51,50 @@ def get_user(
 
 # Route to create a new user
 @router.post("/users/", response_model=schemas.User)
-def create_user(
-    user: schemas.UserCreate, db: Session = Depends(get_db)
-):  # current_user: schemas.User = Depends(get_current_user)
+async def create_user(
+    user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)
+):  # current_user: auth_schemas.Principal = Depends(get_current_user)
     if not crud.validate_email(user.email):
         raise HTTPException(status_code=400, detail="Invalid email address")
     # Проверяем, существует ли пользователь с таким адресом электронной почты
-    existing_user = crud.get_user_by_email(db, user.email)
+    existing_user = await crud.get_user_by_email_async(db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Создаем нового пользователя
-    return crud.create_user(db, user)
+    try:
+        return await crud.create_user_async(db, user)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many registrations in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
 
 
 # Route to update an existing user
 @router.put("/users/{user_id}", response_model=schemas.User)
-def update_user(
+async def update_user(
     user_id: int,
     user: schemas.UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.update_user(db, user_id, user)
+    updated_user = await crud.update_user_async(db, user_id, user)
+    await crud_auth.revoke_user_tokens_async(db, user_id)
+    await crud_auth.revoke_user_refresh_tokens_async(db, user_id)
+    return updated_user
 
 
 # Route to delete a user
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth_schemas.Principal = Depends(get_current_user),
 ):
-    return crud.delete_user(db, user_id)
+    # Tokens of a deleted user stop working with the row; only the cached
+    # version has to go
+    result = await crud.delete_user_async(db, user_id)
+    crud_auth.token_versions.forget(user_id)
+    return result
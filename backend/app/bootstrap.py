@@ -0,0 +1,168 @@
+"""Database preparation, run once per process before serving.
+
+Nothing touches the database at import time. ``prepare_database`` creates
+missing tables, applies pending migrations and seeds the activity types.
+The seed is one bulk upsert and is skipped entirely while the stored seed
+version matches ``SEED_VERSION``, so a warm start costs a single query and
+workers booting together cannot insert the types twice. Bump
+``SEED_VERSION`` after changing ``ACTIVITY_TYPES``.
+
+Every worker prepares the database on start, so the whole preparation runs
+under a lock shared between processes: a Postgres advisory lock, or an
+exclusive ``flock`` on a ``.lock`` file next to a SQLite database. The
+first worker migrates; the others wait, then find nothing left to do.
+"""
+
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import Column, Integer, MetaData, Table, select, text
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from . import migrations, models
+from .crud.activities import UPSERT_DIALECTS
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+SEED_VERSION = 1
+
+# Postgres advisory lock key held while a worker prepares the database
+PREPARE_LOCK_KEY = 0x7472616B
+
+base_path = "https://raw.githubusercontent.com/Wild-Queue/inno-trackify-icons"
+
+ACTIVITY_TYPES = [
+    {
+        "id": 1,
+        "name": "Sport",
+        "icon_name": f"{base_path}/main/Sport.jpg",
+    },
+    {
+        "id": 2,
+        "name": "Health",
+        "icon_name": f"{base_path}/main/Health.jpg",
+    },
+    {
+        "id": 3,
+        "name": "Sleep",
+        "icon_name": f"{base_path}/main/Sleep.jpg",
+    },
+    {
+        "id": 4,
+        "name": "Study",
+        "icon_name": f"{base_path}/main/Study.jpg",
+    },
+    {
+        "id": 5,
+        "name": "Rest",
+        "icon_name": f"{base_path}/main/Rest.jpg",
+    },
+    {
+        "id": 6,
+        "name": "Eat",
+        "icon_name": f"{base_path}/main/Eat.jpg",
+    },
+    {
+        "id": 7,
+        "name": "Coding",
+        "icon_name": f"{base_path}/main/Coding.jpg",
+    },
+    {
+        "id": 8,
+        "name": "Other",
+        "icon_name": f"{base_path}/main/Other.jpg",
+    },
+]
+
+metadata = MetaData()
+
+seed_version = Table(
+    "Seed_Version",
+    metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+def get_seed_version(engine) -> int:
+    with engine.connect() as conn:
+        version = conn.execute(select(seed_version.c.version)).scalar()
+    return version or 0
+
+
+def _upsert_activity_types(conn):
+    table = models.ActivityType.__table__
+    dialect = conn.dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        existing = set(conn.execute(select(table.c.id)).scalars())
+        for row in ACTIVITY_TYPES:
+            if row["id"] in existing:
+                conn.execute(
+                    table.update().where(table.c.id == row["id"]).values(row)
+                )
+            else:
+                conn.execute(table.insert().values(row))
+        return
+    stmt = UPSERT_DIALECTS[dialect](table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={
+            "name": stmt.excluded.name,
+            "icon_name": stmt.excluded.icon_name,
+        },
+    )
+    conn.execute(stmt, ACTIVITY_TYPES)
+
+
+# Заполнение справочника типов активностей, если версия данных устарела.
+# Возвращает True, если справочник был обновлён.
+def seed_activity_types(engine) -> bool:
+    metadata.create_all(bind=engine)
+    if get_seed_version(engine) == SEED_VERSION:
+        return False
+    with engine.begin() as conn:
+        _upsert_activity_types(conn)
+        conn.execute(seed_version.delete())
+        conn.execute(seed_version.insert().values(version=SEED_VERSION))
+    registry.invalidate()
+    logger.info("Seeded activity types (seed version %s)", SEED_VERSION)
+    return True
+
+
+# Блокировка подготовки базы данных, общая для всех процессов
+@contextmanager
+def prepare_lock(engine):
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            params = {"key": PREPARE_LOCK_KEY}
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), params)
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), params)
+        return
+    path = engine.url.database
+    # In-memory databases belong to one process
+    in_memory = path in (None, "", ":memory:")
+    if engine.dialect.name != "sqlite" or in_memory or fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Создание недостающих таблиц, миграции и начальные данные
+def prepare_database(engine) -> int:
+    with prepare_lock(engine):
+        models.Base.metadata.create_all(bind=engine)
+        version = migrations.upgrade(engine)
+        seed_activity_types(engine)
+    return version
@@ -0,0 +1,269 @@
+"""Result cache for the activity read queries.
+
+Listings and stats are recomputed for the same user and filters by every
+tab and worker. ``ResultCache.cached`` wraps a crud read function taking
+``(db, user_id, ...)`` and keys its results by the function, the arguments
+and the user's data version (``crud.activities.get_data_version``). Every
+write bumps that version, so it invalidates exactly the writing user's
+entries; the stale ones are never read again and age out of the LRU.
+
+Two backends are available: ``MemoryBackend``, an LRU with a TTL private to
+the process (the default), and ``SQLiteBackend``, a file shared by all
+workers on a host, opt-in with ``RESULT_CACHE_BACKEND=sqlite``. The file
+holds JSON written with orjson, never pickles, and its directory must be
+private to the app's user. The cached reads run on the event loop through
+``run_sync``, so the file is only waited on briefly: a write lock held by
+another worker turns the lookup into a miss. ``RESULT_CACHE_BACKEND=none``
+turns caching off.
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+
+from .config import (
+    RESULT_CACHE_BACKEND,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+)
+
+MISSING = object()
+
+
+# Строковый ключ кэша: функция, пользователь, версия данных и аргументы
+def make_key(name: str, user_id: int, version: int, args, kwargs) -> str:
+    return repr((name, user_id, version, args, sorted(kwargs.items())))
+
+
+class MemoryBackend:
+    # Values are kept as the objects themselves
+    serialized = False
+
+    def __init__(self, max_entries: int, ttl: float, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING, 0
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return MISSING, 1
+        self._entries.move_to_end(key)
+        return value, 0
+
+    # Returns the number of entries evicted to make room
+    def set(self, key: str, value) -> int:
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Каталог, доступный только текущему пользователю (создаётся с правами 0700)
+def private_directory(path: str):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ValueError(
+            f"Result cache directory {path} must belong to this user"
+            " and have mode 0700"
+        )
+
+
+# Values are JSON bytes encoded by ResultCache
+class SQLiteBackend:
+    serialized = True
+
+    # Seconds to wait for another worker's write lock before giving up
+    busy_timeout = 0.05
+
+    def __init__(
+        self, path: str, max_entries: int, ttl: float, clock=time.time
+    ):
+        private_directory(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._conn = sqlite3.connect(
+            path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_result_cache_used_at"
+            " ON result_cache (used_at)"
+        )
+
+    # A busy or locked file counts as a miss rather than stalling the loop
+    def get(self, key: str):
+        try:
+            return self._get(key)
+        except sqlite3.OperationalError:
+            return MISSING, 0
+
+    def _get(self, key: str):
+        now = self._clock()
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return MISSING, 0
+        if row[1] <= now:
+            self._conn.execute(
+                "DELETE FROM result_cache WHERE key = ?", (key,)
+            )
+            return MISSING, 1
+        self._conn.execute(
+            "UPDATE result_cache SET used_at = ? WHERE key = ?", (now, key)
+        )
+        return row[0], 0
+
+    def set(self, key: str, value: bytes) -> int:
+        try:
+            return self._set(key, value)
+        except sqlite3.OperationalError:
+            return 0
+
+    def _set(self, key: str, blob: bytes) -> int:
+        now = self._clock()
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache VALUES (?, ?, ?, ?)",
+                (key, blob, now + self.ttl, now),
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM result_cache WHERE key IN (SELECT key"
+                " FROM result_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return evicted
+
+    def clear(self):
+        self._conn.execute("DELETE FROM result_cache")
+
+    def __len__(self) -> int:
+        return self._conn.execute(
+            "SELECT count(*) FROM result_cache"
+        ).fetchone()[0]
+
+
+class ResultCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # dump turns a value into JSON-compatible data and load turns it back;
+    # they are only used by backends that store serialized values
+    def get_or_compute(self, key: str, compute, dump=None, load=None):
+        if self.backend is None:
+            return compute()
+        with self._lock:
+            value, expired = self.backend.get(key)
+            self._evictions += expired
+            if value is not MISSING:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if value is not MISSING:
+            if self.backend.serialized:
+                data = orjson.loads(value)
+                value = load(data) if load else data
+            return value
+        # Computed outside the lock; concurrent misses may both compute
+        value = compute()
+        stored = value
+        if self.backend.serialized:
+            stored = orjson.dumps(dump(value) if dump else value)
+        with self._lock:
+            self._evictions += self.backend.set(key, stored)
+        return value
+
+    # Кэширующая обёртка для функции чтения вида function(db, user_id, ...).
+    # version(db, user_id) - текущая версия данных пользователя; вызывающий
+    # код, который уже прочитал версию, передаёт её как known_version.
+    # dump и load переводят результат в JSON-совместимые данные и обратно.
+    def cached(self, function, version, dump=None, load=None):
+        @functools.wraps(function)
+        def wrapper(db, user_id, *args, known_version=None, **kwargs):
+            if known_version is None:
+                known_version = version(db, user_id)
+            key = make_key(
+                function.__qualname__,
+                user_id,
+                known_version,
+                args,
+                kwargs,
+            )
+            return self.get_or_compute(
+                key,
+                lambda: function(db, user_id, *args, **kwargs),
+                dump,
+                load,
+            )
+
+        return wrapper
+
+    def clear(self):
+        if self.backend is None:
+            return
+        with self._lock:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        if self.backend is None:
+            return {"backend": None}
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+def make_backend(name: str):
+    if name == "memory":
+        return MemoryBackend(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+    if name == "sqlite":
+        return SQLiteBackend(
+            RESULT_CACHE_PATH, RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+        )
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown result cache backend: {name}")
+
+
+result_cache = ResultCache(make_backend(RESULT_CACHE_BACKEND))
@@ -0,0 +1,79 @@
+"""Maintenance commands.
+
+Run from the ``backend`` directory, e.g. ``python -m app.cli migrate``.
+"""
+
+import argparse
+import json
+
+from . import importer
+from .bootstrap import prepare_database
+from .crud import activities as crud_activities
+from .database import engine, SessionLocal
+from .registry import registry
+
+
+def migrate(args):
+    version = prepare_database(engine)
+    print(f"Database schema is at version {version}")
+
+
+def rebuild_rollups(args):
+    db = SessionLocal()
+    try:
+        crud_activities.rebuild_rollups(db, args.user_id)
+    finally:
+        db.close()
+    target = "all users" if args.user_id is None else f"user {args.user_id}"
+    print(f"Daily rollups rebuilt for {target}")
+
+
+def import_activities(args):
+    format = args.format or importer.detect_format(args.path)
+    if format is None:
+        raise SystemExit("Unknown file format, pass --format csv or ndjson")
+    db = SessionLocal()
+    try:
+        registry.load(db)
+        type_ids = {type_.id for type_ in registry.all()}
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            for report in importer.import_activities(
+                db, args.user_id, stream, format, type_ids, args.chunk_size
+            ):
+                print(json.dumps(report), flush=True)
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser(
+        "migrate", help="Create tables, apply migrations and seed data"
+    )
+    migrate_parser.set_defaults(handler=migrate)
+
+    rollups_parser = commands.add_parser(
+        "rebuild-rollups", help="Recompute daily activity rollups"
+    )
+    rollups_parser.add_argument("--user-id", type=int, default=None)
+    rollups_parser.set_defaults(handler=rebuild_rollups)
+
+    import_parser = commands.add_parser(
+        "import", help="Import activities of a user from CSV or NDJSON"
+    )
+    import_parser.add_argument("path")
+    import_parser.add_argument("--user-id", type=int, required=True)
+    import_parser.add_argument("--format", choices=importer.FORMATS)
+    import_parser.add_argument(
+        "--chunk-size", type=int, default=importer.CHUNK_SIZE
+    )
+    import_parser.set_defaults(handler=import_activities)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,98 @@
 import os
+import tempfile
 
 SECRET_KEY = os.environ.get(
     "SECRET_KEY",
     "dev_security_key",
 )
 ALGORITHM = os.environ.get("ALGORITHM", "HS256")
-EXPIRE_TIME_MINUTES = os.environ.get("EXPIRE_TIME_MINUTES", 15)
+EXPIRE_TIME_MINUTES = int(os.environ.get("EXPIRE_TIME_MINUTES", 15))
+REFRESH_EXPIRE_DAYS = int(os.environ.get("REFRESH_EXPIRE_DAYS", 30))
+# Seconds a user's token version is cached per worker. A worker drops its
+# copy when it revokes tokens itself; a revocation made by another worker
+# reaches it at most this late.
+TOKEN_VERSION_TTL = float(os.environ.get("TOKEN_VERSION_TTL", 30))
 SQLALCHEMY_DATABASE_URL = os.environ.get(
     "SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db"
 )
+# Same database for the async driver; derived from the URL above if unset
+SQLALCHEMY_ASYNC_DATABASE_URL = os.environ.get("SQLALCHEMY_ASYNC_DATABASE_URL")
+
+# Connection pool: persistent connections, extra ones allowed under load,
+# seconds to wait for a free one, seconds before a connection is replaced
+# and whether to test connections on checkout (Postgres only)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# SQLite pragmas applied to every new connection. WAL lets readers run
+# alongside a writer, busy_timeout (ms) waits for a lock instead of failing
+# with "database is locked", cache_size < 0 is in KiB.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))
+
+# SQL instrumentation: statements slower than SLOW_QUERY_MS are logged with
+# their query plan; SERVER_TIMING adds each request's query count and
+# database time to its response as a Server-Timing header
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() == "true"
+
+# Profiling, off unless PROFILING_TOKEN is set. A request carrying the token
+# in X-Profile-Token is profiled, as is a random PROFILE_SAMPLE_RATE
+# fraction of all requests; the /admin/profile routes need the token too.
+# Collapsed-stack files go to PROFILE_DIR, the newest PROFILE_KEEP are kept.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 60))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 50))
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "trackify-profiles")
+)
+
+# Password hashing: bcrypt cost factor, worker processes (0 hashes inline
+# in the calling thread) and how many extra requests may wait for a worker
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+)
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", 32))
+
+# Response compression: bodies below the minimum size (bytes) are sent as
+# is. gzip levels run 1-9, zstd levels 1-22. Bodies (or streamed chunks) of
+# the threadpool size or more are compressed in the threadpool, smaller ones
+# on the event loop; gzip level 1 keeps most of the size reduction at a
+# fraction of the CPU of level 6 (see backend/benchmarks/compression.py).
+COMPRESSION_MINIMUM_SIZE = int(
+    os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024)
+)
+COMPRESSION_THREADPOOL_SIZE = int(
+    os.environ.get("COMPRESSION_THREADPOOL_SIZE", 64 * 1024)
+)
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 1))
+ZSTD_LEVEL = int(os.environ.get("ZSTD_LEVEL", 3))
+
+# Result cache for activity listings and stats: "memory" (per process, the
+# default), "sqlite" (a file shared by the workers on a host) or "none".
+# Size is in entries, TTL in seconds. The sqlite file's directory must be
+# private to the app's user; it is created with mode 0700 if missing. A
+# directory under /dev/shm keeps the shared cache in memory.
+RESULT_CACHE_BACKEND = os.environ.get("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 1024))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 300))
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "trackify",
+        "result-cache.db",
+    ),
+)
 
 
 GIT_INFO = ""
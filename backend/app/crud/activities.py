@@ -1,63 +1,301 @@
+from dataclasses import astuple, dataclass, fields
+from datetime import date, datetime
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .. import models
+from ..cache import result_cache
+from ..pagination import paginate
 from ..schemas import activities as schemas
+from ..timeutils import day_bounds, typed_times
 
+# Диалекты с поддержкой INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
 
-# Функция для получения всех активностей
-def get_activities(db: Session, user_id: int):
-    return (
-        db.query(models.Activity)
-        .filter(models.Activity.user_id == user_id)
-        .all()
+
+# Активность только для чтения: столбцы ответа API и ключ сортировки.
+# Строится из строки Core-запроса, без ORM-объекта и identity map.
+# Неизменяема, так как может отдаваться из кэша результатов.
+@dataclass(slots=True, frozen=True)
+class ActivityRecord:
+    id: int
+    name: str
+    type_id: int
+    user_id: int
+    start_time: str
+    end_time: str
+    duration: str
+    description: str
+    started_at: datetime | None
+
+
+RECORD_COLUMNS = tuple(
+    models.Activity.__table__.c[field.name] for field in fields(ActivityRecord)
+)
+
+
+# Функция для получения всех активностей (страница по limit и cursor)
+def get_activities(
+    db: Session,
+    user_id: int,
+    limit: int | None = None,
+    cursor: str | None = None,
+):
+    return query_activities(db, user_id, limit=limit, cursor=cursor)
+
+
+# Функция для поиска активностей по всем фильтрам одним SQL-запросом.
+# Возвращает ActivityRecord и курсор следующей страницы.
+# type_ids - идентификаторы типов, [date_from, date_to) - период.
+def query_activities(
+    db: Session,
+    user_id: int,
+    type_ids: list[int] | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    name_prefix: str | None = None,
+    order: str = "desc",
+    limit: int | None = None,
+    cursor: str | None = None,
+):
+    activity = models.Activity.__table__.c
+    conditions = [activity.user_id == user_id]
+    if type_ids is not None:
+        conditions.append(activity.type_id.in_(type_ids))
+    if date_from is not None:
+        conditions.append(activity.started_at >= day_bounds(date_from)[0])
+    if date_to is not None:
+        conditions.append(activity.started_at < day_bounds(date_to)[0])
+    if name_prefix:
+        conditions.append(
+            activity.name.startswith(name_prefix, autoescape=True)
+        )
+
+    query = select(*RECORD_COLUMNS).where(*conditions)
+    rows, next_cursor = paginate(
+        db, query, activity, limit, cursor, order == "desc"
     )
+    return [ActivityRecord(*row) for row in rows], next_cursor
 
 
-# Функция для получения всех активностей по типу
-def get_activities_by_type(db: Session, user_id: int, type: str):
-    type = (
-        db.query(models.ActivityType)
-        .filter(models.ActivityType.name == type)
-        .first()
+# Заполнение типизированных полей времени из строковых
+def set_typed_times(db_activity: models.Activity):
+    values = typed_times(
+        db_activity.start_time, db_activity.end_time, db_activity.duration
     )
-    return (
-        db.query(models.Activity)
-        .filter(
-            models.Activity.type_id == type.id and models.Activity.user_id == user_id
-        )
+    for key, value in values.items():
+        setattr(db_activity, key, value)
+
+
+# Функция для получения статистики активностей за период [date_from, date_to)
+def get_activity_stats(
+    db: Session,
+    user_id: int,
+    date_from: date | None = None,
+    date_to: date | None = None,
+):
+    rollup = models.DailyActivityRollup
+    filters = [rollup.user_id == user_id, rollup.count > 0]
+    if date_from is not None:
+        filters.append(rollup.day >= date_from)
+    if date_to is not None:
+        filters.append(rollup.day < date_to)
+
+    total_seconds = func.sum(rollup.total_seconds)
+    activity_count = func.sum(rollup.count)
+    by_type = (
+        db.query(rollup.type_id, total_seconds, activity_count)
+        .filter(*filters)
+        .group_by(rollup.type_id)
+        .order_by(rollup.type_id)
+        .all()
+    )
+    by_day = (
+        db.query(rollup.day, total_seconds, activity_count)
+        .filter(*filters)
+        .group_by(rollup.day)
+        .order_by(rollup.day)
         .all()
     )
 
+    return schemas.ActivityStats(
+        date_from=date_from,
+        date_to=date_to,
+        total_seconds=sum(row[1] for row in by_type),
+        count=sum(row[2] for row in by_type),
+        by_type=[
+            schemas.ActivityTypeTotal(
+                type_id=type_id,
+                total_seconds=seconds,
+                count=count,
+                average_seconds=seconds / count,
+            )
+            for type_id, seconds, count in by_type
+        ],
+        by_day=[
+            schemas.ActivityDayTotal(
+                day=day, total_seconds=seconds, count=count
+            )
+            for day, seconds, count in by_day
+        ],
+    )
 
-# Функция для получения всех активностей по дате
-def get_activities_by_date(db: Session, user_id: int, date: str):
+
+# Ключ дневной сводки для активности (None, если активность без даты)
+def _rollup_key(db_activity: models.Activity):
+    key = (db_activity.user_id, db_activity.started_at, db_activity.type_id)
+    if None in key:
+        return None
     return (
-        db.query(models.Activity)
-        .filter(
-            models.Activity.start_time.contains(date) & models.Activity.user_id == user_id
-        )
-        .all()
+        db_activity.user_id,
+        db_activity.started_at.date(),
+        db_activity.type_id,
     )
 
 
-# Функция для получения всех активностей по типу и дате
-def get_activities_by_time_date(
-    db: Session, user_id: int, type_: str, date: str
-):
-    type_ = (
-        db.query(models.ActivityType)
-        .filter(models.ActivityType.name == type_)
-        .first()
+# Учёт вклада активности в дневные сводки (sign = 1 или -1)
+def add_rollup_delta(deltas: dict, db_activity: models.Activity, sign: int):
+    key = _rollup_key(db_activity)
+    if key is None:
+        return
+    seconds, count = deltas.get(key, (0, 0))
+    deltas[key] = (
+        seconds + sign * (db_activity.duration_seconds or 0),
+        count + sign,
     )
 
-    return (
-        db.query(models.Activity)
-        .filter(
-            models.Activity.start_time.contains(date),
-            models.Activity.user_id == user_id,
-            models.Activity.type_id == type_.id,
+
+# Применение накопленных изменений к дневным сводкам в текущей транзакции
+def apply_rollup_deltas(db: Session, deltas: dict):
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    rollup = models.DailyActivityRollup
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        for (user_id, day, type_id), (seconds, count) in deltas.items():
+            row = db.get(rollup, (user_id, day, type_id))
+            if row is None:
+                row = rollup(
+                    user_id=user_id,
+                    day=day,
+                    type_id=type_id,
+                    total_seconds=0,
+                    count=0,
+                )
+                db.add(row)
+            row.total_seconds += seconds
+            row.count += count
+        db.flush()
+        return
+
+    stmt = UPSERT_DIALECTS[dialect](rollup.__table__)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day", "type_id"],
+        set_={
+            "total_seconds": rollup.total_seconds + excluded.total_seconds,
+            "count": rollup.count + excluded.count,
+        },
+    )
+    db.execute(
+        stmt,
+        [
+            {
+                "user_id": user_id,
+                "day": day,
+                "type_id": type_id,
+                "total_seconds": seconds,
+                "count": count,
+            }
+            for (user_id, day, type_id), (seconds, count) in deltas.items()
+        ],
+    )
+
+
+# Функция для получения версии данных пользователя (0, если записей не было)
+def get_data_version(db: Session, user_id: int) -> int:
+    version = models.UserDataVersion
+    query = select(version.version).where(version.user_id == user_id)
+    return db.execute(query).scalar() or 0
+
+
+# Увеличение версий данных пользователей в текущей транзакции
+def bump_data_versions(db: Session, user_ids):
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return
+    version = models.UserDataVersion
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        for user_id in user_ids:
+            row = db.get(version, user_id)
+            if row is None:
+                row = version(user_id=user_id, version=0)
+                db.add(row)
+            row.version += 1
+        db.flush()
+        return
+
+    stmt = UPSERT_DIALECTS[dialect](version.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"], set_={"version": version.version + 1}
+    )
+    db.execute(
+        stmt, [{"user_id": user_id, "version": 1} for user_id in user_ids]
+    )
+
+
+# Пересчёт дневных сводок по таблице активностей (для одного или всех).
+# Версии данных затронутых пользователей увеличиваются в той же транзакции,
+# чтобы кэшированная статистика и ETag не пережили пересчёт.
+def rebuild_rollups(
+    db: Session, user_id: int | None = None, bump_versions: bool = True
+):
+    rollup = models.DailyActivityRollup.__table__
+    activity = models.Activity
+    if bump_versions:
+        if user_id is not None:
+            user_ids = {user_id}
+        else:
+            # Users with rollups before the rebuild or with activities
+            user_ids = set(
+                db.execute(select(rollup.c.user_id).distinct()).scalars()
+            )
+            user_ids.update(
+                db.execute(select(activity.user_id).distinct()).scalars()
+            )
+        bump_data_versions(db, user_ids)
+    delete = rollup.delete()
+    if user_id is not None:
+        delete = delete.where(rollup.c.user_id == user_id)
+    db.execute(delete)
+
+    day = func.date(activity.started_at)
+    source = select(
+        activity.user_id,
+        day,
+        activity.type_id,
+        func.coalesce(func.sum(activity.duration_seconds), 0),
+        func.count(activity.id),
+    ).where(
+        activity.user_id.isnot(None),
+        activity.type_id.isnot(None),
+        activity.started_at.isnot(None),
+    )
+    if user_id is not None:
+        source = source.where(activity.user_id == user_id)
+    source = source.group_by(activity.user_id, day, activity.type_id)
+    db.execute(
+        rollup.insert().from_select(
+            ["user_id", "day", "type_id", "total_seconds", "count"], source
         )
-        .all()
     )
+    db.commit()
 
 
 # Функция для получения активности по её идентификатору
@@ -72,7 +310,12 @@ def get_activity(db: Session, activity_id: int):
 # Функция для создания новой активности // TODO
 def create_activity(db: Session, activity: schemas.ActivityCreate):
     db_activity = models.Activity(**activity.dict())
+    set_typed_times(db_activity)
     db.add(db_activity)
+    deltas = {}
+    add_rollup_delta(deltas, db_activity, 1)
+    apply_rollup_deltas(db, deltas)
+    bump_data_versions(db, [db_activity.user_id])
     db.commit()
     db.refresh(db_activity)
     return db_activity
@@ -88,8 +331,13 @@ def update_activity(
         .first()
     )
     if db_activity:
+        deltas = {}
+        add_rollup_delta(deltas, db_activity, -1)
         for key, value in activity.dict().items():
             setattr(db_activity, key, value)
+        add_rollup_delta(deltas, db_activity, 1)
+        apply_rollup_deltas(db, deltas)
+        bump_data_versions(db, [db_activity.user_id])
         db.commit()
         db.refresh(db_activity)
     return db_activity
@@ -103,8 +351,211 @@ def delete_activity(db: Session, activity_id: int):
         .first()
     )
     if db_activity:
+        deltas = {}
+        add_rollup_delta(deltas, db_activity, -1)
+        apply_rollup_deltas(db, deltas)
+        bump_data_versions(db, [db_activity.user_id])
         db.delete(db_activity)
         db.commit()
         return {"message": "Activity deleted successfully"}
     else:
         return {"message": "Activity not found"}
+
+
+# Функция для получения активностей пользователя по списку идентификаторов
+def get_activities_by_ids(db: Session, user_id: int, ids: list[int]):
+    activities = (
+        db.query(models.Activity)
+        .filter(
+            models.Activity.user_id == user_id,
+            models.Activity.id.in_(set(ids)),
+        )
+        .all()
+    )
+    return {activity.id: activity for activity in activities}
+
+
+# Вставка строк одним многострочным INSERT; возвращает их идентификаторы
+# в порядке строк
+def insert_rows(db: Session, table, rows: list[dict]) -> list[int]:
+    statement = insert(table).values(rows)
+    if db.get_bind().dialect.full_returning:
+        # Ids come from the sequence in row order, whatever order RETURNING
+        # lists them in
+        return sorted(db.execute(statement.returning(table.c.id)).scalars())
+    # SQLite holds the write lock for the whole statement and numbers its
+    # rows one after another, so the last rowid gives all of them
+    db.execute(statement)
+    last_id = db.execute(text("SELECT last_insert_rowid()")).scalar()
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+# Функция для создания нескольких активностей одной транзакцией: один INSERT
+# на весь пакет. Возвращает активности с идентификаторами, вне сессии.
+def create_activities(db: Session, activities: list[schemas.ActivityCreate]):
+    table = models.Activity.__table__
+    db_activities = []
+    deltas = {}
+    for activity in activities:
+        db_activity = models.Activity(**activity.dict())
+        set_typed_times(db_activity)
+        add_rollup_delta(deltas, db_activity, 1)
+        db_activities.append(db_activity)
+    rows = [
+        {
+            column.key: getattr(db_activity, column.key)
+            for column in table.columns
+            if column.key != "id"
+        }
+        for db_activity in db_activities
+    ]
+    ids = insert_rows(db, table, rows)
+    for db_activity, activity_id in zip(db_activities, ids):
+        db_activity.id = activity_id
+    apply_rollup_deltas(db, deltas)
+    bump_data_versions(
+        db, [db_activity.user_id for db_activity in db_activities]
+    )
+    db.commit()
+    return db_activities
+
+
+# Функция для частичного обновления нескольких активностей одной транзакцией.
+# Возвращает обновлённые активности по идентификатору; чужие и
+# несуществующие пропускаются.
+def update_activities(
+    db: Session, user_id: int, patches: list[schemas.ActivityPatch]
+):
+    found = get_activities_by_ids(db, user_id, [patch.id for patch in patches])
+    deltas = {}
+    for patch in patches:
+        db_activity = found.get(patch.id)
+        if db_activity is None:
+            continue
+        add_rollup_delta(deltas, db_activity, -1)
+        values = patch.dict(exclude_unset=True, exclude_none=True)
+        values.pop("id")
+        for key, value in values.items():
+            setattr(db_activity, key, value)
+        set_typed_times(db_activity)
+        add_rollup_delta(deltas, db_activity, 1)
+    apply_rollup_deltas(db, deltas)
+    if found:
+        bump_data_versions(db, [user_id])
+    db.commit()
+    return found
+
+
+# Функция для удаления нескольких активностей одной транзакцией.
+# Возвращает идентификаторы удалённых активностей.
+def delete_activities(db: Session, user_id: int, ids: list[int]):
+    found = get_activities_by_ids(db, user_id, ids)
+    if not found:
+        return set()
+    deltas = {}
+    for db_activity in found.values():
+        add_rollup_delta(deltas, db_activity, -1)
+    apply_rollup_deltas(db, deltas)
+    bump_data_versions(db, [user_id])
+    db.query(models.Activity).filter(
+        models.Activity.id.in_(list(found))
+    ).delete(synchronize_session=False)
+    db.commit()
+    return set(found)
+
+
+# Страница активностей в JSON-совместимом виде для кэша результатов и обратно
+def dump_page(page) -> list:
+    records, next_cursor = page
+    return [[astuple(record) for record in records], next_cursor]
+
+
+def load_page(data: list):
+    rows, next_cursor = data
+    records = []
+    for *values, started_at in rows:
+        if started_at is not None:
+            started_at = datetime.fromisoformat(started_at)
+        records.append(ActivityRecord(*values, started_at))
+    return records, next_cursor
+
+
+# Cached versions of the read functions, keyed by the user's data version.
+# The async wrappers below use these; direct callers get fresh results.
+query_activities_cached = result_cache.cached(
+    query_activities, get_data_version, dump_page, load_page
+)
+get_activity_stats_cached = result_cache.cached(
+    get_activity_stats,
+    get_data_version,
+    schemas.ActivityStats.dict,
+    schemas.ActivityStats.parse_obj,
+)
+
+
+# Async versions for request handlers. Each runs its sync counterpart on the
+# session's connection through run_sync, so the queries are written once and
+# the driver I/O is awaited instead of blocking a thread.
+
+
+async def query_activities_async(db: AsyncSession, user_id: int, **kwargs):
+    return await db.run_sync(query_activities_cached, user_id, **kwargs)
+
+
+async def get_data_version_async(db: AsyncSession, user_id: int) -> int:
+    return await db.run_sync(get_data_version, user_id)
+
+
+async def get_activity_stats_async(
+    db: AsyncSession,
+    user_id: int,
+    date_from: date | None = None,
+    date_to: date | None = None,
+):
+    return await db.run_sync(
+        get_activity_stats_cached, user_id, date_from, date_to
+    )
+
+
+async def get_activity_async(db: AsyncSession, activity_id: int):
+    return await db.run_sync(get_activity, activity_id)
+
+
+async def create_activity_async(
+    db: AsyncSession, activity: schemas.ActivityCreate
+):
+    return await db.run_sync(create_activity, activity)
+
+
+async def update_activity_async(
+    db: AsyncSession, activity_id: int, activity: schemas.ActivityUpdate
+):
+    return await db.run_sync(update_activity, activity_id, activity)
+
+
+async def delete_activity_async(db: AsyncSession, activity_id: int):
+    return await db.run_sync(delete_activity, activity_id)
+
+
+async def get_activities_by_ids_async(
+    db: AsyncSession, user_id: int, ids: list[int]
+):
+    return await db.run_sync(get_activities_by_ids, user_id, ids)
+
+
+async def create_activities_async(
+    db: AsyncSession, activities: list[schemas.ActivityCreate]
+):
+    return await db.run_sync(create_activities, activities)
+
+
+async def update_activities_async(
+    db: AsyncSession, user_id: int, patches: list[schemas.ActivityPatch]
+):
+    return await db.run_sync(update_activities, user_id, patches)
+
+
+async def delete_activities_async(
+    db: AsyncSession, user_id: int, ids: list[int]
+):
+    return await db.run_sync(delete_activities, user_id, ids)
@@ -1,18 +1,49 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from . import users
 from jose import jwt
-from ..config import SECRET_KEY, ALGORITHM, EXPIRE_TIME_MINUTES
-import bcrypt
-import base64
+from .. import models
+from ..config import (
+    SECRET_KEY,
+    ALGORITHM,
+    EXPIRE_TIME_MINUTES,
+    REFRESH_EXPIRE_DAYS,
+    TOKEN_VERSION_TTL,
+)
+from ..hashing import hasher
+from ..schemas import authentication as schemas
+import hashlib
+import hmac
+import secrets
+import threading
+import time
 
 
 def get_user_username_password(db: Session, username: str, password: str):
     user = users.get_user_by_username(db, username)
     if not user:
         return False
-    if not bcrypt.checkpw(password.encode('utf-8'), base64.b64decode(user.password)):
+    if not hasher.verify(password, user.password):
         return False
+    # Пересчёт хеша после изменения BCRYPT_ROUNDS
+    if hasher.needs_rehash(user.password):
+        user.password = hasher.hash(password)
+        db.commit()
+    return user
+
+
+async def get_user_username_password_async(
+    db: AsyncSession, username: str, password: str
+):
+    user = await users.get_user_by_username_async(db, username)
+    if not user:
+        return False
+    if not await hasher.verify_async(password, user.password):
+        return False
+    if hasher.needs_rehash(user.password):
+        user.password = await hasher.hash_async(password)
+        await db.commit()
     return user
 
 
@@ -32,3 +63,234 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 def get_username_from_token(token: str):
     payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
     return payload.get("sub")
+
+
+# Token versions read from the Users table, kept for a few seconds so most
+# requests are authenticated without a query. None marks a deleted user.
+class TokenVersionCache:
+    # Past this many entries the expired ones are dropped
+    max_entries = 10000
+
+    def __init__(self, ttl: float, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: dict[int, tuple[float, int | None]] = {}
+        # Bumped by forget(), so a read that started before a revocation
+        # does not store the version it replaced
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, load):
+        now = self._clock()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        generation = self._generation
+        version = load()
+        with self._lock:
+            if generation != self._generation:
+                return version
+            if len(self._entries) >= self.max_entries:
+                self._entries = {
+                    key: value
+                    for key, value in self._entries.items()
+                    if value[0] > now
+                }
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (now + self.ttl, version)
+        return version
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+token_versions = TokenVersionCache(TOKEN_VERSION_TTL)
+
+
+# Access tokens carry the token version of their user; bumping the version
+# stored on the user row revokes every token issued before. Being in the
+# database, a revocation holds in every worker (after TOKEN_VERSION_TTL at
+# most) and survives restarts.
+def get_token_version(db: Session, user_id: int) -> int | None:
+    return token_versions.get(
+        user_id,
+        lambda: db.query(models.User.token_version)
+        .filter(models.User.id == user_id)
+        .scalar(),
+    )
+
+
+# Отзыв всех ранее выданных токенов пользователя
+def revoke_user_tokens(db: Session, user_id: int):
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {"token_version": models.User.token_version + 1},
+        synchronize_session=False,
+    )
+    db.commit()
+    token_versions.forget(user_id)
+
+
+def create_user_access_token(
+    user: models.User, expires_delta: timedelta | None = None
+):
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.id,
+            "ver": user.token_version or 0,
+        },
+        expires_delta=expires_delta,
+    )
+
+
+# Пользователь из утверждений токена; из базы данных читается только версия
+# токенов пользователя (None для удалённого пользователя)
+def get_principal_from_token(
+    db: Session, token: str
+) -> schemas.Principal | None:
+    payload = jwt.decode(token, SECRET_KEY, algorithms=ALGORITHM)
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    if username is None or user_id is None or version is None:
+        return None
+    current = get_token_version(db, user_id)
+    if current is None or version < current:
+        return None
+    return schemas.Principal(id=user_id, username=username)
+
+
+async def get_principal_from_token_async(
+    db: AsyncSession, token: str
+) -> schemas.Principal | None:
+    return await db.run_sync(get_principal_from_token, token)
+
+
+async def revoke_user_tokens_async(db: AsyncSession, user_id: int):
+    return await db.run_sync(revoke_user_tokens, user_id)
+
+
+# Refresh tokens are random strings; only their HMAC is stored, so a leaked
+# table does not hand out sessions. A plain hash is enough for lookup as the
+# token carries 256 bits of entropy, the key just ties it to this deployment.
+def _hash_refresh_token(token: str) -> str:
+    return hmac.new(
+        SECRET_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _add_refresh_token(db: Session, user_id: int, family_id: str) -> str:
+    token = secrets.token_urlsafe(32)
+    now = _utcnow()
+    db.add(
+        models.RefreshToken(
+            user_id=user_id,
+            token_hash=_hash_refresh_token(token),
+            family_id=family_id,
+            created_at=now,
+            expires_at=now + timedelta(days=REFRESH_EXPIRE_DAYS),
+        )
+    )
+    return token
+
+
+# Выдача нового refresh-токена (начало новой цепочки при входе)
+def create_refresh_token(db: Session, user_id: int) -> str:
+    token = _add_refresh_token(db, user_id, secrets.token_hex(16))
+    db.commit()
+    return token
+
+
+def _revoke_family(db: Session, family_id: str):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family_id == family_id,
+        models.RefreshToken.revoked_at.is_(None),
+    ).update({"revoked_at": _utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+# Обмен refresh-токена на новый. Возвращает (пользователь, новый токен)
+# или None. Повторное использование уже обменянного токена означает
+# утечку, поэтому отзывается вся цепочка.
+def rotate_refresh_token(db: Session, token: str):
+    refresh = models.RefreshToken
+    db_token = (
+        db.query(refresh)
+        .filter(refresh.token_hash == _hash_refresh_token(token))
+        .first()
+    )
+    if db_token is None:
+        return None
+    if db_token.revoked_at is not None:
+        _revoke_family(db, db_token.family_id)
+        return None
+    now = _utcnow()
+    if db_token.expires_at <= now:
+        return None
+    # Conditional update, so two concurrent refreshes with the same token
+    # cannot both succeed: the loser is treated as reuse
+    revoked = (
+        db.query(refresh)
+        .filter(refresh.id == db_token.id, refresh.revoked_at.is_(None))
+        .update({"revoked_at": now}, synchronize_session=False)
+    )
+    if revoked != 1:
+        db.rollback()
+        _revoke_family(db, db_token.family_id)
+        return None
+    new_token = _add_refresh_token(db, db_token.user_id, db_token.family_id)
+    db.commit()
+    return db_token.user, new_token
+
+
+# Отзыв одного refresh-токена (выход из системы)
+def revoke_refresh_token(db: Session, token: str) -> bool:
+    db_token = (
+        db.query(models.RefreshToken)
+        .filter(models.RefreshToken.token_hash == _hash_refresh_token(token))
+        .first()
+    )
+    if db_token is None:
+        return False
+    _revoke_family(db, db_token.family_id)
+    # The next request re-reads the version, picking up revocations made
+    # by other workers
+    token_versions.forget(db_token.user_id)
+    return True
+
+
+# Отзыв всех refresh-токенов пользователя
+def revoke_user_refresh_tokens(db: Session, user_id: int):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id,
+        models.RefreshToken.revoked_at.is_(None),
+    ).update({"revoked_at": _utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+async def create_refresh_token_async(db: AsyncSession, user_id: int) -> str:
+    return await db.run_sync(create_refresh_token, user_id)
+
+
+async def rotate_refresh_token_async(db: AsyncSession, token: str):
+    return await db.run_sync(rotate_refresh_token, token)
+
+
+async def revoke_refresh_token_async(db: AsyncSession, token: str) -> bool:
+    return await db.run_sync(revoke_refresh_token, token)
+
+
+async def revoke_user_refresh_tokens_async(db: AsyncSession, user_id: int):
+    return await db.run_sync(revoke_user_refresh_tokens, user_id)
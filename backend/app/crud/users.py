@@ -1,9 +1,9 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .. import models
 from ..schemas import users as schemas
-import bcrypt
+from ..hashing import hasher
 import re
-import base64
 
 
 # Функция для получения всех юзеров
@@ -37,11 +37,15 @@ def validate_email(email: str):
 
 # Функция для создания нового пользователя
 def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = bcrypt.hashpw(
-        user.password.encode("utf-8"), bcrypt.gensalt()
-    )
+    return add_user(db, user, hasher.hash(user.password))
+
+
+# Сохранение пользователя с уже посчитанным хешем пароля
+def add_user(db: Session, user: schemas.UserCreate, password: bytes):
     db_user = models.User(
-        email=user.email, password=base64.b64encode(hashed_password), username=user.username
+        email=user.email,
+        password=password,
+        username=user.username,
     )
     db.add(db_user)
     db.commit()
@@ -64,8 +68,49 @@ def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
 def delete_user(db: Session, user_id: int):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if db_user:
+        db.query(models.RefreshToken).filter(
+            models.RefreshToken.user_id == user_id
+        ).delete(synchronize_session=False)
+        db.query(models.UserDataVersion).filter(
+            models.UserDataVersion.user_id == user_id
+        ).delete(synchronize_session=False)
         db.delete(db_user)
         db.commit()
         return {"message": "User deleted successfully"}
     else:
         return {"message": "User not found"}
+
+
+# Async versions for request handlers, see crud/activities.py. Password
+# hashing is awaited outside run_sync so it never blocks the event loop.
+
+
+async def get_users_async(db: AsyncSession):
+    return await db.run_sync(get_users)
+
+
+async def get_user_async(db: AsyncSession, user_id: int):
+    return await db.run_sync(get_user, user_id)
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    return await db.run_sync(get_user_by_email, email)
+
+
+async def get_user_by_username_async(db: AsyncSession, username: str):
+    return await db.run_sync(get_user_by_username, username)
+
+
+async def create_user_async(db: AsyncSession, user: schemas.UserCreate):
+    password = await hasher.hash_async(user.password)
+    return await db.run_sync(add_user, user, password)
+
+
+async def update_user_async(
+    db: AsyncSession, user_id: int, user: schemas.UserUpdate
+):
+    return await db.run_sync(update_user, user_id, user)
+
+
+async def delete_user_async(db: AsyncSession, user_id: int):
+    return await db.run_sync(delete_user, user_id)
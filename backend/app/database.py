@@ -1,12 +1,206 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .config import SQLALCHEMY_DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from . import metrics
+from .config import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    SQLALCHEMY_DATABASE_URL,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
+
+# Async drivers for the dialects we run on
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+}
+
+
+# Pool options reported by database_status()
+ENGINE_SETTINGS = (
+    "pool_size",
+    "max_overflow",
+    "pool_timeout",
+    "pool_recycle",
+    "pool_pre_ping",
+)
+
+
+# Pool metrics from the public pool events: checkouts, how long each one
+# keeps its connection (long holds are what make other requests wait) and
+# how long opening a new connection takes. Timeouts are counted where the
+# request gives up, in get_async_db.
+def watch_pool(engine):
+    driver = engine.dialect.driver
+
+    def before_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_start"] = time.perf_counter()
+
+    def on_connect(dbapi_connection, connection_record):
+        start = connection_record.info.pop("connect_start", None)
+        if start is not None:
+            metrics.db_pool_connect.observe(
+                time.perf_counter() - start, driver
+            )
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checkout_start"] = time.perf_counter()
+        metrics.db_pool_checkouts.inc(driver)
+
+    def on_checkin(dbapi_connection, connection_record):
+        start = connection_record.info.pop("checkout_start", None)
+        if start is not None:
+            metrics.db_pool_checkout_duration.observe(
+                time.perf_counter() - start, driver
+            )
+
+    event.listen(engine, "do_connect", before_connect)
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+
+# URL of the same database for the async driver
+def async_database_url(url: str) -> str:
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {url.drivername}")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# Pool arguments for create_engine. SQLite files get a queue pool as well,
+# so connections (and their page cache and mmap) are reused between
+# requests; in-memory databases keep the default single connection.
+def engine_options(url: str, is_async: bool = False) -> dict:
+    url = make_url(url)
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+    }
+    if url.get_backend_name() != "sqlite":
+        options["pool_recycle"] = DB_POOL_RECYCLE
+        options["pool_pre_ping"] = DB_POOL_PRE_PING
+        return options
+    if url.database in (None, "", ":memory:"):
+        return {}
+    if not is_async:
+        # Pooled connections are used by whichever thread checks them out
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")  # nosec
+    cursor.close()
+
+
+def make_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    watch_pool(engine)
+    return engine
+
+
+def make_async_engine(url: str):
+    engine = create_async_engine(url, **engine_options(url, is_async=True))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    watch_pool(engine.sync_engine)
+    return engine
+
+
+# Live pool counters; not every pool class keeps all of them
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    stats = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+
+# Active pool settings and live stats of both engines
+def database_status() -> dict:
+    status = {
+        "dialect": engine.dialect.name,
+        "pool": {
+            key: value
+            for key, value in engine_options(SQLALCHEMY_DATABASE_URL).items()
+            if key in ENGINE_SETTINGS
+        },
+        "engines": {
+            "sync": pool_stats(engine),
+            "async": pool_stats(async_engine.sync_engine),
+        },
+    }
+    if engine.dialect.name == "sqlite":
+        status["pragmas"] = SQLITE_PRAGMAS
+    return status
+
 
 # Подключение к базе данных
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+ASYNC_DATABASE_URL = SQLALCHEMY_ASYNC_DATABASE_URL or async_database_url(
+    SQLALCHEMY_DATABASE_URL
+)
+
+# Request handlers use the async engine, so waiting on the database does not
+# hold a threadpool slot. The sync engine above stays for migrations and CLI.
+# Objects are not expired on commit: after the session is gone a lazy reload
+# would need a greenlet and fail during response serialization.
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+
+AsyncSessionLocal = sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Dependency to get async database session. The only way request handlers
+# get a session: uncommitted work is rolled back if the handler fails and
+# the connection goes back to the pool when the request ends.
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as error:
+            if isinstance(error, exc.TimeoutError):
+                # Gave up waiting for a pooled connection
+                metrics.db_pool_timeouts.inc(async_engine.dialect.driver)
+            await db.rollback()
+            raise
@@ -0,0 +1,70 @@
+"""Streaming export of a user's activities as CSV or NDJSON.
+
+Rows are read through a server-side cursor (``AsyncConnection.stream``) in
+partitions of ``chunk_size`` and each partition is encoded and sent before
+the next one is fetched, so memory does not grow with the history size.
+The CSV header goes out before the query runs. The columns match what
+``importer`` reads, so an export can be imported again.
+"""
+
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from . import models
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+CHUNK_SIZE = 500
+
+COLUMNS = (
+    "id",
+    "name",
+    "type_id",
+    "start_time",
+    "end_time",
+    "duration",
+    "description",
+)
+
+
+# Запрос всех активностей пользователя в порядке начала
+def export_query(user_id: int):
+    activity = models.Activity.__table__
+    return (
+        select(*(activity.c[name] for name in COLUMNS))
+        .where(activity.c.user_id == user_id)
+        .order_by(activity.c.started_at, activity.c.id)
+    )
+
+
+def encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson}
+
+
+# Экспорт активностей пользователя частями по chunk_size строк
+async def stream_activities(
+    engine, user_id: int, format: str, chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[str]:
+    encode = ENCODERS[format]
+    if format == "csv":
+        yield encode_csv([COLUMNS])
+    async with engine.connect() as conn:
+        result = await conn.stream(export_query(user_id))
+        async for rows in result.partitions(chunk_size):
+            yield encode(rows)
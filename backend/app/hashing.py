@@ -0,0 +1,176 @@
+"""Password hashing service.
+
+bcrypt is deliberately slow, tens of milliseconds per call at the default
+cost. Run on the request path it ties up the event loop or a worker thread,
+so a login burst stalls every other request. Hashes therefore run in a
+process pool sized to the CPU count. At most ``workers + queue_size`` jobs
+are admitted at once; beyond that ``PasswordHasherBusy`` is raised so the
+caller can answer 503 instead of piling up requests. This module must not
+import the ORM, since pool workers import it on start."""
+
+import asyncio
+import base64
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from . import metrics
+from .config import (
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_QUEUE_SIZE,
+    PASSWORD_HASH_WORKERS,
+)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _hash_password(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check_password(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+# Labels of password_hash_seconds
+OPERATIONS = {_hash_password: "hash", _check_password: "verify"}
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, queue_size: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._hashes = 0
+        self._rejected = 0
+        self._seconds_total = 0.0
+        self._seconds_max = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _admit(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy()
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return self._timed(function, *args)
+        self._admit()
+        try:
+            future = self._executor().submit(function, *args)
+            start = time.perf_counter()
+            result = future.result()
+            self._record(function, time.perf_counter() - start)
+            return result
+        finally:
+            self._release()
+
+    # Same as _run, but awaits the worker instead of blocking the thread
+    async def _run_async(self, function, *args):
+        if not self.workers:
+            return self._timed(function, *args)
+        self._admit()
+        try:
+            future = self._executor().submit(function, *args)
+            start = time.perf_counter()
+            result = await asyncio.wrap_future(future)
+            self._record(function, time.perf_counter() - start)
+            return result
+        finally:
+            self._release()
+
+    def _timed(self, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self._record(function, time.perf_counter() - start)
+        return result
+
+    def _record(self, function, seconds: float):
+        metrics.password_hash_duration.observe(seconds, OPERATIONS[function])
+        with self._lock:
+            self._hashes += 1
+            self._seconds_total += seconds
+            self._seconds_max = max(self._seconds_max, seconds)
+
+    # Хеш пароля в формате, который хранится в Users.password
+    def hash(self, password: str) -> bytes:
+        hashed = self._run(
+            _hash_password, password.encode("utf-8"), self.rounds
+        )
+        return base64.b64encode(hashed)
+
+    def verify(self, password: str, stored) -> bool:
+        return self._run(
+            _check_password, password.encode("utf-8"), base64.b64decode(stored)
+        )
+
+    async def hash_async(self, password: str) -> bytes:
+        hashed = await self._run_async(
+            _hash_password, password.encode("utf-8"), self.rounds
+        )
+        return base64.b64encode(hashed)
+
+    async def verify_async(self, password: str, stored) -> bool:
+        return await self._run_async(
+            _check_password, password.encode("utf-8"), base64.b64decode(stored)
+        )
+
+    # Хеш создан с другим cost factor и должен быть пересчитан
+    def needs_rehash(self, stored) -> bool:
+        try:
+            rounds = int(base64.b64decode(stored).split(b"$")[2])
+        except (ValueError, IndexError):
+            return True
+        return rounds != self.rounds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.workers),
+                "hashes": self._hashes,
+                "rejected": self._rejected,
+                "latency_avg_seconds": (
+                    self._seconds_total / self._hashes if self._hashes else 0.0
+                ),
+                "latency_max_seconds": self._seconds_max,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+hasher = PasswordHasher(
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE
+)
@@ -0,0 +1,182 @@
+"""Streaming import of activities from CSV or NDJSON.
+
+The input is read line by line and written in chunks of ``chunk_size`` rows,
+each chunk in its own transaction. Memory use therefore does not depend on
+the file size, and an interrupted import keeps the chunks already written.
+Rows are validated against ``schemas.activities.ActivityCreate``; invalid
+rows are reported with their line number and skipped. Postgres (psycopg2)
+loads each chunk with COPY, other databases with one executemany INSERT.
+"""
+
+import csv
+import io
+import json
+from types import SimpleNamespace
+from typing import Iterator, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from . import models
+from .crud.activities import (
+    add_rollup_delta,
+    apply_rollup_deltas,
+    bump_data_versions,
+)
+from .schemas import activities as schemas
+from .timeutils import typed_times
+
+FORMATS = ("csv", "ndjson")
+CHUNK_SIZE = 1000
+
+
+# Формат файла по расширению имени
+def detect_format(filename: str | None) -> str | None:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    if extension == "csv":
+        return "csv"
+    return None
+
+
+# Записи файла по одной: (номер строки, запись, ошибка разбора)
+def iter_records(stream: TextIO, format: str) -> Iterator[tuple]:
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # Columns beyond the header end up under the None key
+            record.pop(None, None)
+            yield reader.line_num, record, None
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+# Проверка записи и значения столбцов таблицы Activity для неё
+def validate_record(
+    record: dict, user_id: int, type_ids: set[int] | None = None
+) -> dict:
+    try:
+        activity = schemas.ActivityCreate(**{**record, "user_id": user_id})
+    except ValidationError as e:
+        raise ValueError(_validation_message(e))
+    if type_ids is not None and activity.type_id not in type_ids:
+        raise ValueError(f"Unknown activity type: {activity.type_id}")
+    values = activity.dict()
+    values.update(
+        typed_times(activity.start_time, activity.end_time, activity.duration)
+    )
+    return values
+
+
+# Поле строки для COPY ... CSV: пустое без кавычек - NULL
+def _copy_field(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, int):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(db: Session, rows: list[dict]):
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_field(row[key]) for key in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    names = ", ".join(f'"{name}"' for name in columns)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "Activity" ({names}) FROM STDIN WITH CSV',  # nosec
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+# Запись одного блока строк, дневных сводок и версии данных в одной
+# транзакции
+def write_chunk(db: Session, rows: list[dict]):
+    deltas = {}
+    for row in rows:
+        add_rollup_delta(deltas, SimpleNamespace(**row), 1)
+    if db.get_bind().dialect.driver == "psycopg2":
+        _copy_rows(db, rows)
+    else:
+        db.execute(models.Activity.__table__.insert(), rows)
+    apply_rollup_deltas(db, deltas)
+    bump_data_versions(db, [row["user_id"] for row in rows])
+    db.commit()
+
+
+# Импорт активностей пользователя. Выдаёт отчёт после каждого блока и
+# итоговый отчёт с "done": true в конце.
+def import_activities(
+    db: Session,
+    user_id: int,
+    stream: TextIO,
+    format: str,
+    type_ids: set[int] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[dict]:
+    totals = {"chunks": 0, "imported": 0, "failed": 0}
+    rows = []
+    errors = []
+
+    def flush():
+        if rows:
+            write_chunk(db, rows)
+        totals["chunks"] += 1
+        totals["imported"] += len(rows)
+        totals["failed"] += len(errors)
+        progress = {
+            "chunk": totals["chunks"],
+            "imported": len(rows),
+            "failed": len(errors),
+            "errors": list(errors),
+            "total_imported": totals["imported"],
+            "total_failed": totals["failed"],
+        }
+        rows.clear()
+        errors.clear()
+        return progress
+
+    try:
+        for line, record, error in iter_records(stream, format):
+            if error is None:
+                try:
+                    rows.append(validate_record(record, user_id, type_ids))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                errors.append({"line": line, "error": error})
+            # Invalid rows count too, so a file of bad rows stays bounded
+            if len(rows) + len(errors) >= chunk_size:
+                yield flush()
+        if rows or errors:
+            yield flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.rollback()
+        yield {"done": True, "error": f"Unreadable input: {e}", **totals}
+        return
+    yield {"done": True, **totals}
@@ -1,14 +1,99 @@
 from fastapi import FastAPI
-from .api import activities, users, authentication, healthz
-from .config import GIT_INFO
+from .api import (
+    activities,
+    users,
+    authentication,
+    healthz,
+    metrics,
+    profiling,
+)
+from .bootstrap import prepare_database
+from .config import (
+    COMPRESSION_MINIMUM_SIZE,
+    COMPRESSION_THREADPOOL_SIZE,
+    GIT_INFO,
+    GZIP_LEVEL,
+    PROFILE_SAMPLE_RATE,
+    PROFILING_TOKEN,
+    SERVER_TIMING,
+    ZSTD_LEVEL,
+)
+from .database import async_engine, engine, SessionLocal
+from .hashing import hasher
+from .middleware.compression import CompressionMiddleware
+from .middleware.leaks import PoolLeakMiddleware, leak_detector
+from .middleware.metrics import MetricsMiddleware
+from .middleware.profiling import ProfilingMiddleware
+from .middleware.queries import QueryTracingMiddleware, query_tracer
+from .profiling import profile_store
+from .registry import registry
 
 app = FastAPI(description=f"Activity Tracker API<br>{GIT_INFO}")
 
+# Log connections that are still checked out when their request ends
+leak_detector.watch(engine)
+leak_detector.watch(async_engine.sync_engine)
+app.add_middleware(PoolLeakMiddleware, detector=leak_detector)
+
+# Compress large responses for clients that accept zstd or gzip
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    levels={"gzip": GZIP_LEVEL, "zstd": ZSTD_LEVEL},
+    threadpool_size=COMPRESSION_THREADPOOL_SIZE,
+)
+
+# Count and time each request's SQL statements, log slow ones with their
+# plan and queries repeated within a request (N+1)
+query_tracer.watch(engine)
+query_tracer.watch(async_engine.sync_engine)
+app.add_middleware(
+    QueryTracingMiddleware, tracer=query_tracer, server_timing=SERVER_TIMING
+)
+
+# Sampling profiler for single requests, enabled by PROFILING_TOKEN. When
+# it is unset neither the middleware nor the /admin routes exist.
+if PROFILING_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=PROFILE_SAMPLE_RATE,
+    )
+
+# Request counts and latency per route, served at /metrics. Added last so
+# it is the outermost middleware and times everything below it.
+app.add_middleware(MetricsMiddleware)
+
 # Подключаем роуты для активностей и пользователей
 app.include_router(activities.router)
 app.include_router(users.router)
 app.include_router(authentication.router)
 app.include_router(healthz.router)
+app.include_router(metrics.router)
+if PROFILING_TOKEN:
+    app.include_router(profiling.router)
+
+
+# Prepare the database and load the activity types before the first
+# request; on shutdown close pooled connections (each aiosqlite connection
+# owns a thread that would otherwise keep the process alive) and stop the
+# password hashing workers. Importing the app does no database work.
+async def lifespan(app):
+    prepare_database(engine)
+    db = SessionLocal()
+    try:
+        registry.load(db)
+    finally:
+        db.close()
+    try:
+        yield
+    finally:
+        await async_engine.dispose()
+        hasher.shutdown()
+
+
+app.router.lifespan_context = lifespan
+
 
 if __name__ == "__main__":
     import uvicorn
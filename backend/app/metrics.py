@@ -0,0 +1,275 @@
+"""Prometheus metrics without a client library.
+
+Recording has to stay cheap on the request path, so every metric keeps one
+shard per thread: a plain dict only that thread writes to, found through a
+``threading.local``. Recording takes no lock, and a lock is only taken once
+per thread, when the shard is created. ``MetricsRegistry.render`` sums the
+shards and formats them in the text exposition format when ``/metrics`` is
+scraped. Values that already exist elsewhere (pool sizes, cache counters)
+are read at scrape time by collector callbacks instead of being copied.
+
+This module must stay import-light: ``hashing`` and ``database`` record into
+it, and the password hashing workers import ``hashing`` on start.
+"""
+
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, registry, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    # Копии шардов всех потоков; list() копирует словарь под GIL
+    def _snapshot(self) -> list[list]:
+        with self._lock:
+            shards = list(self._shards)
+        return [list(shard.items()) for shard in shards]
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> dict:
+        totals = {}
+        for items in self._snapshot():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, value in sorted(self.values().items()):
+            lines.append(
+                f"{self.name}{_labels(self.labelnames, labels)} "
+                f"{_number(value)}"
+            )
+        return lines
+
+
+# Increments and decrements from every thread add up to the current value
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    # Per labels: a count per bucket (the last one is +Inf), sum, count
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def values(self) -> dict:
+        totals = {}
+        for items in self._snapshot():
+            for labels, (counts, total, count) in items:
+                merged = totals.setdefault(
+                    labels, [[0] * (len(self.buckets) + 1), 0.0, 0]
+                )
+                for index, bucket_count in enumerate(counts):
+                    merged[0][index] += bucket_count
+                merged[1] += total
+                merged[2] += count
+        return totals
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, (counts, total, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+# Metric read at scrape time: callback() returns {label values: value}
+class CallbackMetric(Metric):
+    def __init__(
+        self, registry, name, help, labelnames, callback, type="gauge"
+    ):
+        super().__init__(registry, name, help, labelnames)
+        self.callback = callback
+        self.type = type
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, value in sorted(self.callback().items()):
+            lines.append(
+                f"{self.name}{_labels(self.labelnames, labels)} "
+                f"{_number(value)}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = Counter(
+    registry,
+    "http_requests_total",
+    "HTTP requests by route and status code.",
+    ("method", "route", "status"),
+)
+http_request_duration = Histogram(
+    registry,
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route"),
+)
+http_request_db_queries = Histogram(
+    registry,
+    "http_request_db_queries",
+    "SQL statements executed per request, by route.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+http_requests_in_flight = Gauge(
+    registry,
+    "http_requests_in_flight",
+    "HTTP requests being served.",
+)
+db_pool_checkouts = Counter(
+    registry,
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool.",
+    ("driver",),
+)
+db_pool_checkout_duration = Histogram(
+    registry,
+    "db_pool_checkout_seconds",
+    "Time a connection stays checked out of the pool.",
+    ("driver",),
+)
+db_pool_connect = Histogram(
+    registry,
+    "db_pool_connect_seconds",
+    "Time spent opening a new database connection.",
+    ("driver",),
+)
+db_pool_timeouts = Counter(
+    registry,
+    "db_pool_timeouts_total",
+    "Checkouts that gave up waiting for a connection.",
+    ("driver",),
+)
+password_hash_duration = Histogram(
+    registry,
+    "password_hash_seconds",
+    "bcrypt hash and verify time, including the wait for a worker.",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
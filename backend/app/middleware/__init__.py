@@ -0,0 +1 @@
+"""ASGI middleware installed by ``main.py``."""
@@ -0,0 +1,148 @@
+"""Negotiated response compression (zstd or gzip).
+
+The encoding is picked from the request's ``Accept-Encoding`` by q-value,
+preferring zstd on ties; zstd is only offered when the ``zstandard`` package
+is installed. Responses smaller than ``minimum_size`` are sent as is, as are
+responses that already carry a ``Content-Encoding`` and bodiless ones.
+
+Streaming responses (imports, exports) are compressed chunk by chunk and
+flushed after each chunk, so the client still receives progress as it is
+produced. A compressed response's ETag is made weak, since its bytes differ
+from the identity representation.
+
+Bodies of ``threadpool_size`` bytes or more are compressed in the
+threadpool. Both compressors release the GIL while they work, so a large
+export no longer stalls every other request on the event loop; smaller
+bodies are compressed inline, where the thread hop would cost more than
+the compression itself.
+"""
+
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def write(self, data: bytes, final: bool) -> bytes:
+        mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+class ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def write(self, data: bytes, final: bool) -> bytes:
+        if final:
+            mode = zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+# Encodings in order of preference
+ENCODERS = {"gzip": GzipStream}
+if zstandard is not None:
+    ENCODERS = {"zstd": ZstdStream, **ENCODERS}
+
+
+# Выбор кодировки по Accept-Encoding с учётом q-значений (None - без сжатия)
+def negotiate(accept_encoding: str, encodings) -> str | None:
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.strip()] = weight
+    default = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for coding in encodings:
+        weight = weights.get(coding, default)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int,
+        levels: dict[str, int],
+        threadpool_size: int,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = levels
+        self.threadpool_size = threadpool_size
+
+    async def compress(self, stream, body: bytes, final: bool) -> bytes:
+        if len(body) >= self.threadpool_size:
+            return await run_in_threadpool(stream.write, body, final)
+        return stream.write(body, final)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept_encoding, ENCODERS)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        # None until the first body message decides, then False or a stream
+        stream = None
+
+        async def send_compressed(message):
+            nonlocal start, stream
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                headers = MutableHeaders(raw=start["headers"])
+                small = len(body) < self.minimum_size and not more_body
+                encoded = "content-encoding" in headers
+                if small or encoded or start["status"] in (204, 304):
+                    stream = False
+                else:
+                    stream = ENCODERS[encoding](self.levels[encoding])
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+                    if more_body:
+                        del headers["content-length"]
+                if stream:
+                    body = await self.compress(stream, body, not more_body)
+                    if not more_body:
+                        headers["Content-Length"] = str(len(body))
+                await send(start)
+            elif stream:
+                body = await self.compress(stream, body, not more_body)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,109 @@
+"""Detection of pooled connections that outlive their request.
+
+Every connection checked out of a watched pool while a request is running is
+recorded against that request and forgotten again on checkin. Once the
+request is fully done, including the teardown of ``yield`` dependencies,
+whatever is still recorded has leaked: it is logged and counted. Tests wrap
+requests in ``expect_no_leaks()`` to fail on any leak.
+"""
+
+import contextvars
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Connection records checked out by the current request
+_request_connections = contextvars.ContextVar(
+    "request_connections", default=None
+)
+
+
+class ConnectionLeakError(Exception):
+    pass
+
+
+class PoolLeakDetector:
+    def __init__(self):
+        self.leaked = 0
+        self.leaks = deque(maxlen=100)
+
+    def watch(self, engine):
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, record, proxy):
+        connections = _request_connections.get()
+        if connections is not None:
+            connections.add(record)
+            record.info["request_connections"] = connections
+
+    def _on_checkin(self, dbapi_connection, record):
+        connections = record.info.pop("request_connections", None)
+        if connections is not None:
+            connections.discard(record)
+
+    def check(self, scope, connections: set):
+        if not connections:
+            return
+        count = len(connections)
+        connections.clear()
+        self.leaked += count
+        leak = {
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "connections": count,
+        }
+        self.leaks.append(leak)
+        logger.warning(
+            "%d database connection(s) still checked out after %s %s",
+            count,
+            leak["method"],
+            leak["path"],
+        )
+
+    def stats(self) -> dict:
+        return {"leaked": self.leaked, "recent": list(self.leaks)}
+
+    # Raise ConnectionLeakError if a request inside the block leaked
+    @contextmanager
+    def expect_no_leaks(self):
+        before = self.leaked
+        yield
+        leaked = self.leaked - before
+        if leaked:
+            recent = list(self.leaks)[-leaked:]
+            raise ConnectionLeakError(
+                f"{leaked} connection(s) leaked: {recent}"
+            )
+
+
+class PoolLeakMiddleware:
+    def __init__(self, app, detector: PoolLeakDetector):
+        self.app = app
+        self.detector = detector
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        connections = set()
+        token = _request_connections.set(connections)
+        # FastAPI closes yield dependencies (the database session) on this
+        # exit stack after the middleware has returned. A callback pushed
+        # first runs last, after the session is closed.
+        stack = scope.get("fastapi_astack")
+        if stack is not None:
+            stack.callback(self.detector.check, scope, connections)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_connections.reset(token)
+            if stack is None:
+                self.detector.check(scope, connections)
+
+
+leak_detector = PoolLeakDetector()
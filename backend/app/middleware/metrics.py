@@ -0,0 +1,62 @@
+"""Per-route request metrics.
+
+Requests are labelled with the route's path template (``/activities/
+{activity_id}``), never the raw path, so ids do not create new series.
+Starlette leaves the matched endpoint in the scope; the template is looked
+up from it once the request is done. Unmatched requests are labelled
+``unmatched``.
+"""
+
+import time
+
+from .. import metrics
+
+
+# Шаблоны путей маршрутов приложения по их обработчикам
+def _route_templates(app) -> dict:
+    templates = getattr(app, "_metrics_route_templates", None)
+    if templates is None:
+        templates = {
+            route.endpoint: route.path
+            for route in app.routes
+            if hasattr(route, "endpoint")
+        }
+        app._metrics_route_templates = templates
+    return templates
+
+
+def route_label(scope) -> str:
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return "unmatched"
+    return _route_templates(app).get(endpoint, "unmatched")
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.http_requests_in_flight.dec()
+            route = route_label(scope)
+            method = scope["method"]
+            metrics.http_requests.inc(method, route, str(status))
+            metrics.http_request_duration.observe(elapsed, method, route)
@@ -0,0 +1,58 @@
+"""Profiling of single requests.
+
+A request is profiled when it carries the profiling token in
+``X-Profile-Token``, or when it is picked by the random sample. A stack
+sampler runs from the start of the request until its body is sent, and the
+collapsed stacks are saved to the profile store. Requests that asked for a
+profile get its name back in ``X-Profile-Id`` and fetch it from
+``/admin/profiles/{name}``. One request is profiled at a time; others that
+arrive meanwhile run unprofiled.
+
+The middleware is only added when profiling is enabled, so it costs
+nothing otherwise.
+"""
+
+import random
+import threading
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from ..profiling import StackSampler, check_token
+
+# Request header carrying the profiling token
+PROFILE_HEADER = "x-profile-token"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, store, sample_rate: float):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin/"):
+            await self.app(scope, receive, send)
+            return
+        requested = check_token(Headers(scope=scope).get(PROFILE_HEADER))
+        sampled = random.random() < self.sample_rate  # nosec B311
+        if not (requested or sampled) or not self._busy.acquire(False):
+            await self.app(scope, receive, send)
+            return
+
+        name = self.store.new_name(f"{scope['method']}-{scope['path']}")
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Profile-Id"] = f"{name}.collapsed"
+            await send(message)
+
+        send_message = send_with_id if requested else send
+        sampler = StackSampler().start()
+        try:
+            await self.app(scope, receive, send_message)
+        finally:
+            counts = sampler.stop()
+            self._busy.release()
+            self.store.save(name, counts)
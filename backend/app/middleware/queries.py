@@ -0,0 +1,223 @@
+"""Per-request SQL instrumentation.
+
+Cursor events on every watched engine time each statement. Statements run
+while a request is being served are recorded against that request: how
+many there were, the total database time and the statements themselves.
+The middleware reports them in a ``Server-Timing`` header and in the
+``http_request_db_queries`` histogram by route. The header is sent before
+the body, so statements run while a body streams only reach the histogram.
+
+Statements slower than the threshold are logged with their query plan,
+inside a request or not. A SELECT run more than once by the same request
+usually means a query in a loop (N+1, e.g. a lazy relationship read per
+row); repeats are logged and counted, and tests wrap requests in
+``expect_no_repeats()`` to fail on them. Bulk writes (executemany) and
+writes repeated per chunk are not repeats.
+"""
+
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from .. import metrics
+from ..config import SLOW_QUERY_MS
+from .metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+# Statements kept per request; counting continues past the limit
+MAX_STATEMENTS = 200
+
+# Query plan statement per dialect; neither runs the statement
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+# Queries made by the current request
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+        self.selects = {}
+
+    def add(self, statement: str, seconds: float, executemany: bool):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.statements) < MAX_STATEMENTS:
+            self.statements.append((statement, seconds))
+        if not executemany and statement.lstrip()[:6].upper() == "SELECT":
+            self.selects[statement] = self.selects.get(statement, 0) + 1
+
+    def repeats(self) -> dict:
+        return {
+            statement: count
+            for statement, count in self.selects.items()
+            if count > 1
+        }
+
+    def server_timing(self) -> str:
+        return (
+            f"db;dur={self.seconds * 1000:.1f};"
+            f'desc="{self.count} queries"'
+        )
+
+
+# Текущий запрос к API: его SQL-запросы (None вне запроса)
+def current_queries() -> RequestQueries | None:
+    return _request_queries.get()
+
+
+# План выполнения запроса строками; None, если план получить нельзя
+def explain(conn, statement: str, parameters) -> list[str] | None:
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None:
+        return None
+    # A raw DBAPI cursor, so the plan query fires no events itself
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [
+            " ".join(str(value) for value in row) for row in cursor.fetchall()
+        ]
+    except Exception:
+        logger.debug("Could not explain %s", statement, exc_info=True)
+        return None
+    finally:
+        cursor.close()
+
+
+class QueryTracer:
+    def __init__(self, slow_query_seconds: float):
+        self.slow_query_seconds = slow_query_seconds
+        self.slow = 0
+        self.slow_queries = deque(maxlen=100)
+        self.repeated = 0
+        self.repeats = deque(maxlen=100)
+
+    def watch(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        queries = _request_queries.get()
+        if queries is not None:
+            queries.add(statement, seconds, executemany)
+        if seconds >= self.slow_query_seconds:
+            plan = None
+            if not executemany:
+                plan = explain(conn, statement, parameters)
+            self._log_slow(statement, seconds, plan)
+
+    def _log_slow(self, statement: str, seconds: float, plan):
+        self.slow += 1
+        self.slow_queries.append(
+            {
+                "statement": statement,
+                "ms": round(seconds * 1000, 1),
+                "plan": plan,
+            }
+        )
+        logger.warning(
+            "Slow query (%.1f ms): %s\nPlan:\n%s",
+            seconds * 1000,
+            statement,
+            "unavailable" if plan is None else "\n".join(plan) or "(empty)",
+        )
+
+    def check(self, scope, queries: RequestQueries):
+        repeats = queries.repeats()
+        if not repeats:
+            return
+        self.repeated += len(repeats)
+        for statement, count in repeats.items():
+            self.repeats.append(
+                {
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "statement": statement,
+                    "count": count,
+                }
+            )
+            logger.warning(
+                "Query repeated %d times by %s %s (N+1?): %s",
+                count,
+                scope.get("method"),
+                scope.get("path"),
+                statement,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "slow": self.slow,
+            "recent_slow": list(self.slow_queries),
+            "repeated": self.repeated,
+            "recent_repeats": list(self.repeats),
+        }
+
+    # Raise RepeatedQueryError if a request inside the block repeated a
+    # query
+    @contextmanager
+    def expect_no_repeats(self):
+        before = self.repeated
+        yield
+        repeated = self.repeated - before
+        if repeated:
+            recent = list(self.repeats)[-repeated:]
+            raise RepeatedQueryError(
+                f"{repeated} query(ies) repeated: {recent}"
+            )
+
+
+class QueryTracingMiddleware:
+    def __init__(self, app, tracer: QueryTracer, server_timing: bool):
+        self.app = app
+        self.tracer = tracer
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries()
+        token = _request_queries.set(queries)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", queries.server_timing())
+            await send(message)
+
+        send_message = send_with_timing if self.server_timing else send
+        try:
+            await self.app(scope, receive, send_message)
+        finally:
+            _request_queries.reset(token)
+            metrics.http_request_db_queries.observe(
+                queries.count, scope["method"], route_label(scope)
+            )
+            self.tracer.check(scope, queries)
+
+
+query_tracer = QueryTracer(SLOW_QUERY_MS / 1000)
@@ -0,0 +1,68 @@
+"""Versioned schema migrations.
+
+``Base.metadata.create_all`` only creates missing tables, it never alters
+existing ones. Every change to an existing table goes into a module of this
+package exposing ``VERSION`` and ``upgrade(engine)``, listed in
+``MIGRATIONS`` in ascending order. The applied version is kept in the
+``Schema_Version`` table, so each migration runs once per database.
+"""
+
+import logging
+
+from sqlalchemy import Column, Integer, MetaData, Table, select
+
+from . import v0001_typed_activity_times
+from . import v0002_daily_activity_rollups
+from . import v0003_users_username_index
+from . import v0004_refresh_tokens
+from . import v0005_user_data_versions
+from . import v0006_users_token_version
+from . import v0007_users_autoincrement
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    v0001_typed_activity_times,
+    v0002_daily_activity_rollups,
+    v0003_users_username_index,
+    v0004_refresh_tokens,
+    v0005_user_data_versions,
+    v0006_users_token_version,
+    v0007_users_autoincrement,
+]
+
+metadata = MetaData()
+
+schema_version = Table(
+    "Schema_Version",
+    metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+def get_version(engine) -> int:
+    with engine.connect() as conn:
+        version = conn.execute(select(schema_version.c.version)).scalar()
+    return version or 0
+
+
+def _set_version(engine, version: int):
+    with engine.begin() as conn:
+        conn.execute(schema_version.delete())
+        conn.execute(schema_version.insert().values(version=version))
+
+
+# Применение всех ещё не применённых миграций
+def upgrade(engine) -> int:
+    metadata.create_all(bind=engine)
+    current = get_version(engine)
+    for migration in MIGRATIONS:
+        if migration.VERSION <= current:
+            continue
+        logger.info(
+            "Applying migration %s (%s)", migration.VERSION, migration.__name__
+        )
+        migration.upgrade(engine)
+        _set_version(engine, migration.VERSION)
+        current = migration.VERSION
+    return current
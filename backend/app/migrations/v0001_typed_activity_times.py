@@ -0,0 +1,112 @@
+"""Add typed start/end/duration columns to ``Activity`` and backfill them.
+
+Existing rows only have the ``String(50)`` fields, so they are converted in
+chunks ordered by primary key. Each chunk is its own transaction, which keeps
+locks short on large tables and lets an interrupted run resume: only rows
+whose ``started_at`` is still empty are picked up again.
+"""
+
+from sqlalchemy import (
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    bindparam,
+    inspect,
+    select,
+    text,
+)
+
+from ..timeutils import typed_times
+
+VERSION = 1
+
+CHUNK_SIZE = 1000
+
+COLUMNS = [
+    ("started_at", DateTime()),
+    ("ended_at", DateTime()),
+    ("duration_seconds", Integer()),
+]
+
+INDEXES = [
+    ("ix_activity_user_started_at", ("user_id", "started_at")),
+    (
+        "ix_activity_user_type_started_at",
+        ("user_id", "type_id", "started_at"),
+    ),
+]
+
+
+def upgrade(engine):
+    if not inspect(engine).has_table("Activity"):
+        return
+    add_columns(engine)
+    create_indexes(engine)
+    backfill(engine)
+
+
+def add_columns(engine):
+    existing = {
+        column["name"] for column in inspect(engine).get_columns("Activity")
+    }
+    with engine.begin() as conn:
+        for name, type_ in COLUMNS:
+            if name in existing:
+                continue
+            ddl = type_.compile(dialect=engine.dialect)
+            sql = f'ALTER TABLE "Activity" ADD COLUMN {name} {ddl}'  # nosec
+            conn.execute(text(sql))
+
+
+def create_indexes(engine):
+    activity = Table("Activity", MetaData(), autoload_with=engine)
+    for name, columns in INDEXES:
+        index = Index(name, *(activity.c[column] for column in columns))
+        index.create(bind=engine, checkfirst=True)
+
+
+def backfill(engine, chunk_size: int = CHUNK_SIZE) -> int:
+    activity = Table("Activity", MetaData(), autoload_with=engine)
+    update = (
+        activity.update()
+        .where(activity.c.id == bindparam("_id"))
+        .values(
+            started_at=bindparam("_started_at"),
+            ended_at=bindparam("_ended_at"),
+            duration_seconds=bindparam("_duration_seconds"),
+        )
+    )
+    query = (
+        select(
+            activity.c.id,
+            activity.c.start_time,
+            activity.c.end_time,
+            activity.c.duration,
+        )
+        .where(activity.c.started_at.is_(None))
+        .order_by(activity.c.id)
+        .limit(chunk_size)
+    )
+
+    last_id = 0
+    converted = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(query.where(activity.c.id > last_id)).all()
+            if not rows:
+                return converted
+            params = []
+            for row in rows:
+                values = typed_times(
+                    row.start_time, row.end_time, row.duration
+                )
+                if any(value is not None for value in values.values()):
+                    item = {f"_{key}": value for key, value in values.items()}
+                    item["_id"] = row.id
+                    params.append(item)
+            if params:
+                conn.execute(update, params)
+            converted += len(params)
+            last_id = rows[-1].id
@@ -0,0 +1,24 @@
+"""Create ``Daily_Activity_Rollups`` and fill it from existing activities.
+
+From this version on the table is maintained by ``crud.activities`` on every
+write, so it only has to be built once here. ``app.cli rebuild-rollups``
+runs the same rebuild to repair it later.
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..crud import activities as crud
+
+VERSION = 2
+
+
+def upgrade(engine):
+    if not inspect(engine).has_table("Activity"):
+        return
+    models.DailyActivityRollup.__table__.create(bind=engine, checkfirst=True)
+    with Session(bind=engine) as db:
+        # Data versions only exist from migration 5 on, and nothing can be
+        # cached against them yet
+        crud.rebuild_rollups(db, bump_versions=False)
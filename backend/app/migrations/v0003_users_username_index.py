@@ -0,0 +1,13 @@
+"""Index ``Users.username``, which login looks users up by."""
+
+from sqlalchemy import Index, MetaData, Table, inspect
+
+VERSION = 3
+
+
+def upgrade(engine):
+    if not inspect(engine).has_table("Users"):
+        return
+    users = Table("Users", MetaData(), autoload_with=engine)
+    index = Index("ix_Users_username", users.c.username)
+    index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,13 @@
+"""Create the ``Refresh_Tokens`` table."""
+
+from sqlalchemy import inspect
+
+from .. import models
+
+VERSION = 4
+
+
+def upgrade(engine):
+    if not inspect(engine).has_table("Users"):
+        return
+    models.RefreshToken.__table__.create(bind=engine, checkfirst=True)
@@ -0,0 +1,16 @@
+"""Create the ``User_Data_Versions`` table.
+
+Users without a row are at version 0; the first write creates it.
+"""
+
+from sqlalchemy import inspect
+
+from .. import models
+
+VERSION = 5
+
+
+def upgrade(engine):
+    if not inspect(engine).has_table("Users"):
+        return
+    models.UserDataVersion.__table__.create(bind=engine, checkfirst=True)
@@ -0,0 +1,26 @@
+"""Add ``token_version`` to ``Users``.
+
+Access tokens are checked against it; existing users start at 0, which is
+the version every token issued so far carries.
+"""
+
+from sqlalchemy import inspect, text
+
+VERSION = 6
+
+
+def upgrade(engine):
+    if not inspect(engine).has_table("Users"):
+        return
+    existing = {
+        column["name"] for column in inspect(engine).get_columns("Users")
+    }
+    if "token_version" in existing:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'ALTER TABLE "Users" ADD COLUMN token_version INTEGER '
+                "NOT NULL DEFAULT 0"
+            )
+        )
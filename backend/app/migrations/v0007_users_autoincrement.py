@@ -0,0 +1,75 @@
+"""Stop SQLite from reusing the ids of deleted users.
+
+Without ``AUTOINCREMENT`` SQLite hands out the largest id plus one, so
+deleting the newest user frees its id for the next sign-up, who would then
+inherit the old user's data version, cached results, ETags and tokens.
+SQLite cannot add ``AUTOINCREMENT`` to an existing table, so ``Users`` is
+rebuilt with its rows copied over. Other databases use sequences, which
+never go back, and are left alone.
+
+The id sequence starts past every user id still referenced elsewhere, so
+ids of users deleted before this migration are not reused either.
+"""
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateTable
+
+from .. import models
+
+VERSION = 7
+
+# Tables keeping a user id after the user is gone
+REFERENCING = [
+    ("Activity", "user_id"),
+    ("Daily_Activity_Rollups", "user_id"),
+    ("Refresh_Tokens", "user_id"),
+    ("User_Data_Versions", "user_id"),
+]
+
+
+def upgrade(engine):
+    if engine.dialect.name != "sqlite":
+        return
+    inspector = inspect(engine)
+    if not inspector.has_table("Users"):
+        return
+    with engine.connect() as conn:
+        sql = conn.execute(
+            text(
+                "SELECT sql FROM sqlite_master"
+                " WHERE type = 'table' AND name = 'Users'"
+            )
+        ).scalar()
+    if "AUTOINCREMENT" in sql.upper():
+        return
+
+    columns = ", ".join(
+        f'"{column["name"]}"' for column in inspector.get_columns("Users")
+    )
+    ids = [("Users", "id")] + [
+        (name, column)
+        for name, column in REFERENCING
+        if inspector.has_table(name)
+    ]
+    table = models.User.__table__.to_metadata(MetaData(), name="Users_new")
+    with engine.begin() as conn:
+        conn.execute(CreateTable(table))
+        conn.execute(
+            text(
+                f'INSERT INTO "Users_new" ({columns})'  # nosec
+                f' SELECT {columns} FROM "Users"'
+            )
+        )
+        conn.execute(text('DROP TABLE "Users"'))
+        conn.execute(text('ALTER TABLE "Users_new" RENAME TO "Users"'))
+        last_id = 0
+        for name, column in ids:
+            sql = f'SELECT MAX({column}) FROM "{name}"'  # nosec
+            last_id = max(last_id, conn.execute(text(sql)).scalar() or 0)
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'Users'"))
+        conn.execute(
+            text("INSERT INTO sqlite_sequence VALUES ('Users', :seq)"),
+            {"seq": last_id},
+        )
+    for index in models.User.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
@@ -1,6 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+)
 from sqlalchemy.orm import relationship
-from .database import Base, engine, SessionLocal
+from .database import Base
 
 
 class ActivityType(Base):
@@ -12,10 +20,17 @@ class ActivityType(Base):
 
 class User(Base):
     __tablename__ = "Users"
+    # Ids of deleted users are never handed out again: data versions, cached
+    # results, ETags and access tokens are all keyed by the user id
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True)
-    username = Column(String(100))
+    username = Column(String(100), index=True)
     email = Column(String(50))
     password = Column(String(200))
+    # Bumped to revoke every access token issued to the user so far
+    token_version = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
 
 
 class Activity(Base):
@@ -29,60 +44,59 @@ class Activity(Base):
     end_time = Column(String(50))
     description = Column(String(2000))
 
+    # Typed copies of the string fields above, used for filtering and sums
+    started_at = Column(DateTime)
+    ended_at = Column(DateTime)
+    duration_seconds = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_activity_user_started_at", "user_id", "started_at"),
+        Index(
+            "ix_activity_user_type_started_at",
+            "user_id",
+            "type_id",
+            "started_at",
+        ),
+    )
+
     # Define the relationship between Activity and ActivityType
     type = relationship("ActivityType")
     user = relationship("User")
 
 
-Base.metadata.create_all(bind=engine)
-# Fill the Users table with some initial data
-
-base_path = "https://raw.githubusercontent.com/Wild-Queue/inno-trackify-icons"
-
-activity_types = [
-    {
-        "id": 1,
-        "name": "Sport",
-        "icon_name": f"{base_path}/main/Sport.jpg",
-    },
-    {
-        "id": 2,
-        "name": "Health",
-        "icon_name": f"{base_path}/main/Health.jpg",
-    },
-    {
-        "id": 3,
-        "name": "Sleep",
-        "icon_name": f"{base_path}/main/Sleep.jpg",
-    },
-    {
-        "id": 4,
-        "name": "Study",
-        "icon_name": f"{base_path}/main/Study.jpg",
-    },
-    {
-        "id": 5,
-        "name": "Rest",
-        "icon_name": f"{base_path}/main/Rest.jpg",
-    },
-    {
-        "id": 6,
-        "name": "Eat",
-        "icon_name": f"{base_path}/main/Eat.jpg",
-    },
-    {
-        "id": 7,
-        "name": "Coding",
-        "icon_name": f"{base_path}/main/Coding.jpg",
-    },
-    {
-        "id": 8,
-        "name": "Other",
-        "icon_name": f"{base_path}/main/Other.jpg",
-    },
-]
-
-db = SessionLocal()
-for activity_type in activity_types:
-    db.merge(ActivityType(**activity_type))
-db.commit()
+# Refresh tokens are stored as HMAC digests, never in plain text. Each
+# login starts a family; rotation revokes the used token and issues the
+# next one in the same family.
+class RefreshToken(Base):
+    __tablename__ = "Refresh_Tokens"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("Users.id"), nullable=False, index=True
+    )
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+
+    user = relationship("User")
+
+
+# Per-day totals kept in step with Activity by crud.activities
+class DailyActivityRollup(Base):
+    __tablename__ = "Daily_Activity_Rollups"
+    user_id = Column(Integer, ForeignKey("Users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    type_id = Column(
+        Integer, ForeignKey("Activity_Types.id"), primary_key=True
+    )
+    total_seconds = Column(Integer, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Counter bumped by every write to a user's activities. Clients cache
+# listings under an ETag derived from it.
+class UserDataVersion(Base):
+    __tablename__ = "User_Data_Versions"
+    user_id = Column(Integer, ForeignKey("Users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,86 @@
+import base64
+import json
+import operator
+from datetime import datetime
+
+from sqlalchemy import or_
+
+# Максимальный размер страницы для списков активностей
+MAX_PAGE_SIZE = 1000
+
+
+# Непрозрачный курсор из ключа сортировки (start_time, id) последней строки
+def encode_cursor(started_at: datetime | None, activity_id: int) -> str:
+    key = [started_at.isoformat() if started_at else None, activity_id]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        started_at, activity_id = json.loads(base64.urlsafe_b64decode(padded))
+        if started_at is not None:
+            started_at = datetime.fromisoformat(started_at)
+        if not isinstance(activity_id, int):
+            raise TypeError(activity_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return started_at, activity_id
+
+
+# Page queries by (started_at, id): dated rows, then undated ones (None once
+# the cursor is past the dated rows). Both seek the (user_id, started_at) index
+def page_queries(query, columns, cursor: str | None, descending: bool):
+    after = operator.lt if descending else operator.gt
+    up_to = operator.le if descending else operator.ge
+    started_at, activity_id = (None, None)
+    if cursor is not None:
+        started_at, activity_id = decode_cursor(cursor)
+    if descending:
+        order = (columns.started_at.desc(), columns.id.desc())
+    else:
+        order = (columns.started_at.asc(), columns.id.asc())
+
+    undated = query.where(columns.started_at.is_(None)).order_by(order[1])
+    if cursor is not None and started_at is None:
+        return undated.where(after(columns.id, activity_id)), None
+
+    dated = query.where(columns.started_at.isnot(None)).order_by(*order)
+    if cursor is not None:
+        dated = dated.where(
+            up_to(columns.started_at, started_at),
+            or_(
+                after(columns.started_at, started_at),
+                after(columns.id, activity_id),
+            ),
+        )
+    return dated, undated
+
+
+# Постраничная выборка по ключу (started_at, id), NULL-даты в конце.
+# query - Core select() со столбцами started_at и id, columns - столбцы
+# таблицы (Table.c). Возвращает строки страницы и курсор следующей
+# страницы (или None).
+def paginate(
+    db,
+    query,
+    columns,
+    limit: int | None,
+    cursor: str | None,
+    descending: bool = True,
+):
+    first, second = page_queries(query, columns, cursor, descending)
+    if limit is None:
+        rows = db.execute(first).all()
+        if second is not None:
+            rows += db.execute(second).all()
+        return rows, None
+
+    rows = db.execute(first.limit(limit + 1)).all()
+    if second is not None and len(rows) <= limit:
+        rows += db.execute(second.limit(limit + 1 - len(rows))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].started_at, rows[-1].id)
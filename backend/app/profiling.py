@@ -0,0 +1,148 @@
+"""Statistical profiling of requests and of the whole app.
+
+A sampler thread reads every thread's stack with ``sys._current_frames()``
+at a fixed interval and counts identical stacks. The result is written in
+the collapsed-stack format (``root;caller;callee count`` per line) that
+flamegraph.pl, speedscope and inferno read directly. Sampling needs no
+tracing hook, so the profiled code runs at full speed apart from the GIL
+the sampler takes briefly at each tick.
+
+The sampler sees all threads, so a profile taken while other requests run
+includes their stacks too. Nothing here runs unless profiling is enabled
+with ``PROFILING_TOKEN``; see ``main.py``.
+"""
+
+import hmac
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from .config import (
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_KEEP,
+    PROFILING_TOKEN,
+)
+
+SAMPLER_THREAD_NAME = "stack-sampler"
+
+# Stored profile names: no path separators or dots beyond the suffix
+PROFILE_NAME = re.compile(r"^[\w-]+\.collapsed$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+# Стек кадров одной строкой, от корня к текущей функции
+def collapse(frame, root: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def render(counts: Counter) -> str:
+    return "".join(
+        f"{stack} {count}\n" for stack, count in sorted(counts.items())
+    )
+
+
+class StackSampler:
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=SAMPLER_THREAD_NAME, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        names = {
+            thread.ident: thread.name for thread in threading.enumerate()
+        }
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            # Skip this and any other sampler running at the same time
+            if name == SAMPLER_THREAD_NAME:
+                continue
+            self.counts[collapse(frame, name)] += 1
+
+
+# Collapsed-stack files in one directory; only the newest ones are kept
+class ProfileStore:
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def new_name(self, label: str) -> str:
+        label = re.sub(r"[^\w-]+", "-", label).strip("-")[:60]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return f"{stamp}-{secrets.token_hex(4)}-{label}"
+
+    def save(self, name: str, counts: Counter) -> str:
+        name = f"{name}.collapsed"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(render(counts))
+        with self._lock:
+            for old in self.list()[self.keep:]:
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+        return name
+
+    # Имена сохранённых профилей, новые первыми
+    def list(self) -> list[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (name for name in names if PROFILE_NAME.match(name)),
+            reverse=True,
+        )
+
+    # Содержимое профиля; None для неизвестного или недопустимого имени
+    def read(self, name: str) -> str | None:
+        if not PROFILE_NAME.match(name):
+            return None
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+# Проверка токена администратора профилирования
+def check_token(token: str | None) -> bool:
+    if not PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_KEEP)
@@ -0,0 +1,72 @@
+"""In-process registry of activity types.
+
+The Activity_Types table is seeded once and practically never changes, so
+it is read into memory at startup and type lookups by id or name never go
+to the database. Every write to the table calls ``invalidate()`` (today
+only ``bootstrap.seed_activity_types`` writes it); the next
+``get_activity_types()`` reloads it.
+"""
+
+import threading
+
+from . import models
+from .database import AsyncSessionLocal
+from .schemas import activities as schemas
+
+
+class ActivityTypeRegistry:
+    def __init__(self):
+        self._version = 0
+        self._loaded_version = None
+        self._by_id: dict[int, schemas.ActivityType] = {}
+        self._by_name: dict[str, schemas.ActivityType] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_version != self._version
+
+    def load(self, db):
+        with self._lock:
+            version = self._version
+            rows = db.query(models.ActivityType).all()
+            types = [schemas.ActivityType.from_orm(row) for row in rows]
+            self._by_id = {type_.id: type_ for type_ in types}
+            self._by_name = {type_.name: type_ for type_ in types}
+            self._loaded_version = version
+
+    def invalidate(self):
+        self._version += 1
+
+    def all(self) -> list[schemas.ActivityType]:
+        return sorted(self._by_id.values(), key=lambda type_: type_.id)
+
+    def get(self, type_id: int) -> schemas.ActivityType | None:
+        return self._by_id.get(type_id)
+
+    def get_by_name(self, name: str) -> schemas.ActivityType | None:
+        return self._by_name.get(name)
+
+    # Идентификаторы типов по именам или id; неизвестный тип - ValueError
+    def resolve(self, values: list[str | int]) -> list[int]:
+        type_ids = []
+        for value in values:
+            if str(value).isdigit():
+                type_ = self.get(int(value))
+            else:
+                type_ = self.get_by_name(value)
+            if type_ is None:
+                raise ValueError(f"Unknown activity type: {value}")
+            type_ids.append(type_.id)
+        return type_ids
+
+
+registry = ActivityTypeRegistry()
+
+
+# Dependency to get the activity type registry, reloaded only when stale
+async def get_activity_types() -> ActivityTypeRegistry:
+    if registry.is_stale:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(registry.load)
+    return registry
@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from datetime import date
+from typing import List
+from pydantic import BaseModel, conlist
+
+# Наибольшее число элементов в одном пакетном запросе
+MAX_BATCH_SIZE = 1000
 
 
 # Схема для входных данных активностей
@@ -32,3 +37,71 @@ class Activity(ActivityBase):
 
     class Config:
         orm_mode = True
+
+
+# Схема для частичного обновления активности (только переданные поля)
+class ActivityPatch(BaseModel):
+    id: int
+    name: str | None = None
+    type_id: int | None = None
+    start_time: str | None = None
+    end_time: str | None = None
+    duration: str | None = None
+    description: str | None = None
+
+
+# Схемы пакетных запросов
+class ActivityBatchCreate(BaseModel):
+    items: conlist(ActivityCreate, min_items=1, max_items=MAX_BATCH_SIZE)
+
+
+class ActivityBatchUpdate(BaseModel):
+    items: conlist(ActivityPatch, min_items=1, max_items=MAX_BATCH_SIZE)
+
+
+class ActivityBatchIds(BaseModel):
+    ids: conlist(int, min_items=1, max_items=MAX_BATCH_SIZE)
+
+
+# Результат для одного элемента пакета; status - как у HTTP-ответа
+class ActivityBatchResult(BaseModel):
+    index: int
+    id: int | None = None
+    status: int
+    detail: str | None = None
+    activity: Activity | None = None
+
+
+# Схема для суммарного времени по типу активности
+class ActivityTypeTotal(BaseModel):
+    type_id: int
+    total_seconds: int
+    count: int
+    average_seconds: float
+
+
+# Схема для суммарного времени по дням
+class ActivityDayTotal(BaseModel):
+    day: date
+    total_seconds: int
+    count: int
+
+
+# Схема для статистики активностей за период
+class ActivityStats(BaseModel):
+    date_from: date | None
+    date_to: date | None
+    total_seconds: int
+    count: int
+    by_type: List[ActivityTypeTotal]
+    by_day: List[ActivityDayTotal]
+
+
+# Схема для типа активности
+class ActivityType(BaseModel):
+    id: int
+    name: str
+    icon_name: str | None
+
+    class Config:
+        orm_mode = True
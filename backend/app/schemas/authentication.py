@@ -5,3 +5,14 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     client_id: int
+    refresh_token: str | None = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+# Authenticated user as described by the access token claims
+class Principal(BaseModel):
+    id: int
+    username: str
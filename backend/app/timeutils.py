@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+
+# Разбор строки с датой и временем ("YYYY-MM-DD HH:MM:SS" и ISO 8601)
+def parse_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# Разбор длительности "HH:MM:SS" (или "MM:SS") в секунды
+def parse_duration(value: str | None) -> int | None:
+    if not value:
+        return None
+    parts = value.strip().split(":")
+    if len(parts) > 3:
+        return None
+    try:
+        numbers = [int(part) for part in parts]
+    except ValueError:
+        return None
+    if any(number < 0 for number in numbers):
+        return None
+    seconds = 0
+    for number in numbers:
+        seconds = seconds * 60 + number
+    return seconds
+
+
+# Форматирование секунд в строку "HH:MM:SS"
+def format_duration(seconds: int) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+# Разбор даты "YYYY-MM-DD"
+def parse_date(value: str | date) -> date:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid date: {value!r}")
+
+
+# Полуоткрытый интервал [начало дня, начало следующего дня)
+def day_bounds(value: str | date) -> tuple[datetime, datetime]:
+    start = datetime.combine(parse_date(value), time.min)
+    return start, start + timedelta(days=1)
+
+
+# Типизированные значения для строковых полей активности
+def typed_times(
+    start_time: str | None, end_time: str | None, duration: str | None
+) -> dict:
+    started_at = parse_datetime(start_time)
+    ended_at = parse_datetime(end_time)
+    duration_seconds = parse_duration(duration)
+    if duration_seconds is None and started_at and ended_at:
+        if ended_at >= started_at:
+            duration_seconds = int((ended_at - started_at).total_seconds())
+    return {
+        "started_at": started_at,
+        "ended_at": ended_at,
+        "duration_seconds": duration_seconds,
+    }
@@ -0,0 +1,2 @@
+"""Micro-benchmarks, run from the repository root, e.g.
+``python -m backend.benchmarks.serialization``."""
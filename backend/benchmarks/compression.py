@@ -0,0 +1,75 @@
+"""Bytes on the wire and CPU cost of response compression.
+
+Builds activity listings as the list endpoints serialize them, with
+descriptions of up to 2000 characters, and compresses each payload with
+the middleware's encoders at several levels. zstd rows appear when the
+``zstandard`` package is installed.
+"""
+
+import argparse
+import random
+import time
+
+from ..app.middleware.compression import ENCODERS
+from ..app.responses import response_fields, serialize_rows
+from ..app.schemas import activities as schemas
+from .serialization import make_rows
+
+LEVELS = {"gzip": (1, 6, 9), "zstd": (1, 3, 10)}
+WORDS = (
+    "morning run park lecture homework algorithms sleep lunch coding review "
+    "gym swim notes project meeting reading calculus break walk dinner team"
+).split()
+
+
+def make_payload(count: int, seed: int = 0) -> bytes:
+    generator = random.Random(seed)
+    rows = make_rows(count)
+    for row in rows:
+        length = generator.randint(0, 2000)
+        text = []
+        while sum(len(word) + 1 for word in text) < length:
+            text.append(generator.choice(WORDS))
+        row.description = " ".join(text)[:length]
+    return serialize_rows(rows, response_fields(schemas.Activity))
+
+
+def best_of(function, repeat: int) -> tuple[float, bytes]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[100, 1000, 5000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'rows':>6} {'encoding':>9} {'level':>5} {'bytes':>10} "
+        f"{'ratio':>6} {'ms':>8} {'MB/s':>7}"
+    )
+    for count in args.rows:
+        payload = make_payload(count)
+        print(f"{count:>6} {'identity':>9} {'':>5} {len(payload):>10}")
+        for encoding, encoder in ENCODERS.items():
+            for level in LEVELS[encoding]:
+                seconds, body = best_of(
+                    lambda: encoder(level).write(payload, final=True),
+                    args.repeat,
+                )
+                print(
+                    f"{count:>6} {encoding:>9} {level:>5} {len(body):>10} "
+                    f"{len(payload) / len(body):>6.1f} {seconds * 1000:>8.2f} "
+                    f"{len(payload) / seconds / 1e6:>7.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
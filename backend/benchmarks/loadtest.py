@@ -0,0 +1,429 @@
+"""HTTP load test of the API served by uvicorn.
+
+Seeds a database with users and activities, starts the app on a free local
+port and drives it with a mixed workload from many concurrent clients, one
+concurrency level at a time. Each level reports requests per second and
+p50/p95/p99 latency per endpoint; the whole run is written as JSON together
+with the commit it was taken on, and ``--compare`` prints the change
+against an earlier report.
+
+    python -m backend.benchmarks.loadtest --concurrency 100,1000 \\
+        --output load.json
+    python -m backend.benchmarks.loadtest --compare load.json
+
+By default the database is a new SQLite file; pass ``--database-url`` for
+Postgres. Seeded users already present are reused as they are. Every
+seeded user logs in once before the clock starts, so the ``login`` share
+of the workload is the only bcrypt work measured, at the server's
+``BCRYPT_ROUNDS``. The clients run in this process on the same machine as
+the server, so at high concurrency part of the CPU goes to the load
+generator itself.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import bcrypt
+import httpx
+
+ROOT = Path(__file__).resolve().parents[2]
+
+PASSWORD = "load-test-password"  # nosec B105
+PAGE_SIZE = 50
+SEED_ROUNDS = 4
+
+DEFAULT_WORKLOAD = "list=6,list_put=1,create=2,login=1"
+
+
+# Запросы нагрузки: метод, путь и аргументы httpx для пользователя
+def login_request(user, rng):
+    data = {"username": user["username"], "password": PASSWORD}
+    return "POST", "/login", {"data": data}
+
+
+def list_request(user, rng):
+    params = {"limit": PAGE_SIZE}
+    return "GET", "/activities/", {"params": params, "headers": user["auth"]}
+
+
+def list_put_request(user, rng):
+    params = {"limit": PAGE_SIZE, "order": rng.choice(("asc", "desc"))}
+    return "PUT", "/activities/", {"params": params, "headers": user["auth"]}
+
+
+def create_request(user, rng):
+    return (
+        "POST",
+        "/activities/",
+        {"json": activity_record(rng, user["id"]), "headers": user["auth"]},
+    )
+
+
+OPERATIONS = {
+    "login": login_request,
+    "list": list_request,
+    "list_put": list_put_request,
+    "create": create_request,
+}
+
+
+def activity_record(rng, user_id: int) -> dict:
+    start = datetime(2024, 1, 1) + timedelta(
+        days=rng.randrange(365), minutes=rng.randrange(24 * 60)
+    )
+    minutes = rng.randrange(10, 180)
+    end = start + timedelta(minutes=minutes)
+    return {
+        "name": f"Activity {rng.randrange(1000)}",
+        "type_id": rng.randint(1, 8),
+        "user_id": user_id,
+        "start_time": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "end_time": end.strftime("%Y-%m-%d %H:%M:%S"),
+        "duration": f"{minutes // 60:02d}:{minutes % 60:02d}:00",
+        "description": "Seeded by the load test",
+    }
+
+
+def parse_workload(text: str) -> dict[str, float]:
+    workload = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        workload[name] = float(weight or 1)
+    return workload
+
+
+# Users load0..loadN with activities_per_user activities each. The app
+# reads its database URL at import, so it is imported only from here.
+# Passwords are hashed with a low cost factor; the warm-up login rehashes
+# them with the server's BCRYPT_ROUNDS, which measured logins then pay.
+def seed(url: str, users: int, activities_per_user: int):
+    os.environ["SQLALCHEMY_DATABASE_URL"] = url
+    from sqlalchemy.orm import sessionmaker
+
+    from ..app.bootstrap import prepare_database
+    from ..app.crud.users import add_user, get_user_by_username
+    from ..app.database import make_engine
+    from ..app.importer import CHUNK_SIZE, validate_record, write_chunk
+    from ..app.schemas.users import UserCreate
+
+    engine = make_engine(url)
+    prepare_database(engine)
+    password = base64.b64encode(
+        bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(SEED_ROUNDS))
+    )
+    rng = random.Random(0)
+    seeded = []
+    with sessionmaker(bind=engine)() as db:
+        for index in range(users):
+            username = f"load{index}"
+            user = get_user_by_username(db, username)
+            if user is None:
+                user = add_user(
+                    db,
+                    UserCreate(
+                        username=username,
+                        email=f"{username}@example.com",
+                        password=PASSWORD,
+                    ),
+                    password,
+                )
+                rows = [
+                    validate_record(activity_record(rng, user.id), user.id)
+                    for _ in range(activities_per_user)
+                ]
+                for start in range(0, len(rows), CHUNK_SIZE):
+                    write_chunk(db, rows[start:start + CHUNK_SIZE])
+            seeded.append({"id": user.id, "username": username})
+    engine.dispose()
+    return seeded
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(url: str, port: int, workers: int):
+    env = {**os.environ, "SQLALCHEMY_DATABASE_URL": url}
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "backend.app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, server, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if server is not None and server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                if (await client.get("/healthz")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout} s")
+
+
+async def log_in(client, users: list[dict]):
+    for user in users:
+        method, path, kwargs = login_request(user, None)
+        response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        user["auth"] = {"Authorization": f"Bearer {token}"}
+
+
+async def run_client(client, user, rng, workload, deadline, samples):
+    names = list(workload)
+    weights = list(workload.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, kwargs = OPERATIONS[name](user, rng)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        samples.append((name, status, time.perf_counter() - start))
+
+
+# Значение перцентиля по отсортированному списку (nearest rank)
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(samples: list[tuple], elapsed: float) -> dict:
+    by_operation = {}
+    for name, status, seconds in samples:
+        latencies, statuses = by_operation.setdefault(name, ([], {}))
+        latencies.append(seconds)
+        statuses[status] = statuses.get(status, 0) + 1
+    endpoints = {}
+    for name, (latencies, statuses) in sorted(by_operation.items()):
+        latencies.sort()
+        errors = sum(
+            count
+            for status, count in statuses.items()
+            if not status.isdigit() or int(status) >= 400
+        )
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "statuses": statuses,
+            "throughput": len(latencies) / elapsed,
+            "mean_ms": sum(latencies) / len(latencies) * 1000,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        }
+    return {
+        "requests": len(samples),
+        "throughput": len(samples) / elapsed,
+        "endpoints": endpoints,
+    }
+
+
+async def run_level(base_url, users, workload, concurrency, duration, seed):
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    samples = []
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(
+            *(
+                run_client(
+                    client,
+                    users[index % len(users)],
+                    random.Random(seed + index),
+                    workload,
+                    deadline,
+                    samples,
+                )
+                for index in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "duration": elapsed,
+        **summarize(samples, elapsed),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    print(
+        f"{'clients':>7} {'operation':<10} {'req/s':>9} {'errors':>7} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+        file=sys.stderr,
+    )
+    for run in report["runs"]:
+        for name, stats in run["endpoints"].items():
+            print(
+                f"{run['concurrency']:>7} {name:<10} "
+                f"{stats['throughput']:>9.1f} {stats['errors']:>7} "
+                f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f}",
+                file=sys.stderr,
+            )
+
+
+# Изменение пропускной способности и p95 относительно прошлого отчёта
+def print_comparison(old: dict, new: dict):
+    print(
+        f"{(old.get('commit') or '?')[:10]} -> "
+        f"{(new.get('commit') or '?')[:10]}",
+        file=sys.stderr,
+    )
+    old_runs = {run["concurrency"]: run for run in old["runs"]}
+    for run in new["runs"]:
+        old_run = old_runs.get(run["concurrency"])
+        if old_run is None:
+            continue
+        for name, stats in run["endpoints"].items():
+            before = old_run["endpoints"].get(name)
+            if before is None:
+                continue
+            print(
+                f"{run['concurrency']:>7} {name:<10} req/s "
+                f"{before['throughput']:.1f} -> {stats['throughput']:.1f}, "
+                f"p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms",
+                file=sys.stderr,
+            )
+
+
+async def run(args, database_url: str) -> dict:
+    users = seed(database_url, args.users, args.activities)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(database_url, port, args.workers)
+    try:
+        await wait_until_ready(base_url, server)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            await log_in(client, users)
+        runs = []
+        for concurrency in args.concurrency:
+            runs.append(
+                await run_level(
+                    base_url,
+                    users,
+                    args.workload,
+                    concurrency,
+                    args.duration,
+                    args.seed,
+                )
+            )
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "database": database_url.split(":", 1)[0],
+        "settings": {
+            "users": args.users,
+            "activities_per_user": args.activities,
+            "workers": args.workers,
+            "duration": args.duration,
+            "workload": args.workload,
+        },
+        "runs": runs,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda text: [int(level) for level in text.split(",")],
+        default=[100, 1000],
+        help="Comma separated numbers of concurrent clients",
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument(
+        "--workload",
+        type=parse_workload,
+        default=parse_workload(DEFAULT_WORKLOAD),
+        help=f"Operation weights, default {DEFAULT_WORKLOAD}",
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--activities", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument(
+        "--compare", type=Path, help="Earlier report to compare against"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = (
+            args.database_url or f"sqlite:///{Path(directory) / 'load.db'}"
+        )
+        report = asyncio.run(run(args, database_url))
+
+    print_report(report)
+    if args.compare:
+        print_comparison(json.loads(args.compare.read_text()), report)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
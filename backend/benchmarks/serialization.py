@@ -0,0 +1,83 @@
+"""Compare the default list response path with the orjson fast path.
+
+The default path is what FastAPI does for ``response_model=List[Activity]``:
+validate every ORM object through pydantic, run ``jsonable_encoder`` and
+render with the stdlib ``json``. The fast path is ``serialize_rows`` into
+an ``ORJSONResponse``. Both start from the same ORM objects.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from ..app import models
+from ..app.responses import ORJSONResponse, response_fields, serialize_rows
+from ..app.schemas import activities as schemas
+
+FIELD = create_response_field(name="Response", type_=List[schemas.Activity])
+FIELDS = response_fields(schemas.Activity)
+
+
+def make_rows(count: int) -> list[models.Activity]:
+    return [
+        models.Activity(
+            id=index,
+            name=f"Activity {index}",
+            type_id=1 + index % 8,
+            user_id=1,
+            start_time="2024-04-01 10:00:00",
+            end_time="2024-04-01 11:00:00",
+            duration="01:00:00",
+            description="Morning session in the park",
+        )
+        for index in range(count)
+    ]
+
+
+def default_path(rows) -> bytes:
+    content = asyncio.run(
+        serialize_response(field=FIELD, response_content=rows)
+    )
+    return JSONResponse(content).body
+
+
+def fast_path(rows) -> bytes:
+    return ORJSONResponse(serialize_rows(rows, FIELDS)).body
+
+
+def best_of(function, rows, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[100, 1000, 5000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>8} {'default ms':>12} {'orjson ms':>10} {'speedup':>8}")
+    for count in args.rows:
+        rows = make_rows(count)
+        assert len(default_path(rows)) > 0 and len(fast_path(rows)) > 0
+        default = best_of(default_path, rows, args.repeat)
+        fast = best_of(fast_path, rows, args.repeat)
+        print(
+            f"{count:>8} {default * 1000:>12.2f} {fast * 1000:>10.2f} "
+            f"{default / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
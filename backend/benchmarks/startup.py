@@ -0,0 +1,80 @@
+"""Time from importing the app to its first served request.
+
+Each run starts a fresh interpreter that imports ``backend.app.main``,
+runs the lifespan startup through ``TestClient`` and serves
+``GET /healthz``. Cold runs use a new SQLite database, so tables, migrations
+and the seed are all created; warm runs reuse it and only check versions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from backend.app.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    started = time.perf_counter()
+    assert client.get("/healthz").status_code == 200
+    served = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "startup": started - imported,
+    "first_request": served - started,
+    "total": served - start,
+}))
+"""
+
+PHASES = ("import", "startup", "first_request", "total")
+
+
+def run_once(database: Path) -> dict:
+    env = {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URL": f"sqlite:///{database}",
+        "PASSWORD_HASH_WORKERS": "0",
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = {"cold": [], "warm": []}
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(args.repeat):
+            database = Path(directory) / f"startup-{index}.db"
+            results["cold"].append(run_once(database))
+            results["warm"].append(run_once(database))
+
+    print(f"{'run':>5} " + " ".join(f"{phase:>14}" for phase in PHASES))
+    for name, runs in results.items():
+        medians = [
+            statistics.median(run[phase] for run in runs) * 1000
+            for phase in PHASES
+        ]
+        print(f"{name:>5} " + " ".join(f"{ms:>11.1f} ms" for ms in medians))
+
+
+if __name__ == "__main__":
+    main()
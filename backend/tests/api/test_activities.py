@@ -1,12 +1,20 @@
+import asyncio
 import pytest
+from datetime import date
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
-from backend.app.api.activities import get_current_user
-from backend.app.api.activities import router, get_db
+from unittest.mock import AsyncMock, MagicMock, patch
+from backend.app.api.activities import get_current_user, get_activity_stats
+from backend.app.api.activities import create_activities, delete_activities
+from backend.app.api.activities import update_activities
+from backend.app.registry import ActivityTypeRegistry
+from backend.app.schemas import activities as schemas
+from backend.app.api.activities import router
 from starlette.status import HTTP_401_UNAUTHORIZED
 from sqlalchemy.orm import Session
 from backend.app.database import engine
-from fastapi import HTTPException
+from fastapi import FastAPI, HTTPException
+from backend.app.database import get_async_db
+from backend.app.registry import get_activity_types
 
 
 @pytest.fixture
@@ -29,29 +37,29 @@ def token():
     return "valid_token"
 
 
-def test_get_current_user_authenticated(token, db_session):
+def test_get_current_user_authenticated(token):
     with patch(
-        "backend.app.api.activities.authenticate_user"
+        "backend.app.api.activities.authenticate_user", new_callable=AsyncMock
     ) as mock_authenticate_user:
         # Mock the return value of authenticate_user
         mock_authenticate_user.return_value = {"username": "test_user"}
 
         # Call the function with a valid token
-        user = get_current_user(token=token, db=db_session)
+        user = asyncio.run(get_current_user(token=token, db=MagicMock()))
 
         # Assertions
         assert user == {"username": "test_user"}
 
 
-def test_get_current_user_unauthenticated(token, db_session):
+def test_get_current_user_unauthenticated(token):
     with patch(
-        "backend.app.api.activities.authenticate_user"
+        "backend.app.api.activities.authenticate_user", new_callable=AsyncMock
     ) as mock_authenticate_user:
         mock_authenticate_user.return_value = None
 
         # Call the function with an invalid token
         with pytest.raises(HTTPException) as exc_info:
-            get_current_user(token=token, db=db_session)
+            asyncio.run(get_current_user(token=token, db=MagicMock()))
 
         # Assertions
         assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
@@ -62,24 +70,168 @@ def test_get_current_user_unauthenticated(token, db_session):
 @pytest.fixture(autouse=True)
 def mock_authenticate_activity():
     with patch(
-        "backend.app.api.activities.authenticate_user", MagicMock()
+        "backend.app.api.activities.authenticate_user", AsyncMock()
     ) as mock_authenticate_activity:
         yield mock_authenticate_activity
 
 
-def test_get_db():
-    # Call the get_db function to get the generator
-    db_gen = get_db()
-    # Get the database session by calling next() on the generator
-    db = next(db_gen)
-    # Assertions
-    assert db is not None  # Check if the database session is created
-    # Ensure that the session is closed after yielding
-    try:
-        next(db_gen)  # Attempt to get the next item from the generator
-    except StopIteration:
-        pass
-    else:
-        assert (
-            False
-        ), "Generator should be exhausted after yielding the database session"
+def test_get_activity_stats_invalid_range(db_session):
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(
+            get_activity_stats(
+                date_from=date(2024, 4, 2),
+                date_to=date(2024, 4, 1),
+                db=db_session,
+                current_user=MagicMock(id=1),
+            )
+        )
+    assert exc_info.value.status_code == 400
+
+
+def batch_item(user_id=1, type_id=1):
+    return schemas.ActivityCreate(
+        name="run",
+        description="",
+        type_id=type_id,
+        user_id=user_id,
+        start_time="2024-04-01 10:00:00",
+        end_time="2024-04-01 11:00:00",
+        duration="01:00:00",
+    )
+
+
+def test_create_activities_per_item_results():
+    types = ActivityTypeRegistry()
+    types._by_id = {1: schemas.ActivityType(id=1, name="Sport", icon_name="")}
+    created = MagicMock(
+        id=7,
+        user_id=1,
+        type_id=1,
+        start_time="2024-04-01 10:00:00",
+        end_time="2024-04-01 11:00:00",
+        duration="01:00:00",
+        description="",
+    )
+    created.name = "run"
+    with patch(
+        "backend.app.api.activities.crud.create_activities_async",
+        return_value=[created],
+    ) as mock_create:
+        results = asyncio.run(
+            create_activities(
+                batch=schemas.ActivityBatchCreate(
+                    items=[
+                        batch_item(user_id=2),
+                        batch_item(),
+                        batch_item(type_id=99),
+                    ]
+                ),
+                types=types,
+                db=MagicMock(),
+                current_user=MagicMock(id=1),
+            )
+        )
+    assert [result.status for result in results] == [403, 201, 400]
+    assert results[1].id == 7
+    assert results[1].activity.name == "run"
+    assert len(mock_create.call_args.args[1]) == 1
+
+
+def test_update_activities_per_item_results():
+    types = ActivityTypeRegistry()
+    types._by_id = {1: schemas.ActivityType(id=1, name="Sport", icon_name="")}
+    updated = MagicMock(
+        id=1,
+        user_id=1,
+        type_id=1,
+        start_time="2024-04-01 10:00:00",
+        end_time="2024-04-01 11:00:00",
+        duration="01:00:00",
+        description="",
+    )
+    updated.name = "run"
+    with patch(
+        "backend.app.api.activities.crud.update_activities_async",
+        return_value={1: updated},
+    ):
+        results = asyncio.run(
+            update_activities(
+                batch=schemas.ActivityBatchUpdate(
+                    items=[
+                        schemas.ActivityPatch(id=1, name="run"),
+                        schemas.ActivityPatch(id=2, name="walk"),
+                        schemas.ActivityPatch(id=3, type_id=99),
+                    ]
+                ),
+                types=types,
+                db=MagicMock(),
+                current_user=MagicMock(id=1),
+            )
+        )
+    assert [(result.id, result.status) for result in results] == [
+        (1, 200),
+        (2, 404),
+        (3, 400),
+    ]
+    assert results[0].activity.name == "run"
+
+
+def test_delete_activities_per_item_results():
+    with patch(
+        "backend.app.api.activities.crud.delete_activities_async",
+        return_value={1},
+    ):
+        results = asyncio.run(
+            delete_activities(
+                batch=schemas.ActivityBatchIds(ids=[1, 2]),
+                db=MagicMock(),
+                current_user=MagicMock(id=1),
+            )
+        )
+    assert [(result.id, result.status) for result in results] == [
+        (1, 200),
+        (2, 404),
+    ]
+
+
+@pytest.fixture
+def app_client():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = lambda: MagicMock()
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id=1)
+    app.dependency_overrides[get_activity_types] = ActivityTypeRegistry
+    return TestClient(app)
+
+
+def test_list_activities_conditional_get(app_client):
+    with patch(
+        "backend.app.api.activities.crud.get_data_version_async",
+        return_value=3,
+    ) as mock_version, patch(
+        "backend.app.api.activities.crud.query_activities_async",
+        return_value=([], None),
+    ) as mock_query:
+        response = app_client.get("/activities/?limit=10")
+        etag = response.headers["ETag"]
+        assert response.status_code == 200
+        assert response.json() == []
+
+        response = app_client.get(
+            "/activities/?limit=10", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert mock_query.call_count == 1
+
+        # Another query or a new data version gives another ETag
+        other = app_client.get(
+            "/activities/?limit=20", headers={"If-None-Match": etag}
+        )
+        assert other.status_code == 200
+        mock_version.return_value = 4
+        changed = app_client.put(
+            "/activities/?limit=10", headers={"If-None-Match": etag}
+        )
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
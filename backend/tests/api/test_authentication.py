@@ -1,48 +1,57 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
-from backend.app.api.authentication import router, get_db
+from unittest.mock import AsyncMock, MagicMock, patch
+from backend.app import models
+from backend.app.api.authentication import router
+from backend.app.crud.authentication import token_versions
+from backend.app.database import get_async_db
 from backend.app.api.authentication import authenticate_user
-from sqlalchemy.orm import Session
-from fastapi import HTTPException
+from fastapi import FastAPI
+from backend.app.schemas.authentication import Principal
 
 
 @pytest.fixture
 def client():
-    return TestClient(router)
-
-
-def test_get_db():
-    # Call the get_db function to get the generator
-    db_gen = get_db()
-    # Get the database session by calling next() on the generator
-    db = next(db_gen)
-    # Assertions
-    assert db is not None  # Check if the database session is created
-    # Ensure that the session is closed after yielding
-    try:
-        next(db_gen)  # Attempt to get the next item from the generator
-    except StopIteration:
-        pass
-    else:
-        assert (
-            False
-        ), "Generator should be exhausted after yielding the database session"
-
-
-@patch("backend.app.api.authentication.crud_auth.get_user_username_password")
-@patch("backend.app.api.authentication.crud_users.get_user_by_username")
+    # Yield dependencies need the exit stack that only FastAPI sets up
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = lambda: MagicMock()
+    return TestClient(app)
+
+
+class SyncSessionRunner:
+    # The one AsyncSession method the token check uses, over a sync session
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args):
+        return fn(self.session, *args)
+
+
+@pytest.fixture
+def users_db(sqlite_db):
+    token_versions.clear()
+    sqlite_db.add(models.User(id=1, username="testuser", password=b""))
+    sqlite_db.commit()
+    return SyncSessionRunner(sqlite_db)
+
+
+@patch(
+    "backend.app.api.authentication.crud_auth.create_refresh_token_async",
+    return_value="refresh",
+)
+@patch("backend.app.api.authentication.crud_auth.get_user_username_password_async")
 def test_create_access_token_valid_user(
-    mock_get_user, mock_get_user_by_username, client
+    mock_get_user, mock_refresh, client, users_db
 ):
-    # Mocking the user object returned by get_user_username_password
+    # Mocking the user object returned by get_user_username_password_async
     mock_user = MagicMock()
     mock_user.username = "testuser"
     mock_user.id = 1
+    mock_user.token_version = 0
     mock_get_user.return_value = mock_user
 
-    mock_get_user_by_username.return_value = mock_user
-
     response = client.post(
         "/login",
         data={"username": "testuser", "password": "testpass"},  # NOSONAR
@@ -50,84 +59,127 @@ def test_create_access_token_valid_user(
     assert response.status_code == 200
     assert "access_token" in response.json()
     assert response.json()["token_type"] == "bearer"
+    assert response.json()["client_id"] == 1
+    assert response.json()["refresh_token"] == "refresh"
+
+    principal = asyncio.run(
+        authenticate_user(users_db, response.json()["access_token"])
+    )
+    assert principal.id == 1
+    assert principal.username == "testuser"
 
 
-@patch("backend.app.api.authentication.crud_auth.get_user_username_password")
+@patch("backend.app.api.authentication.crud_auth.get_user_username_password_async")
 def test_create_access_token_invalid_user(mock_get_user, client):
     # Mocking return value for invalid user
     mock_get_user.return_value = None
 
-    with pytest.raises(HTTPException) as exc_info:
-        client.post(
-            "/login",
-            data={"username": "invalid", "password": "invalid"},  # NOSONAR
-        )
+    response = client.post(
+        "/login",
+        data={"username": "invalid", "password": "invalid"},  # NOSONAR
+    )
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Incorrect username or password"
+
+
+@patch("backend.app.api.authentication.crud_auth.rotate_refresh_token_async")
+def test_refresh_access_token(mock_rotate, client, users_db):
+    mock_user = MagicMock()
+    mock_user.username = "testuser"
+    mock_user.id = 1
+    mock_user.token_version = 0
+    mock_rotate.return_value = (mock_user, "next")
+
+    response = client.post(
+        "/token/refresh", json={"refresh_token": "old"}
+    )
+    assert response.status_code == 200
+    assert response.json()["refresh_token"] == "next"
+    principal = asyncio.run(
+        authenticate_user(users_db, response.json()["access_token"])
+    )
+    assert principal.id == 1
+
 
-    assert exc_info.value.status_code == 401
-    assert exc_info.value.detail == "Incorrect username or password"
+@patch(
+    "backend.app.api.authentication.crud_auth.rotate_refresh_token_async",
+    return_value=None,
+)
+def test_refresh_access_token_invalid(mock_rotate, client):
+    response = client.post(
+        "/token/refresh", json={"refresh_token": "old"}
+    )
+    assert response.status_code == 401
+
+
+@patch("backend.app.api.authentication.crud_auth.revoke_refresh_token_async")
+def test_logout(mock_revoke, client):
+    response = client.post("/logout", json={"refresh_token": "old"})
+    assert response.status_code == 200
+    assert mock_revoke.call_args.args[1] == "old"
 
 
 def test_authenticate_user_valid_token():
-    # Mocking dependencies and database session
-    db_mock = MagicMock(spec=Session)
     token = "valid_token"
-    username = "test_user"
+    db = MagicMock()
 
-    # Mocking get_username_from_token to return a valid username
+    # Mocking get_principal_from_token to return a principal
     with patch(
-        "backend.app.api.authentication.crud_auth.get_username_from_token"
-    ) as mock_get_username:
-        mock_get_username.return_value = username
-
-        # Mocking get_user_by_username to return a user object
-        with patch(
-            "backend.app.api.authentication.crud_users.get_user_by_username"
-        ) as mock_get_user:
-            user_mock = MagicMock()
-            mock_get_user.return_value = user_mock
+        "backend.app.api.authentication.crud_auth"
+        ".get_principal_from_token_async",
+        new_callable=AsyncMock,
+    ) as mock_get_principal:
+        principal = Principal(id=1, username="test_user")
+        mock_get_principal.return_value = principal
 
-            # Call the authenticate_user function
-            result = authenticate_user(db_mock, token)
+        # Call the authenticate_user function
+        result = asyncio.run(authenticate_user(db, token))
 
-            # Assertions
-            assert result == user_mock
-            mock_get_username.assert_called_once_with(token)
-            mock_get_user.assert_called_once_with(db_mock, username)
+        # Assertions
+        assert result == principal
+        mock_get_principal.assert_called_once_with(db, token)
 
 
 def test_authenticate_user_invalid_token():
-    # Mocking dependencies and database session
-    db_mock = MagicMock(spec=Session)
     token = "invalid_token"
+    db = MagicMock()
 
-    # Mocking get_username_from_token to return None (invalid token)
+    # Mocking get_principal_from_token to return None (invalid token)
     with patch(
-        "backend.app.api.authentication.crud_auth.get_username_from_token"
-    ) as mock_get_username:
-        mock_get_username.return_value = None
+        "backend.app.api.authentication.crud_auth"
+        ".get_principal_from_token_async",
+        new_callable=AsyncMock,
+    ) as mock_get_principal:
+        mock_get_principal.return_value = None
 
         # Call the authenticate_user function
-        result = authenticate_user(db_mock, token)
+        result = asyncio.run(authenticate_user(db, token))
 
         # Assertions
         assert result is None
-        mock_get_username.assert_called_once_with(token)
+        mock_get_principal.assert_called_once_with(db, token)
 
 
 def test_authenticate_user_exception():
-    # Mocking dependencies and database session
-    db_mock = MagicMock(spec=Session)
     token = "valid_token"
+    db = MagicMock()
 
-    # Mocking get_username_from_token to raise an exception
+    # Mocking get_principal_from_token to raise an exception
     with patch(
-        "backend.app.api.authentication.crud_auth.get_username_from_token"
-    ) as mock_get_username:
-        mock_get_username.side_effect = Exception("An error occurred")
+        "backend.app.api.authentication.crud_auth"
+        ".get_principal_from_token_async",
+        new_callable=AsyncMock,
+    ) as mock_get_principal:
+        mock_get_principal.side_effect = Exception("An error occurred")
 
         # Call the authenticate_user function
-        result = authenticate_user(db_mock, token)
+        result = asyncio.run(authenticate_user(db, token))
 
         # Assertions
         assert result is None
-        mock_get_username.assert_called_once_with(token)
+        mock_get_principal.assert_called_once_with(db, token)
+
+
+def test_authenticate_user_garbage_token(users_db):
+    assert asyncio.run(authenticate_user(users_db, "not-a-jwt")) is None
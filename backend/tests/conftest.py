@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+# Hash passwords inline so tests can patch bcrypt and need no worker pool
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+
+# Fail any test whose requests leave pooled connections checked out
+@pytest.fixture(autouse=True)
+def no_connection_leaks():
+    from backend.app.middleware.leaks import leak_detector
+
+    with leak_detector.expect_no_leaks():
+        yield
+
+
+# Fail any test whose requests run the same SELECT more than once (N+1)
+@pytest.fixture(autouse=True)
+def no_repeated_queries():
+    from backend.app.middleware.queries import query_tracer
+
+    with query_tracer.expect_no_repeats():
+        yield
+
+
+# Start every test with an empty result cache: tests reuse user ids and
+# data versions across separate databases
+@pytest.fixture(autouse=True)
+def empty_result_cache():
+    from backend.app.cache import result_cache
+
+    result_cache.clear()
+    yield
+
+
+# In-memory database with every table. Unittest test cases get it as
+# self.engine and self.db; the session is closed and the engine disposed
+# after the test.
+@pytest.fixture
+def sqlite_db(request):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from backend.app import models
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = Session(bind=engine)
+    if request.instance is not None:
+        request.instance.engine = engine
+        request.instance.db = session
+    yield session
+    session.close()
+    engine.dispose()
@@ -1,16 +1,36 @@
 import unittest
+from datetime import date, datetime
 from unittest.mock import patch
 
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
 from backend.app import models
 from backend.app.schemas import activities as schemas
 from backend.app.crud.activities import (
+    ActivityRecord,
     get_activities,
+    query_activities,
+    get_activity_stats,
     get_activity,
     update_activity,
     delete_activity,
     create_activity,
+    rebuild_rollups,
+    get_activities_by_ids,
+    create_activities,
+    update_activities,
+    delete_activities,
+    get_data_version,
+    create_activity_async,
+    get_activity_async,
+    query_activities_async,
+    get_activity_stats_async,
+    update_activity_async,
+    delete_activity_async,
 )
 
 
@@ -19,11 +39,12 @@ class TestActivityFunctions(unittest.TestCase):
     def setUp(self):
         self.db = Session()
 
-    @patch("sqlalchemy.orm.Session.query")
-    def test_get_activities(self, mock_query):
-        mock_query.return_value.filter.return_value.all.return_value = []
-        activities = get_activities(self.db, user_id=1)
+    @patch("sqlalchemy.orm.Session.execute")
+    def test_get_activities(self, mock_execute):
+        mock_execute.return_value.all.return_value = []
+        activities, next_cursor = get_activities(self.db, user_id=1)
         self.assertEqual(activities, [])
+        self.assertIsNone(next_cursor)
 
     @patch("sqlalchemy.orm.Session.query")
     def test_get_activity(self, mock_query):
@@ -37,10 +58,13 @@ class TestActivityFunctions(unittest.TestCase):
         self.assertEqual(activity.name, "test activity")
         self.assertEqual(activity.description, "test description")
 
+    @patch("backend.app.crud.activities.bump_data_versions")
     @patch("sqlalchemy.orm.Session.add")
     @patch("sqlalchemy.orm.Session.commit")
     @patch("sqlalchemy.orm.Session.refresh")
-    def test_create_activity(self, mock_refresh, mock_commit, mock_add):
+    def test_create_activity(
+        self, mock_refresh, mock_commit, mock_add, mock_bump
+    ):
         activity = schemas.ActivityCreate(
             name="test activity",
             description="test description",
@@ -53,6 +77,40 @@ class TestActivityFunctions(unittest.TestCase):
         created_activity = create_activity(self.db, activity)
         self.assertEqual(created_activity.name, "test activity")
         self.assertEqual(created_activity.description, "test description")
+        self.assertIsNone(created_activity.started_at)
+        self.assertEqual(created_activity.duration_seconds, 90)
+        mock_bump.assert_called_once_with(self.db, [2])
+
+    @patch("backend.app.crud.activities.bump_data_versions")
+    @patch("backend.app.crud.activities.apply_rollup_deltas")
+    @patch("sqlalchemy.orm.Session.add")
+    @patch("sqlalchemy.orm.Session.commit")
+    @patch("sqlalchemy.orm.Session.refresh")
+    def test_create_activity_typed_times(
+        self, mock_refresh, mock_commit, mock_add, mock_rollup, mock_bump
+    ):
+        activity = schemas.ActivityCreate(
+            name="test activity",
+            description="test description",
+            type_id=1,
+            user_id=2,
+            start_time="2024-04-01 12:30:00",
+            end_time="2024-04-01 14:00:00",
+            duration="01:30:00",
+        )
+        created_activity = create_activity(self.db, activity)
+        self.assertEqual(
+            created_activity.started_at, datetime(2024, 4, 1, 12, 30)
+        )
+        self.assertEqual(created_activity.ended_at, datetime(2024, 4, 1, 14))
+        self.assertEqual(created_activity.duration_seconds, 5400)
+        mock_rollup.assert_called_once_with(
+            self.db, {(2, date(2024, 4, 1), 1): (5400, 1)}
+        )
+
+    def test_query_activities_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            query_activities(self.db, 1, cursor="not-a-cursor")
 
     @patch("sqlalchemy.orm.Session.query")
     @patch("sqlalchemy.orm.Session.commit")
@@ -110,3 +168,382 @@ class TestActivityFunctions(unittest.TestCase):
         mock_query.return_value.filter.return_value.first.return_value = None
         response = delete_activity(self.db, 1)
         self.assertEqual(response, {"message": "Activity not found"})
+
+
+@pytest.mark.usefixtures("sqlite_db")
+class TestActivityStats(unittest.TestCase):
+
+    def setUp(self):
+        for name, type_id, start, duration in [
+            ("run", 1, "2024-04-01 10:00:00", "01:00:00"),
+            ("swim", 1, "2024-04-02 10:00:00", "00:30:00"),
+            ("read", 4, "2024-04-02 20:00:00", "02:00:00"),
+            ("old", 4, "2024-03-01 20:00:00", "05:00:00"),
+        ]:
+            create_activity(
+                self.db,
+                schemas.ActivityCreate(
+                    name=name,
+                    description="",
+                    type_id=type_id,
+                    user_id=1,
+                    start_time=start,
+                    end_time=start,
+                    duration=duration,
+                ),
+            )
+        create_activity(
+            self.db,
+            schemas.ActivityCreate(
+                name="other user",
+                description="",
+                type_id=1,
+                user_id=2,
+                start_time="2024-04-01 10:00:00",
+                end_time="2024-04-01 10:00:00",
+                duration="09:00:00",
+            ),
+        )
+
+    def test_get_activity_stats(self):
+        stats = get_activity_stats(
+            self.db, 1, date(2024, 4, 1), date(2024, 4, 3)
+        )
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.total_seconds, 12600)
+        self.assertEqual(
+            [(t.type_id, t.total_seconds, t.count) for t in stats.by_type],
+            [(1, 5400, 2), (4, 7200, 1)],
+        )
+        self.assertEqual(stats.by_type[0].average_seconds, 2700)
+        self.assertEqual(
+            [(d.day, d.total_seconds) for d in stats.by_day],
+            [(date(2024, 4, 1), 3600), (date(2024, 4, 2), 9000)],
+        )
+
+    def test_get_activity_stats_whole_history(self):
+        stats = get_activity_stats(self.db, 1)
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(len(stats.by_day), 3)
+
+    def _rollups(self):
+        return sorted(
+            (row.user_id, row.day, row.type_id, row.total_seconds, row.count)
+            for row in self.db.query(models.DailyActivityRollup)
+            if row.count
+        )
+
+    def test_rollups_follow_update_and_delete(self):
+        activity = (
+            self.db.query(models.Activity)
+            .filter(models.Activity.name == "swim")
+            .first()
+        )
+        update_activity(
+            self.db, activity.id, schemas.ActivityUpdate(name="swim", type_id=2)
+        )
+        stats = get_activity_stats(self.db, 1, date(2024, 4, 2))
+        self.assertEqual(
+            [(t.type_id, t.total_seconds) for t in stats.by_type],
+            [(2, 1800), (4, 7200)],
+        )
+
+        delete_activity(self.db, activity.id)
+        stats = get_activity_stats(self.db, 1, date(2024, 4, 2))
+        self.assertEqual([t.type_id for t in stats.by_type], [4])
+
+    def test_rebuild_rollups_matches_incremental(self):
+        incremental = self._rollups()
+        rebuild_rollups(self.db)
+        self.assertEqual(self._rollups(), incremental)
+
+        rebuild_rollups(self.db, user_id=2)
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_rebuild_rollups_bumps_data_versions(self):
+        before = {user_id: get_data_version(self.db, user_id) for user_id in (1, 2)}
+        rebuild_rollups(self.db, user_id=2)
+        self.assertEqual(get_data_version(self.db, 1), before[1])
+        self.assertEqual(get_data_version(self.db, 2), before[2] + 1)
+
+        rebuild_rollups(self.db)
+        self.assertEqual(get_data_version(self.db, 1), before[1] + 1)
+        self.assertEqual(get_data_version(self.db, 2), before[2] + 2)
+
+
+@pytest.mark.usefixtures("sqlite_db")
+class TestActivityPagination(unittest.TestCase):
+
+    def setUp(self):
+        for name, start in [
+            ("a", "2024-04-01 10:00:00"),
+            ("b", "2024-04-03 10:00:00"),
+            ("c", "2024-04-02 10:00:00"),
+            ("d", "2024-04-02 10:00:00"),
+            ("e", "someday"),
+            ("f", "2024-04-04 10:00:00"),
+        ]:
+            create_activity(
+                self.db,
+                schemas.ActivityCreate(
+                    name=name,
+                    description="",
+                    type_id=1,
+                    user_id=1,
+                    start_time=start,
+                    end_time=start,
+                    duration="00:10:00",
+                ),
+            )
+
+    def test_pages_cover_everything_in_order(self):
+        names = []
+        cursor = None
+        pages = 0
+        while True:
+            page, cursor = get_activities(self.db, 1, limit=2, cursor=cursor)
+            names.extend(activity.name for activity in page)
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(names, ["f", "b", "d", "c", "a", "e"])
+        self.assertEqual(pages, 3)
+
+    def test_returns_records_outside_the_session(self):
+        self.db.expunge_all()
+        page, _ = get_activities(self.db, 1, limit=2)
+        self.assertIsInstance(page[0], ActivityRecord)
+        self.assertEqual(page[0].name, "f")
+        self.assertEqual(len(self.db.identity_map), 0)
+
+    def test_without_limit_returns_all(self):
+        page, cursor = get_activities(self.db, 1)
+        self.assertEqual(len(page), 6)
+        self.assertIsNone(cursor)
+
+    def test_date_filter_is_paginated(self):
+        day = {"date_from": date(2024, 4, 2), "date_to": date(2024, 4, 3)}
+        page, cursor = query_activities(self.db, 1, limit=1, **day)
+        self.assertEqual([activity.name for activity in page], ["d"])
+        page, cursor = query_activities(
+            self.db, 1, limit=1, cursor=cursor, **day
+        )
+        self.assertEqual([activity.name for activity in page], ["c"])
+        self.assertIsNone(cursor)
+
+    def test_ascending_order(self):
+        names = []
+        cursor = None
+        while True:
+            page, cursor = query_activities(
+                self.db, 1, order="asc", limit=4, cursor=cursor
+            )
+            names.extend(activity.name for activity in page)
+            if cursor is None:
+                break
+        self.assertEqual(names, ["a", "c", "d", "b", "f", "e"])
+
+
+@pytest.mark.usefixtures("sqlite_db")
+class TestQueryActivities(unittest.TestCase):
+
+    def setUp(self):
+        for name, type_id, user_id, start in [
+            ("Morning run", 1, 1, "2024-04-01 07:00:00"),
+            ("Math", 4, 1, "2024-04-01 10:00:00"),
+            ("Mobile app", 7, 1, "2024-04-02 10:00:00"),
+            ("Morning_swim", 1, 1, "2024-04-03 07:00:00"),
+            ("Morning run", 1, 2, "2024-04-01 07:00:00"),
+        ]:
+            create_activity(
+                self.db,
+                schemas.ActivityCreate(
+                    name=name,
+                    description="",
+                    type_id=type_id,
+                    user_id=user_id,
+                    start_time=start,
+                    end_time=start,
+                    duration="00:10:00",
+                ),
+            )
+
+    def names(self, **filters):
+        page, _ = query_activities(self.db, 1, order="asc", **filters)
+        return [activity.name for activity in page]
+
+    def test_type_ids(self):
+        self.assertEqual(
+            self.names(type_ids=[1]), ["Morning run", "Morning_swim"]
+        )
+        self.assertEqual(self.names(type_ids=[4, 7]), ["Math", "Mobile app"])
+        self.assertEqual(self.names(type_ids=[]), [])
+
+    def test_type_filter_keeps_user_filter(self):
+        page, _ = query_activities(self.db, 2, type_ids=[1])
+        self.assertEqual([activity.user_id for activity in page], [2])
+
+    def test_combined_filters(self):
+        self.assertEqual(
+            self.names(
+                type_ids=[1, 7],
+                date_from=date(2024, 4, 1),
+                date_to=date(2024, 4, 3),
+                name_prefix="Mo",
+            ),
+            ["Morning run", "Mobile app"],
+        )
+
+    def test_name_prefix_escapes_wildcards(self):
+        self.assertEqual(self.names(name_prefix="Morning_"), ["Morning_swim"])
+        self.assertEqual(self.names(name_prefix="%"), [])
+
+
+def new_activity(name, user_id=1):
+    return schemas.ActivityCreate(
+        name=name,
+        description="",
+        type_id=1,
+        user_id=user_id,
+        start_time="2024-04-01 10:00:00",
+        end_time="2024-04-01 10:00:00",
+        duration="00:10:00",
+    )
+
+
+@pytest.mark.usefixtures("sqlite_db")
+class TestBatchActivities(unittest.TestCase):
+
+    def setUp(self):
+        self.created = create_activities(
+            self.db,
+            [
+                new_activity(name, user_id)
+                for name, user_id in [("a", 1), ("b", 1), ("c", 2)]
+            ],
+        )
+
+    def stats(self, user_id=1):
+        stats = get_activity_stats(self.db, user_id)
+        return stats.total_seconds, stats.count
+
+    def test_create_activities(self):
+        self.assertEqual([a.name for a in self.created], ["a", "b", "c"])
+        self.assertTrue(all(a.id for a in self.created))
+        self.assertEqual(self.stats(), (1200, 2))
+
+    def test_create_activities_inserts_in_one_statement(self):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", record)
+        names = [f"batch {index}" for index in range(6)]
+        created = create_activities(
+            self.db, [new_activity(name) for name in names]
+        )
+        inserts = [s for s in statements if s.startswith('INSERT INTO "Activity"')]
+        self.assertEqual(len(inserts), 1)
+        found = get_activities_by_ids(self.db, 1, [a.id for a in created])
+        self.assertEqual([found[a.id].name for a in created], names)
+
+    def test_get_activities_by_ids_is_scoped_to_user(self):
+        ids = [activity.id for activity in self.created] + [999]
+        found = get_activities_by_ids(self.db, 1, ids)
+        self.assertEqual(sorted(a.name for a in found.values()), ["a", "b"])
+
+    def test_update_activities_partial(self):
+        first, _, other = self.created
+        updated = update_activities(
+            self.db,
+            1,
+            [
+                schemas.ActivityPatch(id=first.id, duration="01:00:00"),
+                schemas.ActivityPatch(id=other.id, name="stolen"),
+            ],
+        )
+        self.assertEqual(list(updated), [first.id])
+        self.assertEqual(updated[first.id].name, "a")
+        self.assertEqual(updated[first.id].duration_seconds, 3600)
+        self.assertEqual(self.stats(), (4200, 2))
+        self.assertEqual(get_activity(self.db, other.id).name, "c")
+
+    def test_delete_activities(self):
+        first, _, other = [activity.id for activity in self.created]
+        deleted = delete_activities(self.db, 1, [first, other, 999])
+        self.assertEqual(deleted, {first})
+        self.assertIsNone(get_activity(self.db, first))
+        self.assertIsNotNone(get_activity(self.db, other))
+        self.assertEqual(self.stats(), (600, 1))
+        self.assertEqual(delete_activities(self.db, 1, [999]), set())
+
+    def test_writes_bump_data_version(self):
+        first, _, other = [activity.id for activity in self.created]
+        self.assertEqual(get_data_version(self.db, 1), 1)
+        self.assertEqual(get_data_version(self.db, 3), 0)
+        update_activity(
+            self.db, first, schemas.ActivityUpdate(name="x", type_id=1)
+        )
+        self.assertEqual(get_data_version(self.db, 1), 2)
+        update_activities(self.db, 1, [schemas.ActivityPatch(id=other)])
+        delete_activity(self.db, first)
+        self.assertEqual(get_data_version(self.db, 1), 3)
+        self.assertEqual(get_data_version(self.db, 2), 1)
+
+
+class TestAsyncActivityFunctions(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=StaticPool
+        )
+        async with self.engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        self.db = AsyncSession(self.engine, expire_on_commit=False)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    def activity(self, name, start="2024-04-01 10:00:00"):
+        return schemas.ActivityCreate(
+            name=name,
+            description="",
+            type_id=1,
+            user_id=1,
+            start_time=start,
+            end_time=start,
+            duration="00:30:00",
+        )
+
+    async def test_create_and_get_activity(self):
+        created = await create_activity_async(self.db, self.activity("run"))
+        activity = await get_activity_async(self.db, created.id)
+        self.assertEqual(activity.name, "run")
+        self.assertEqual(activity.duration_seconds, 1800)
+
+    async def test_query_and_stats(self):
+        await create_activity_async(self.db, self.activity("run"))
+        await create_activity_async(
+            self.db, self.activity("swim", "2024-04-02 10:00:00")
+        )
+        page, next_cursor = await query_activities_async(
+            self.db, 1, order="asc", limit=1
+        )
+        self.assertEqual([activity.name for activity in page], ["run"])
+        self.assertIsNotNone(next_cursor)
+
+        stats = await get_activity_stats_async(self.db, 1)
+        self.assertEqual(stats.total_seconds, 3600)
+        self.assertEqual(stats.count, 2)
+
+    async def test_update_and_delete_activity(self):
+        created = await create_activity_async(self.db, self.activity("run"))
+        update = schemas.ActivityUpdate(**self.activity("walk").dict())
+        updated = await update_activity_async(self.db, created.id, update)
+        self.assertEqual(updated.name, "walk")
+
+        result = await delete_activity_async(self.db, created.id)
+        self.assertEqual(result, {"message": "Activity deleted successfully"})
+        self.assertIsNone(await get_activity_async(self.db, created.id))
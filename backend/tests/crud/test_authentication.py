@@ -2,9 +2,11 @@ import unittest
 from unittest.mock import patch
 import bcrypt
 import base64
+import pytest
 from sqlalchemy.orm import Session
 
 from backend.app import models
+from backend.app.hashing import PasswordHasher
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from backend.app.crud.authentication import (
@@ -12,6 +14,15 @@ from backend.app.crud.authentication import (
     get_user_username_password,
     get_username_from_token,
     create_access_token,
+    create_user_access_token,
+    get_principal_from_token,
+    revoke_user_tokens,
+    token_versions,
+    TokenVersionCache,
+    create_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    revoke_user_refresh_tokens,
     ALGORITHM,
     EXPIRE_TIME_MINUTES,
 )
@@ -63,3 +74,137 @@ class TestAuthenticationFunctions(unittest.TestCase):
         token = create_access_token(data)
         username = get_username_from_token(token)
         self.assertEqual(username, "test_user")
+
+    @patch("sqlalchemy.orm.Session.commit")
+    @patch("sqlalchemy.orm.Session.query")
+    def test_get_user_username_password_rehashes(self, mock_query, mock_commit):
+        old_hash = PasswordHasher(4, 0, 0).hash("test_password")
+        user_data = models.User(id=1, username="test_user", password=old_hash)
+        mock_query.return_value.filter.return_value.first.return_value = (
+            user_data
+        )
+        with patch(
+            "backend.app.crud.authentication.hasher", PasswordHasher(5, 0, 0)
+        ):
+            user = get_user_username_password(
+                self.db, "test_user", "test_password"
+            )
+
+        self.assertNotEqual(user.password, old_hash)
+        self.assertIn(b"$2b$05$", base64.b64decode(user.password))
+        mock_commit.assert_called_once()
+
+
+@pytest.mark.usefixtures("sqlite_db")
+class TestAccessTokens(unittest.TestCase):
+
+    def setUp(self):
+        token_versions.clear()
+        self.user = models.User(id=5, username="test_user", password=b"")
+        self.db.add(self.user)
+        self.db.commit()
+
+    def test_get_principal_from_token(self):
+        token = create_user_access_token(self.user)
+        principal = get_principal_from_token(self.db, token)
+        self.assertEqual(principal.id, 5)
+        self.assertEqual(principal.username, "test_user")
+
+    def test_get_principal_from_token_without_claims(self):
+        token = create_access_token({"sub": "test_user"})
+        self.assertIsNone(get_principal_from_token(self.db, token))
+
+    def test_get_principal_from_token_deleted_user(self):
+        token = create_user_access_token(self.user)
+        get_principal_from_token(self.db, token)
+        self.db.delete(self.user)
+        self.db.commit()
+        # Cached until the deleting request drops it
+        self.assertIsNotNone(get_principal_from_token(self.db, token))
+        token_versions.forget(5)
+        self.assertIsNone(get_principal_from_token(self.db, token))
+
+    def test_token_version_is_cached(self):
+        token = create_user_access_token(self.user)
+        get_principal_from_token(self.db, token)
+        with patch("sqlalchemy.orm.Session.query") as mock_query:
+            self.assertEqual(get_principal_from_token(self.db, token).id, 5)
+        mock_query.assert_not_called()
+
+    def test_token_version_cache_expires(self):
+        now = [0.0]
+        cache = TokenVersionCache(ttl=30, clock=lambda: now[0])
+        versions = iter([0, 1])
+        self.assertEqual(cache.get(5, lambda: next(versions)), 0)
+        now[0] = 29
+        self.assertEqual(cache.get(5, lambda: next(versions)), 0)
+        now[0] = 30
+        self.assertEqual(cache.get(5, lambda: next(versions)), 1)
+
+    def test_logout_drops_cached_version(self):
+        get_principal_from_token(self.db, create_user_access_token(self.user))
+        token = create_refresh_token(self.db, 5)
+        with patch.object(token_versions, "forget") as forget:
+            revoke_refresh_token(self.db, token)
+        forget.assert_called_once_with(5)
+
+    def test_revoke_user_tokens(self):
+        old_token = create_user_access_token(self.user)
+        revoke_user_tokens(self.db, 5)
+        self.assertIsNone(get_principal_from_token(self.db, old_token))
+
+        self.db.refresh(self.user)
+        self.assertEqual(self.user.token_version, 1)
+        new_token = create_user_access_token(self.user)
+        self.assertEqual(get_principal_from_token(self.db, new_token).id, 5)
+
+
+@pytest.mark.usefixtures("sqlite_db")
+class TestRefreshTokens(unittest.TestCase):
+
+    def setUp(self):
+        self.db.add(models.User(id=1, username="test_user", password=b""))
+        self.db.commit()
+
+    def test_token_is_stored_hashed(self):
+        token = create_refresh_token(self.db, 1)
+        stored = self.db.query(models.RefreshToken).one()
+        self.assertNotEqual(stored.token_hash, token)
+        self.assertEqual(len(stored.token_hash), 64)
+
+    def test_rotate_refresh_token(self):
+        token = create_refresh_token(self.db, 1)
+        user, new_token = rotate_refresh_token(self.db, token)
+        self.assertEqual(user.id, 1)
+        self.assertNotEqual(new_token, token)
+        user, _ = rotate_refresh_token(self.db, new_token)
+        self.assertEqual(user.username, "test_user")
+
+    def test_rotate_unknown_token(self):
+        self.assertIsNone(rotate_refresh_token(self.db, "unknown"))
+
+    def test_rotate_expired_token(self):
+        token = create_refresh_token(self.db, 1)
+        stored = self.db.query(models.RefreshToken).one()
+        stored.expires_at = datetime(2000, 1, 1)
+        self.db.commit()
+        self.assertIsNone(rotate_refresh_token(self.db, token))
+
+    def test_reuse_revokes_family(self):
+        token = create_refresh_token(self.db, 1)
+        _, new_token = rotate_refresh_token(self.db, token)
+        self.assertIsNone(rotate_refresh_token(self.db, token))
+        self.assertIsNone(rotate_refresh_token(self.db, new_token))
+
+    def test_revoke_refresh_token(self):
+        token = create_refresh_token(self.db, 1)
+        self.assertTrue(revoke_refresh_token(self.db, token))
+        self.assertIsNone(rotate_refresh_token(self.db, token))
+        self.assertFalse(revoke_refresh_token(self.db, "unknown"))
+
+    def test_revoke_user_refresh_tokens(self):
+        first = create_refresh_token(self.db, 1)
+        second = create_refresh_token(self.db, 1)
+        revoke_user_refresh_tokens(self.db, 1)
+        self.assertIsNone(rotate_refresh_token(self.db, first))
+        self.assertIsNone(rotate_refresh_token(self.db, second))
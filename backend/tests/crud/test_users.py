@@ -1,6 +1,8 @@
 import unittest
 from unittest.mock import patch, ANY
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 import base64
 from backend.app import models
 from backend.app.schemas import users as schemas
@@ -13,7 +15,13 @@ from backend.app.crud.users import (
     create_user,
     update_user,
     delete_user,
+    create_user_async,
+    get_user_async,
+    get_user_by_username_async,
+    get_users_async,
+    delete_user_async,
 )
+from backend.app.hashing import hasher
 
 
 class TestUserFunctions(unittest.TestCase):
@@ -161,3 +169,46 @@ class TestUserFunctions(unittest.TestCase):
         mock_query.return_value.filter.return_value.first.return_value = None
         response = delete_user(self.db, 1)
         self.assertEqual(response, {"message": "User not found"})
+
+
+class TestAsyncUserFunctions(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(
+            "sqlite+aiosqlite://", poolclass=StaticPool
+        )
+        async with self.engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        self.db = AsyncSession(self.engine, expire_on_commit=False)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def test_create_and_get_user(self):
+        user = await create_user_async(
+            self.db,
+            schemas.UserCreate(
+                email="test@example.com", username="test", password="secret"
+            ),
+        )
+        self.assertTrue(hasher.verify("secret", user.password))
+        self.assertEqual((await get_user_async(self.db, user.id)).id, user.id)
+        found = await get_user_by_username_async(self.db, "test")
+        self.assertEqual(found.email, "test@example.com")
+        self.assertEqual(len(await get_users_async(self.db)), 1)
+
+        result = await delete_user_async(self.db, user.id)
+        self.assertEqual(result, {"message": "User deleted successfully"})
+        self.assertEqual(await get_users_async(self.db), [])
+
+    async def test_deleted_user_id_is_not_reused(self):
+        def new_user(name):
+            return schemas.UserCreate(
+                email=f"{name}@example.com", username=name, password="secret"
+            )
+
+        first = await create_user_async(self.db, new_user("first"))
+        await delete_user_async(self.db, first.id)
+        second = await create_user_async(self.db, new_user("second"))
+        self.assertGreater(second.id, first.id)
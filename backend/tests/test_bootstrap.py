@@ -0,0 +1,124 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.app import bootstrap, migrations, models
+from backend.app.registry import ActivityTypeRegistry
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    yield engine
+    engine.dispose()
+
+
+def type_names(engine):
+    table = models.ActivityType.__table__
+    with engine.connect() as conn:
+        query = select(table.c.name).order_by(table.c.id)
+        return list(conn.execute(query).scalars())
+
+
+def test_prepare_database_creates_schema_and_seeds(engine):
+    version = bootstrap.prepare_database(engine)
+
+    assert version == migrations.MIGRATIONS[-1].VERSION
+    assert inspect(engine).has_table("User_Data_Versions")
+    assert type_names(engine) == [
+        row["name"] for row in bootstrap.ACTIVITY_TYPES
+    ]
+    assert bootstrap.get_seed_version(engine) == bootstrap.SEED_VERSION
+
+
+def test_seed_is_skipped_while_version_matches(engine, monkeypatch):
+    bootstrap.prepare_database(engine)
+    assert not bootstrap.seed_activity_types(engine)
+
+    renamed = [dict(row) for row in bootstrap.ACTIVITY_TYPES]
+    renamed[0]["name"] = "Sports"
+    monkeypatch.setattr(bootstrap, "ACTIVITY_TYPES", renamed)
+    assert not bootstrap.seed_activity_types(engine)
+    assert type_names(engine)[0] == "Sport"
+
+    monkeypatch.setattr(bootstrap, "SEED_VERSION", 2)
+    assert bootstrap.seed_activity_types(engine)
+    assert type_names(engine)[0] == "Sports"
+    assert len(type_names(engine)) == 8
+
+
+def test_seeding_reloads_the_registry(engine, monkeypatch):
+    registry = ActivityTypeRegistry()
+    monkeypatch.setattr(bootstrap, "registry", registry)
+    bootstrap.prepare_database(engine)
+    with Session(engine) as db:
+        registry.load(db)
+    assert registry.get(1).name == "Sport"
+
+    renamed = [dict(row) for row in bootstrap.ACTIVITY_TYPES]
+    renamed[0]["name"] = "Sports"
+    monkeypatch.setattr(bootstrap, "ACTIVITY_TYPES", renamed)
+    monkeypatch.setattr(bootstrap, "SEED_VERSION", 2)
+    bootstrap.seed_activity_types(engine)
+    assert registry.is_stale
+    with Session(engine) as db:
+        registry.load(db)
+    assert registry.get(1).name == "Sports"
+
+
+def test_importing_the_app_does_not_touch_the_database(tmp_path):
+    path = tmp_path / "untouched.db"
+    code = "import backend.app.main, backend.app.cli"
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        cwd=Path(__file__).parents[2],
+        env={"SQLALCHEMY_DATABASE_URL": f"sqlite:///{path}"},
+    )
+    assert not path.exists()
+
+
+def test_workers_prepare_the_database_one_at_a_time(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    upgrade = migrations.upgrade
+    active = []
+    overlaps = []
+
+    def slow_upgrade(engine):
+        active.append(engine)
+        overlaps.append(len(active))
+        time.sleep(0.05)
+        try:
+            return upgrade(engine)
+        finally:
+            active.remove(engine)
+
+    monkeypatch.setattr(bootstrap.migrations, "upgrade", slow_upgrade)
+
+    errors = []
+
+    def worker():
+        engine = create_engine(url)
+        try:
+            bootstrap.prepare_database(engine)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            engine.dispose()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert overlaps == [1, 1, 1]
+    engine = create_engine(url)
+    assert len(type_names(engine)) == 8
+    engine.dispose()
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.app import models
+from backend.app.cache import (
+    MISSING,
+    MemoryBackend,
+    ResultCache,
+    SQLiteBackend,
+    result_cache,
+)
+from backend.app.crud import activities as crud
+from backend.app.schemas import activities as schemas
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_backend_lru_and_ttl():
+    clock = Clock()
+    backend = MemoryBackend(max_entries=2, ttl=10, clock=clock)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == (1, 0)
+    # "b" is now the least recently used
+    assert backend.set("c", 3) == 1
+    assert backend.get("b") == (MISSING, 0)
+    clock.now += 10
+    assert backend.get("a") == (MISSING, 1)
+    assert len(backend) == 1
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache" / "cache.db")
+    clock = Clock()
+    first = SQLiteBackend(path, max_entries=2, ttl=10, clock=clock)
+    second = SQLiteBackend(path, max_entries=2, ttl=10, clock=clock)
+    first.set("a", b'{"rows":[1,2]}')
+    assert second.get("a") == (b'{"rows":[1,2]}', 0)
+    clock.now += 1
+    second.set("b", b"2")
+    clock.now += 1
+    assert second.set("c", b"3") == 1
+    assert first.get("a") == (MISSING, 0)
+    clock.now += 10
+    assert first.get("c") == (MISSING, 1)
+
+
+def test_sqlite_backend_needs_private_directory(tmp_path):
+    path = tmp_path / "cache" / "cache.db"
+    SQLiteBackend(str(path), max_entries=2, ttl=10)
+    assert os.stat(path.parent).st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(ValueError):
+        SQLiteBackend(str(shared / "cache.db"), max_entries=2, ttl=10)
+
+
+def test_sqlite_backend_busy_file_is_a_miss(tmp_path):
+    path = str(tmp_path / "cache" / "cache.db")
+    backend = SQLiteBackend(path, max_entries=2, ttl=10)
+    backend.set("a", b"1")
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        assert backend.get("a") == (MISSING, 0)
+        assert backend.set("b", b"2") == 0
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert backend.get("a") == (b"1", 0)
+
+
+def test_sqlite_cache_round_trips_pages_and_stats(tmp_path):
+    backend = SQLiteBackend(
+        str(tmp_path / "cache" / "cache.db"), max_entries=10, ttl=60
+    )
+    cache = ResultCache(backend)
+    page = (
+        [
+            crud.ActivityRecord(
+                1, "run", 1, 1, "", "", "", "", datetime(2024, 4, 1, 10)
+            ),
+            crud.ActivityRecord(2, "nap", 3, 1, "", "", "", "", None),
+        ],
+        "cursor",
+    )
+    stats = schemas.ActivityStats(
+        date_from=date(2024, 4, 1),
+        date_to=None,
+        total_seconds=60,
+        count=1,
+        by_type=[],
+        by_day=[],
+    )
+    for value, dump, load in [
+        (page, crud.dump_page, crud.load_page),
+        (stats, schemas.ActivityStats.dict, schemas.ActivityStats.parse_obj),
+    ]:
+        key = type(value).__name__
+        cache.get_or_compute(key, lambda: value, dump, load)
+        assert cache.get_or_compute(key, None, dump, load) == value
+    assert cache.stats()["hits"] == 2
+
+
+def test_cached_keys_on_version():
+    versions = {1: 1}
+    calls = []
+
+    def read(db, user_id, limit=None):
+        calls.append((user_id, limit))
+        return len(calls)
+
+    cache = ResultCache(MemoryBackend(max_entries=10, ttl=60))
+    cached = cache.cached(read, lambda db, user_id: versions.get(user_id, 0))
+    assert cached(None, 1, limit=5) == 1
+    assert cached(None, 1, limit=5) == 1
+    assert cached(None, 1, limit=6) == 2
+    assert cached(None, 2, limit=5) == 3
+    versions[1] = 2
+    assert cached(None, 1, limit=5) == 4
+    assert cached(None, 2, limit=5) == 3
+    # A version the caller already read is used as is
+    assert cached(None, 1, limit=5, known_version=1) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 4, 4)
+
+
+def test_disabled_cache_always_computes():
+    cache = ResultCache(None)
+    cached = cache.cached(lambda db, user_id: object(), lambda db, u: 0)
+    assert cached(None, 1) is not cached(None, 1)
+    assert cache.stats() == {"backend": None}
+
+
+def test_writes_invalidate_cached_listing():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+
+            async def names(user_id=1):
+                page, _ = await crud.query_activities_async(db, user_id)
+                return [activity.name for activity in page]
+
+            def activity(name, user_id=1):
+                return schemas.ActivityCreate(
+                    name=name,
+                    description="",
+                    type_id=1,
+                    user_id=user_id,
+                    start_time="2024-04-01 10:00:00",
+                    end_time="2024-04-01 10:10:00",
+                    duration="00:10:00",
+                )
+
+            await crud.create_activity_async(db, activity("a"))
+            await crud.create_activity_async(db, activity("x", user_id=2))
+            assert await names() == ["a"]
+            assert await names(2) == ["x"]
+            hits = result_cache.stats()["hits"]
+            assert await names() == ["a"]
+            assert result_cache.stats()["hits"] == hits + 1
+
+            await crud.create_activity_async(db, activity("b"))
+            assert sorted(await names()) == ["a", "b"]
+            # The other user's entry survives the write
+            assert await names(2) == ["x"]
+            assert result_cache.stats()["hits"] == hits + 2
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("name", ["memory", "sqlite", "none"])
+def test_make_backend(name, monkeypatch, tmp_path):
+    from backend.app import cache
+
+    path = str(tmp_path / "cache" / "c.db")
+    monkeypatch.setattr(cache, "RESULT_CACHE_PATH", path)
+    backend = cache.make_backend(name)
+    assert (backend is None) == (name == "none")
+    with pytest.raises(ValueError):
+        cache.make_backend("redis")
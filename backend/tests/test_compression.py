@@ -0,0 +1,119 @@
+import gzip
+import zlib
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.app.middleware import compression
+from backend.app.middleware.compression import (
+    ENCODERS,
+    CompressionMiddleware,
+    GzipStream,
+    negotiate,
+    zstandard,
+)
+
+BODY = "activity description " * 200
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=1000,
+        levels={"gzip": 6, "zstd": 3},
+        threadpool_size=len(BODY),
+    )
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(
+            (f"line {index}\n" for index in range(1000)),
+            media_type="application/x-ndjson",
+        )
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip;q=0.5, br", "gzip"),
+        ("gzip;q=0", None),
+        ("identity", None),
+        ("*", next(iter(ENCODERS))),
+        ("*;q=0.1, gzip;q=0", "zstd" if zstandard else None),
+        ("", None),
+    ],
+)
+def test_negotiate(header, expected):
+    assert negotiate(header, ENCODERS) == expected
+
+
+def test_large_response_is_gzipped(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert int(response.headers["Content-Length"]) < len(BODY) / 10
+    assert response.text == BODY
+
+
+def test_small_or_unaccepted_response_is_not_compressed(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"v1"'
+
+
+def test_streaming_response_is_compressed_in_chunks(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert response.text.splitlines()[-1] == "line 999"
+
+
+def test_gzip_stream_flushes_every_chunk():
+    stream = GzipStream(6)
+    first = stream.write(b"a" * 100, final=False)
+    rest = stream.write(b"b" * 100, final=True)
+    # A sync flush makes the first chunk decodable on its own
+    assert gzip.decompress(first + rest) == b"a" * 100 + b"b" * 100
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(first) == b"a" * 100
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+def test_zstd_preferred(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, zstd"})
+    assert response.headers["Content-Encoding"] == "zstd"
+    # Decoded by urllib3, which supports zstd when zstandard is installed
+    assert response.text == BODY
+
+
+def test_large_bodies_are_compressed_in_threadpool(client):
+    with patch.object(
+        compression,
+        "run_in_threadpool",
+        wraps=compression.run_in_threadpool,
+    ) as run_in_threadpool:
+        large = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        assert run_in_threadpool.call_count == 1
+        # Streamed lines are far below the threshold
+        client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert run_in_threadpool.call_count == 1
+    assert large.text == BODY
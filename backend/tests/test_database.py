@@ -0,0 +1,139 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from backend.app import metrics
+from backend.app.database import (
+    SQLITE_PRAGMAS,
+    async_engine,
+    async_database_url,
+    database_status,
+    engine_options,
+    get_async_db,
+    make_async_engine,
+    make_engine,
+    pool_stats,
+)
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("sqlite:///./test.db", "sqlite+aiosqlite:///./test.db"),
+        (
+            "postgresql://user:secret@db:5432/app",
+            "postgresql+asyncpg://user:secret@db:5432/app",
+        ),
+        (
+            "postgresql+psycopg2://user@db/app",
+            "postgresql+asyncpg://user@db/app",
+        ),
+    ],
+)
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_async_database_url_unknown_dialect():
+    with pytest.raises(ValueError):
+        async_database_url("oracle://db/app")
+
+
+def test_get_async_db():
+    async def run():
+        db_gen = get_async_db()
+        db = await db_gen.__anext__()
+        assert db is not None
+        # The session is closed once the generator is exhausted
+        with pytest.raises(StopAsyncIteration):
+            await db_gen.__anext__()
+
+    asyncio.run(run())
+
+
+def test_get_async_db_rolls_back_on_error():
+    async def run():
+        db_gen = get_async_db()
+        db = await db_gen.__anext__()
+        with patch.object(db, "rollback", AsyncMock()) as rollback:
+            with pytest.raises(RuntimeError):
+                await db_gen.athrow(RuntimeError("handler failed"))
+        rollback.assert_awaited_once()
+
+    asyncio.run(run())
+
+
+def test_get_async_db_counts_pool_timeouts():
+    labels = (async_engine.dialect.driver,)
+    before = metrics.db_pool_timeouts.values().get(labels, 0)
+
+    async def run():
+        db_gen = get_async_db()
+        await db_gen.__anext__()
+        with pytest.raises(exc.TimeoutError):
+            await db_gen.athrow(exc.TimeoutError("pool exhausted"))
+
+    asyncio.run(run())
+    assert metrics.db_pool_timeouts.values()[labels] - before == 1
+
+
+def test_engine_options_postgres():
+    options = engine_options("postgresql://user@db/app")
+    assert options["pool_size"] > 0
+    assert options["pool_pre_ping"] in (True, False)
+    assert "pool_recycle" in options
+
+
+def test_engine_options_sqlite():
+    options = engine_options("sqlite:///./app.db")
+    assert issubclass(options["poolclass"], QueuePool)
+    assert options["connect_args"] == {"check_same_thread": False}
+    assert "pool_pre_ping" not in options
+    async_options = engine_options("sqlite+aiosqlite:///./app.db", True)
+    assert issubclass(async_options["poolclass"], AsyncAdaptedQueuePool)
+    assert engine_options("sqlite://") == {}
+
+
+def read_pragmas(conn):
+    return {
+        name: conn.execute(text(f"PRAGMA {name}")).scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout")
+    }
+
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    try:
+        with engine.connect() as conn:
+            pragmas = read_pragmas(conn)
+        assert pragmas["journal_mode"] == SQLITE_PRAGMAS["journal_mode"].lower()
+        assert pragmas["synchronous"] == 1  # NORMAL
+        assert pragmas["busy_timeout"] == SQLITE_PRAGMAS["busy_timeout"]
+        assert pool_stats(engine)["checkedin"] == 1
+    finally:
+        engine.dispose()
+
+
+def test_async_sqlite_pragmas_applied_on_connect(tmp_path):
+    async def run():
+        engine = make_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+        )
+        try:
+            async with engine.connect() as conn:
+                return await conn.run_sync(read_pragmas)
+        finally:
+            await engine.dispose()
+
+    pragmas = asyncio.run(run())
+    assert pragmas["journal_mode"] == SQLITE_PRAGMAS["journal_mode"].lower()
+    assert pragmas["busy_timeout"] == SQLITE_PRAGMAS["busy_timeout"]
+
+
+def test_database_status():
+    status = database_status()
+    assert set(status["engines"]) == {"sync", "async"}
+    assert "class" in status["engines"]["async"]
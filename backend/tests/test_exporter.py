@@ -0,0 +1,85 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.app import models
+from backend.app.exporter import COLUMNS, stream_activities
+from backend.app.importer import validate_record
+from backend.app.timeutils import typed_times
+
+
+@pytest.fixture
+def engine():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    def seed(conn):
+        models.Base.metadata.create_all(bind=conn)
+        conn.execute(
+            models.Activity.__table__.insert(),
+            [
+                {
+                    "name": name,
+                    "type_id": 1,
+                    "user_id": user_id,
+                    "start_time": start,
+                    "end_time": start,
+                    "duration": "00:10:00",
+                    "description": 'with "quotes", and commas',
+                    **typed_times(start, start, "00:10:00"),
+                }
+                for name, user_id, start in [
+                    ("late", 1, "2024-04-02 10:00:00"),
+                    ("early", 1, "2024-04-01 10:00:00"),
+                    ("other", 2, "2024-04-01 10:00:00"),
+                ]
+            ],
+        )
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(seed)
+
+    asyncio.run(setup())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+def export(engine, format, chunk_size=500):
+    async def collect():
+        return [
+            chunk
+            async for chunk in stream_activities(
+                engine, 1, format, chunk_size
+            )
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_csv_export(engine):
+    chunks = export(engine, "csv", chunk_size=1)
+    # Header first, then one chunk per partition
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [row["name"] for row in rows] == ["early", "late"]
+    assert tuple(rows[0]) == COLUMNS
+    assert rows[0]["description"] == 'with "quotes", and commas'
+
+
+def test_ndjson_export(engine):
+    lines = "".join(export(engine, "ndjson")).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["name"] for record in records] == ["early", "late"]
+    assert set(records[0]) == set(COLUMNS)
+
+
+def test_export_can_be_imported_again(engine):
+    text = "".join(export(engine, "csv"))
+    for record in csv.DictReader(io.StringIO(text)):
+        values = validate_record(record, user_id=3)
+        assert values["duration_seconds"] == 600
@@ -0,0 +1,60 @@
+import asyncio
+import base64
+
+import bcrypt
+import pytest
+
+from backend.app.hashing import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_inline():
+    hasher = PasswordHasher(rounds=4, workers=0, queue_size=0)
+    stored = hasher.hash("secret")
+    assert bcrypt.checkpw(b"secret", base64.b64decode(stored))
+    assert hasher.verify("secret", stored)
+    assert not hasher.verify("wrong", stored)
+    assert hasher.stats()["hashes"] == 3
+
+
+def test_needs_rehash_when_cost_changes():
+    stored = PasswordHasher(rounds=4, workers=0, queue_size=0).hash("secret")
+    assert not PasswordHasher(4, 0, 0).needs_rehash(stored)
+    assert PasswordHasher(5, 0, 0).needs_rehash(stored)
+    assert PasswordHasher(4, 0, 0).needs_rehash(base64.b64encode(b"junk"))
+
+
+def test_process_pool():
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=1)
+    try:
+        stored = hasher.hash("secret")
+        assert hasher.verify("secret", stored)
+        stats = hasher.stats()
+        assert stats["hashes"] == 2
+        assert stats["in_flight"] == 0
+        assert stats["latency_max_seconds"] > 0
+    finally:
+        hasher.shutdown()
+
+
+def test_async_process_pool():
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=1)
+
+    async def run():
+        stored = await hasher.hash_async("secret")
+        assert await hasher.verify_async("secret", stored)
+        assert not await hasher.verify_async("wrong", stored)
+
+    try:
+        asyncio.run(run())
+        assert hasher.stats()["hashes"] == 3
+        assert hasher.stats()["in_flight"] == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_rejects_when_queue_is_full():
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=0)
+    hasher._slots.acquire()
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("secret")
+    assert hasher.stats()["rejected"] == 1
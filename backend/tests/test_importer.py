@@ -0,0 +1,109 @@
+import io
+import json
+
+import pytest
+
+from backend.app import models
+from backend.app.crud.activities import get_activity_stats
+from backend.app.importer import (
+    _copy_field,
+    detect_format,
+    import_activities,
+    validate_record,
+)
+
+CSV = """name,type_id,start_time,end_time,duration,description
+run,1,2024-04-01 10:00:00,2024-04-01 11:00:00,01:00:00,park
+read,4,2024-04-01 20:00:00,2024-04-01 20:30:00,00:30:00,
+broken,not-a-number,2024-04-01 20:00:00,2024-04-01 20:30:00,00:30:00,
+music,99,2024-04-02 20:00:00,2024-04-02 20:30:00,00:30:00,
+swim,1,2024-04-02 10:00:00,2024-04-02 10:45:00,00:45:00,"pool, lane 2"
+"""
+
+
+@pytest.fixture
+def db(sqlite_db):
+    return sqlite_db
+
+
+def run_import(db, text, format, chunk_size=1000):
+    return list(
+        import_activities(
+            db, 1, io.StringIO(text), format, {1, 4}, chunk_size=chunk_size
+        )
+    )
+
+
+def test_detect_format():
+    assert detect_format("export.CSV") == "csv"
+    assert detect_format("export.ndjson") == "ndjson"
+    assert detect_format("export.jsonl") == "ndjson"
+    assert detect_format("export.xlsx") is None
+    assert detect_format(None) is None
+
+
+def test_validate_record_forces_user_and_types_times():
+    values = validate_record(
+        {
+            "name": "run",
+            "type_id": "1",
+            "user_id": 42,
+            "start_time": "2024-04-01 10:00:00",
+            "end_time": "2024-04-01 11:00:00",
+            "duration": "01:00:00",
+            "description": "",
+        },
+        user_id=1,
+    )
+    assert values["user_id"] == 1
+    assert values["type_id"] == 1
+    assert values["duration_seconds"] == 3600
+
+
+def test_import_csv(db):
+    reports = run_import(db, CSV, "csv")
+    chunk, summary = reports
+    assert chunk["imported"] == 3
+    assert [error["line"] for error in chunk["errors"]] == [4, 5]
+    assert "type_id" in chunk["errors"][0]["error"]
+    assert chunk["errors"][1]["error"] == "Unknown activity type: 99"
+    assert summary == {"done": True, "chunks": 1, "imported": 3, "failed": 2}
+
+    names = [activity.name for activity in db.query(models.Activity)]
+    assert names == ["run", "read", "swim"]
+    stats = get_activity_stats(db, 1)
+    assert stats.total_seconds == 8100
+    assert stats.count == 3
+
+
+def test_import_in_chunks(db):
+    reports = run_import(db, CSV, "csv", chunk_size=2)
+    assert [report.get("imported") for report in reports] == [2, 0, 1, 3]
+    assert reports[-1]["chunks"] == 3
+    assert db.query(models.Activity).count() == 3
+
+
+def test_import_ndjson(db):
+    record = {
+        "name": "run",
+        "type_id": 1,
+        "start_time": "2024-04-01 10:00:00",
+        "end_time": "2024-04-01 11:00:00",
+        "duration": "01:00:00",
+        "description": "",
+    }
+    text = "\n".join([json.dumps(record), "{oops", "", "[1, 2]"]) + "\n"
+    chunk, summary = run_import(db, text, "ndjson")
+    assert chunk["errors"] == [
+        {"line": 2, "error": "Invalid JSON"},
+        {"line": 4, "error": "Expected a JSON object"},
+    ]
+    assert summary["imported"] == 1
+    assert db.query(models.Activity).one().user_id == 1
+
+
+def test_copy_field():
+    assert _copy_field(None) == ""
+    assert _copy_field(3) == "3"
+    assert _copy_field("") == '""'
+    assert _copy_field('say "hi"') == '"say ""hi"""'
@@ -0,0 +1,76 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from backend.app.middleware.leaks import (
+    ConnectionLeakError,
+    PoolLeakDetector,
+    PoolLeakMiddleware,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'app.db'}",
+        poolclass=QueuePool,
+        connect_args={"check_same_thread": False},
+    )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def detector(engine):
+    detector = PoolLeakDetector()
+    detector.watch(engine)
+    return detector
+
+
+@pytest.fixture
+def client(detector, engine):
+    SessionLocal = sessionmaker(bind=engine)
+    leaked_sessions = []
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.add_middleware(PoolLeakMiddleware, detector=detector)
+
+    @app.get("/closed")
+    def closed(db=Depends(get_db)):
+        return db.execute(text("SELECT 1")).scalar()
+
+    @app.get("/leaked")
+    def leaked():
+        db = SessionLocal()
+        leaked_sessions.append(db)
+        return db.execute(text("SELECT 1")).scalar()
+
+    yield TestClient(app)
+    for db in leaked_sessions:
+        db.close()
+
+
+def test_session_closed_by_dependency_is_not_a_leak(detector, client):
+    with detector.expect_no_leaks():
+        assert client.get("/closed").json() == 1
+    assert detector.leaked == 0
+
+
+def test_unclosed_session_is_counted(detector, client):
+    with pytest.raises(ConnectionLeakError):
+        with detector.expect_no_leaks():
+            client.get("/leaked")
+    assert detector.leaked == 1
+    assert detector.stats()["recent"] == [
+        {"method": "GET", "path": "/leaked", "connections": 1}
+    ]
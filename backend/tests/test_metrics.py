@@ -0,0 +1,106 @@
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from backend.app import metrics
+from backend.app.database import make_engine
+from backend.app.middleware.metrics import MetricsMiddleware
+
+
+def test_counter_sums_thread_shards():
+    registry = metrics.MetricsRegistry()
+    counter = metrics.Counter(registry, "jobs_total", "Jobs.", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("b", amount=2)
+
+    assert counter.values() == {("a",): 4000, ("b",): 2}
+    assert 'jobs_total{kind="a"} 4000' in registry.render()
+
+
+def test_histogram_render():
+    registry = metrics.MetricsRegistry()
+    histogram = metrics.Histogram(
+        registry, "latency_seconds", "Latency.", ("route",), buckets=(0.1, 1)
+    )
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, '/say "hi"')
+    lines = registry.render().splitlines()
+    assert lines[:2] == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+    ]
+    label = 'route="/say \\"hi\\""'
+    assert f'latency_seconds_bucket{{{label},le="0.1"}} 2' in lines
+    assert f'latency_seconds_bucket{{{label},le="1"}} 3' in lines
+    assert f'latency_seconds_bucket{{{label},le="+Inf"}} 4' in lines
+    assert f"latency_seconds_count{{{label}}} 4" in lines
+
+
+def test_callback_metric_and_duplicates():
+    registry = metrics.MetricsRegistry()
+    metrics.CallbackMetric(
+        registry, "queue_depth", "Depth.", (), lambda: {(): 3}
+    )
+    assert "queue_depth 3" in registry.render()
+    try:
+        metrics.Gauge(registry, "queue_depth", "Again.")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate metric registered")
+
+
+def test_middleware_labels_route_templates():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    before = metrics.http_requests.values()
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    after = metrics.http_requests.values()
+
+    def delta(*labels):
+        return after.get(labels, 0) - before.get(labels, 0)
+
+    assert delta("GET", "/items/{item_id}", "200") == 2
+    assert delta("GET", "unmatched", "404") == 1
+    assert metrics.http_requests_in_flight.values().get((), 0) == 0
+
+
+def test_pool_events_record_checkouts(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    labels = ("pysqlite",)
+
+    def counts():
+        # Observation counts are the last item of a histogram entry
+        return (
+            metrics.db_pool_checkouts.values().get(labels, 0),
+            metrics.db_pool_checkout_duration.values().get(labels, [0])[-1],
+            metrics.db_pool_connect.values().get(labels, [0])[-1],
+        )
+
+    before = counts()
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    after = counts()
+    # Three checkouts and checkins, one new connection reused by all three
+    assert [a - b for a, b in zip(after, before)] == [3, 3, 1]
+    engine.dispose()
@@ -0,0 +1,143 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from backend.app import migrations
+from backend.app.migrations import v0001_typed_activity_times
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'CREATE TABLE "Activity" ('
+                "id INTEGER PRIMARY KEY, name VARCHAR(100), user_id INTEGER,"
+                " type_id INTEGER, duration VARCHAR(50),"
+                " start_time VARCHAR(50), end_time VARCHAR(50),"
+                " description VARCHAR(2000))"
+            )
+        )
+        conn.execute(
+            text(
+                'INSERT INTO "Activity" (id, name, user_id, type_id, duration,'
+                " start_time, end_time, description) VALUES"
+                " (1, 'run', 1, 1, '01:30:00', '2024-04-01 10:00:00',"
+                " '2024-04-01 11:30:00', ''),"
+                " (2, 'read', 1, 4, 'later', 'yesterday', '', ''),"
+                " (3, 'nap', 2, 3, '', '2024-04-02 13:00:00',"
+                " '2024-04-02 13:20:00', '')"
+            )
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_adds_columns_indexes_and_backfills(legacy_engine):
+    version = migrations.upgrade(legacy_engine)
+
+    assert version == migrations.MIGRATIONS[-1].VERSION
+    inspector = inspect(legacy_engine)
+    columns = {column["name"] for column in inspector.get_columns("Activity")}
+    assert {"started_at", "ended_at", "duration_seconds"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("Activity")}
+    assert "ix_activity_user_started_at" in indexes
+    assert "ix_activity_user_type_started_at" in indexes
+
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                'SELECT id, started_at, duration_seconds FROM "Activity"'
+                " ORDER BY id"
+            )
+        ).all()
+    assert rows[0].duration_seconds == 5400
+    assert rows[0].started_at.startswith("2024-04-01 10:00:00")
+    assert rows[1].started_at is None
+    assert rows[2].duration_seconds == 1200
+
+    with legacy_engine.connect() as conn:
+        rollups = conn.execute(
+            text(
+                "SELECT user_id, day, type_id, total_seconds, count"
+                ' FROM "Daily_Activity_Rollups" ORDER BY user_id'
+            )
+        ).all()
+    assert [tuple(row) for row in rollups] == [
+        (1, "2024-04-01", 1, 5400, 1),
+        (2, "2024-04-02", 3, 1200, 1),
+    ]
+
+
+def test_upgrade_is_recorded_once(legacy_engine):
+    migrations.upgrade(legacy_engine)
+    assert migrations.get_version(legacy_engine) == (
+        migrations.MIGRATIONS[-1].VERSION
+    )
+    # A second run is a no-op
+    assert migrations.upgrade(legacy_engine) == (
+        migrations.MIGRATIONS[-1].VERSION
+    )
+
+
+def test_backfill_works_in_chunks(legacy_engine):
+    v0001_typed_activity_times.add_columns(legacy_engine)
+    converted = v0001_typed_activity_times.backfill(
+        legacy_engine, chunk_size=1
+    )
+    assert converted == 2
+
+
+def test_upgrade_on_empty_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    assert migrations.upgrade(engine) == migrations.MIGRATIONS[-1].VERSION
+    engine.dispose()
+
+
+def test_upgrade_adds_token_version(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(
+            text(
+                'CREATE TABLE "Users" (id INTEGER PRIMARY KEY,'
+                " username VARCHAR(100), email VARCHAR(50),"
+                " password VARCHAR(200))"
+            )
+        )
+        conn.execute(text("INSERT INTO \"Users\" (id) VALUES (1)"))
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        version = conn.execute(
+            text('SELECT token_version FROM "Users" WHERE id = 1')
+        ).scalar()
+    assert version == 0
+
+
+def test_upgrade_stops_user_id_reuse(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(
+            text(
+                'CREATE TABLE "Users" (id INTEGER PRIMARY KEY,'
+                " username VARCHAR(100), email VARCHAR(50),"
+                " password VARCHAR(200))"
+            )
+        )
+        conn.execute(
+            text("INSERT INTO \"Users\" (id, username) VALUES (1, 'a')")
+        )
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.begin() as conn:
+        # Activity 3 belongs to user 2, deleted before the upgrade, so new
+        # ids start after 2; the deleted id 3 is not handed out again
+        conn.execute(text("INSERT INTO \"Users\" (username) VALUES ('b')"))
+        conn.execute(text('DELETE FROM "Users" WHERE id = 3'))
+        conn.execute(text("INSERT INTO \"Users\" (username) VALUES ('c')"))
+        rows = conn.execute(
+            text('SELECT id, username FROM "Users" ORDER BY id')
+        ).all()
+    assert [tuple(row) for row in rows] == [(1, "a"), (4, "c")]
+    indexes = {
+        index["name"] for index in inspect(legacy_engine).get_indexes("Users")
+    }
+    assert "ix_Users_username" in indexes
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from backend.app import models
+from backend.app.pagination import decode_cursor, encode_cursor, page_queries
+
+
+def test_cursor_round_trip():
+    started_at = datetime(2024, 4, 1, 10, 30)
+    assert decode_cursor(encode_cursor(started_at, 42)) == (started_at, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "WzEsMiwzXQ"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def query_plan(conn, statement) -> str:
+    compiled = statement.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return " ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("descending, bound", [(True, "<"), (False, ">")])
+def test_cursor_pages_seek_the_index(descending, bound):
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    activity = models.Activity.__table__.c
+    query = select(activity.id, activity.started_at).where(
+        activity.user_id == 1
+    )
+    cursor = encode_cursor(datetime(2024, 4, 1, 10, 30), 42)
+    dated, undated = page_queries(query, activity, cursor, descending)
+    with engine.connect() as conn:
+        dated_plan = query_plan(conn, dated.limit(51))
+        undated_plan = query_plan(conn, undated.limit(51))
+    # A range seek from the cursor, in index order (no sort)
+    assert "INDEX ix_activity_user_started_at (user_id=? AND " in dated_plan
+    assert f"started_at{bound}?)" in dated_plan
+    assert "ix_activity_user_started_at (user_id=? AND started_at=?)" in (
+        undated_plan
+    )
+    assert "TEMP B-TREE" not in dated_plan + undated_plan
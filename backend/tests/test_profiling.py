@@ -0,0 +1,116 @@
+import time
+from collections import Counter
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app import profiling
+from backend.app.api import profiling as profiling_api
+from backend.app.middleware.profiling import ProfilingMiddleware
+
+TOKEN = "profiling-secret"
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+LINE = busy_loop.__code__.co_firstlineno
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", TOKEN)
+    store = profiling.ProfileStore(str(tmp_path), keep=3)
+    monkeypatch.setattr(profiling_api, "profile_store", store)
+    return store
+
+
+@pytest.fixture
+def client(store):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=store, sample_rate=0)
+    app.include_router(profiling_api.router)
+
+    @app.get("/work")
+    def work():
+        busy_loop(0.1)
+        return "done"
+
+    return TestClient(app)
+
+
+def test_sampler_collects_collapsed_stacks():
+    sampler = profiling.StackSampler(interval=0.001).start()
+    busy_loop(0.1)
+    counts = sampler.stop()
+    busy = [stack for stack in counts if "busy_loop" in stack]
+    assert busy[0].startswith("MainThread;")
+    assert busy[0].endswith(f"busy_loop (test_profiling.py:{LINE})")
+    assert sum(counts[stack] for stack in busy) > 10
+    assert profiling.SAMPLER_THREAD_NAME not in profiling.render(counts)
+
+
+def test_store_keeps_newest_and_rejects_bad_names(store):
+    names = [
+        store.save(f"2024010{index}-abcd-GET-work", Counter({"a;b": 1}))
+        for index in range(5)
+    ]
+    assert store.list() == names[:1:-1]
+    assert store.read(names[-1]) == "a;b 1\n"
+    assert store.read("../secret.collapsed") is None
+    assert store.read(names[0]) is None
+
+
+def test_request_profiled_only_with_token(client, store):
+    response = client.get("/work")
+    assert "X-Profile-Id" not in response.headers
+    assert store.list() == []
+
+    response = client.get("/work", headers={"X-Profile-Token": TOKEN})
+    name = response.headers["X-Profile-Id"]
+    assert store.list() == [name]
+    profile = client.get(
+        f"/admin/profiles/{name}", headers={"X-Profile-Token": TOKEN}
+    )
+    assert "busy_loop" in profile.text
+    missing = client.get(
+        "/admin/profiles/missing.collapsed",
+        headers={"X-Profile-Token": TOKEN},
+    )
+    assert missing.status_code == 404
+
+
+def test_sampled_requests_are_stored_without_header(store):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=store, sample_rate=1)
+
+    @app.get("/work")
+    def work():
+        return "done"
+
+    response = TestClient(app).get("/work")
+    assert "X-Profile-Id" not in response.headers
+    assert len(store.list()) == 1
+
+
+def test_admin_routes_need_token(client):
+    assert client.get("/admin/profiles").status_code == 403
+    response = client.get(
+        "/admin/profiles", headers={"X-Profile-Token": "wrong"}
+    )
+    assert response.status_code == 403
+
+
+def test_profile_app_window(client, store):
+    response = client.post(
+        "/admin/profile?seconds=0.05", headers={"X-Profile-Token": TOKEN}
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Profile-Id"] in store.list()
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert count.isdigit()
@@ -0,0 +1,115 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from backend.app.middleware.queries import (
+    QueryTracer,
+    QueryTracingMiddleware,
+    RepeatedQueryError,
+    current_queries,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'app.db'}",
+        poolclass=QueuePool,
+        connect_args={"check_same_thread": False},
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def tracer(engine):
+    tracer = QueryTracer(slow_query_seconds=60)
+    tracer.watch(engine)
+    return tracer
+
+
+@pytest.fixture
+def client(tracer, engine):
+    app = FastAPI()
+    app.add_middleware(
+        QueryTracingMiddleware, tracer=tracer, server_timing=True
+    )
+    select_item = text("SELECT id FROM items WHERE id = :id")
+
+    @app.get("/once")
+    def once():
+        with engine.connect() as conn:
+            conn.execute(select_item, {"id": 1}).all()
+            conn.execute(text("SELECT count(*) FROM items")).scalar()
+        return [statement for statement, _ in current_queries().statements]
+
+    @app.get("/loop")
+    def loop():
+        with engine.connect() as conn:
+            for item_id in range(3):
+                conn.execute(select_item, {"id": item_id}).all()
+        return current_queries().count
+
+    @app.post("/bulk")
+    def bulk():
+        with engine.begin() as conn:
+            for start in (0, 10):
+                conn.execute(
+                    text("INSERT INTO items (id) VALUES (:id)"),
+                    [{"id": start + offset} for offset in range(5)],
+                )
+        return current_queries().count
+
+    return TestClient(app)
+
+
+def test_request_queries_and_server_timing(tracer, client):
+    with tracer.expect_no_repeats():
+        response = client.get("/once")
+    assert len(response.json()) == 2
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert timing.endswith('desc="2 queries"')
+
+
+def test_repeated_select_is_flagged(tracer, client):
+    with pytest.raises(RepeatedQueryError, match="/loop"):
+        with tracer.expect_no_repeats():
+            assert client.get("/loop").json() == 3
+    repeat = tracer.stats()["recent_repeats"][-1]
+    assert repeat["count"] == 3
+    assert repeat["statement"].startswith("SELECT id FROM items")
+
+
+def test_bulk_writes_are_not_repeats(tracer, client):
+    with tracer.expect_no_repeats():
+        assert client.post("/bulk").json() == 2
+
+
+def test_queries_outside_requests_are_not_recorded(tracer, engine):
+    assert current_queries() is None
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert current_queries() is None
+
+
+def test_slow_query_logged_with_plan(tracer, engine, caplog):
+    tracer.slow_query_seconds = 0
+    with engine.connect() as conn:
+        conn.execute(text("SELECT id FROM items WHERE id = :id"), {"id": 1})
+    slow = tracer.stats()["recent_slow"][-1]
+    assert slow["statement"] == "SELECT id FROM items WHERE id = ?"
+    assert any("USING INTEGER PRIMARY KEY" in line for line in slow["plan"])
+    assert "Slow query" in caplog.text
+
+
+def test_slow_query_without_plan_rows(tracer, engine, caplog):
+    tracer.slow_query_seconds = 0
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO items (id) VALUES (:id)"), {"id": 1})
+    assert tracer.stats()["recent_slow"][-1]["plan"] == []
+    assert "Plan:\n(empty)" in caplog.text
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from backend.app import models
+from backend.app import registry as registry_module
+from backend.app.registry import ActivityTypeRegistry
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db
+    session.add_all(
+        [
+            models.ActivityType(id=1, name="Sport", icon_name="sport.jpg"),
+            models.ActivityType(id=4, name="Study", icon_name="study.jpg"),
+        ]
+    )
+    session.commit()
+    return session
+
+
+def test_lookup_by_id_and_name(db):
+    registry = ActivityTypeRegistry()
+    assert registry.is_stale
+    registry.load(db)
+    assert not registry.is_stale
+    assert registry.get(1).name == "Sport"
+    assert registry.get_by_name("Study").id == 4
+    assert registry.get(99) is None
+    assert [type_.id for type_ in registry.all()] == [1, 4]
+
+
+def test_resolve(db):
+    registry = ActivityTypeRegistry()
+    registry.load(db)
+    assert registry.resolve(["Study", "1", 4]) == [4, 1, 4]
+    with pytest.raises(ValueError):
+        registry.resolve(["Juggling"])
+
+
+def test_lookups_do_not_query_after_load(db):
+    registry = ActivityTypeRegistry()
+    registry.load(db)
+    with patch.object(db, "query") as mock_query:
+        registry.resolve(["Sport"])
+        registry.get(4)
+    mock_query.assert_not_called()
+
+
+def test_invalidate_reloads_on_next_access(db):
+    registry = ActivityTypeRegistry()
+    registry.load(db)
+    db.add(models.ActivityType(id=9, name="Music", icon_name=""))
+    db.commit()
+    assert registry.get(9) is None
+
+    class AsyncSessionStub:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+        async def run_sync(self, function, *args):
+            return function(db, *args)
+
+    registry.invalidate()
+    with patch.object(registry_module, "registry", registry), patch.object(
+        registry_module, "AsyncSessionLocal", AsyncSessionStub
+    ):
+        types = asyncio.run(registry_module.get_activity_types())
+        assert types.get(9).name == "Music"
@@ -0,0 +1,60 @@
+import json
+
+from fastapi.openapi.utils import get_openapi
+
+from backend.app import models
+from backend.app.api import activities
+from backend.app.responses import (
+    ORJSONResponse,
+    etag_matches,
+    make_etag,
+    response_fields,
+    serialize_rows,
+)
+from backend.app.schemas import activities as schemas
+
+
+def activity(activity_id):
+    return models.Activity(
+        id=activity_id,
+        name=f"run {activity_id} — park",
+        type_id=1,
+        user_id=1,
+        start_time="2024-04-01 10:00:00",
+        end_time="2024-04-01 11:00:00",
+        duration="01:00:00",
+        description='"quoted"',
+    )
+
+
+def test_serialize_rows_matches_response_model():
+    rows = [activity(1), activity(2)]
+    fields = response_fields(schemas.Activity)
+    expected = [schemas.Activity.from_orm(row).dict() for row in rows]
+    assert json.loads(serialize_rows(rows, fields)) == expected
+
+
+def test_orjson_response_passes_bytes_through():
+    assert ORJSONResponse(b"[1]").body == b"[1]"
+    assert json.loads(ORJSONResponse({"a": [1, 2]}).body) == {"a": [1, 2]}
+
+
+def test_list_routes_keep_openapi_schema():
+    schema = get_openapi(
+        title="test", version="0", routes=activities.router.routes
+    )
+    content = schema["paths"]["/activities/"]["get"]["responses"]["200"][
+        "content"
+    ]["application/json"]
+    assert content["schema"]["items"]["$ref"].endswith("/Activity")
+
+
+def test_etag_matches():
+    etag = make_etag(1, 5, [("limit", "10")])
+    assert etag == make_etag(1, 5, [("limit", "10")])
+    assert etag != make_etag(1, 6, [("limit", "10")])
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+import pytest
+
+from backend.app.timeutils import (
+    day_bounds,
+    format_duration,
+    parse_datetime,
+    parse_duration,
+    typed_times,
+)
+
+
+def test_parse_datetime():
+    assert parse_datetime("2024-04-01 10:00:00") == datetime(2024, 4, 1, 10)
+    assert parse_datetime("2024-04-01T10:00:00+02:00") == datetime(
+        2024, 4, 1, 8
+    )
+    assert parse_datetime("12:30") is None
+    assert parse_datetime("") is None
+    assert parse_datetime(None) is None
+
+
+def test_parse_duration():
+    assert parse_duration("01:30:00") == 5400
+    assert parse_duration("1:30") == 90
+    assert parse_duration("45") == 45
+    assert parse_duration("xx:00") is None
+    assert parse_duration("1:2:3:4") is None
+    assert parse_duration(None) is None
+
+
+def test_format_duration():
+    assert format_duration(5400) == "01:30:00"
+    assert format_duration(0) == "00:00:00"
+
+
+def test_day_bounds():
+    start, end = day_bounds("2024-04-01")
+    assert start == datetime(2024, 4, 1)
+    assert end == datetime(2024, 4, 2)
+    assert day_bounds(date(2024, 4, 1)) == (start, end)
+    with pytest.raises(ValueError):
+        day_bounds("01.04.2024")
+
+
+def test_typed_times_falls_back_to_interval():
+    values = typed_times("2024-04-01 10:00:00", "2024-04-01 10:20:00", "")
+    assert values == {
+        "started_at": datetime(2024, 4, 1, 10),
+        "ended_at": datetime(2024, 4, 1, 10, 20),
+        "duration_seconds": 1200,
+    }
@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 from config import API_URL, GIT_INFO
+from utils.api import save_tokens
 
 st.set_page_config(
     page_title="InnoTrackify",
@@ -46,6 +47,9 @@ def login(username, password):
 if "session_token" not in st.session_state:
     st.session_state["session_token"] = None
 
+if "refresh_token" not in st.session_state:
+    st.session_state["refresh_token"] = None
+
 if "user_id" not in st.session_state:
     st.session_state["user_id"] = None
 
@@ -59,8 +63,7 @@ if choice == "Login":
         response = login(username, password)
         if "access_token" in response:
             print(response)
-            session_token = response["access_token"]
-            st.session_state["session_token"] = session_token
+            save_tokens(response)
             st.session_state["user_id"] = response["client_id"]
 
             # Redirect to another page or perform other actions
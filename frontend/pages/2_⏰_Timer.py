@@ -1,8 +1,7 @@
 import streamlit as st
 import time
 from utils.functions import format_time
-from config import API_URL
-import requests
+from utils.api import api_request
 from datetime import datetime
 from utils.functions import activity_types
 
@@ -23,7 +22,6 @@ def add_activity(
     duration,
     description,
 ):
-    url = f"{API_URL}/activities/"
     data = {
         "name": activity_name,
         "type_id": type_id,
@@ -38,8 +36,7 @@ def add_activity(
         "description": description,
     }
 
-    headers = {"Authorization": f"Bearer {st.session_state['session_token']}"}
-    response = requests.post(url, headers=headers, json=data)
+    response = api_request("POST", "/activities/", json=data)
     return response.json()
 
 
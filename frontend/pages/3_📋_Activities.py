@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-from config import API_URL
-import requests
+from utils.api import api_request, cached_request
+from datetime import date, timedelta
 from utils.functions import activity_types
 
 
@@ -14,11 +14,21 @@ if "activity_option" not in st.session_state:
 if "date_option" not in st.session_state:
     st.session_state["date_option"] = None
 
+# Cursors of the pages visited so far, the last one is the current page
+if "cursors" not in st.session_state:
+    st.session_state["cursors"] = [None]
+
 
 def update():
-    st.session_state["dataset"] = load_data(
-        st.session_state["activity_option"], st.session_state["date_option"]
-    )
+    st.session_state["cursors"] = [None]
+
+
+def next_page(cursor):
+    st.session_state["cursors"].append(cursor)
+
+
+def previous_page():
+    st.session_state["cursors"].pop()
 
 
 def get_activity_icon(activity_type):
@@ -27,6 +37,12 @@ def get_activity_icon(activity_type):
             return activity["icon_name"]
 
 
+def get_activity_name(activity_type):
+    for activity in activity_types:
+        if activity["id"] == activity_type:
+            return activity["name"]
+
+
 def form_dataframe(response):
     icons = []
     activity_names = []
@@ -61,8 +77,7 @@ if "session_token" not in st.session_state:
 
 if st.session_state["session_token"]:
 
-    def load_data(activity_option, date_option):
-        url = f"{API_URL}/activities/"
+    def load_data(activity_option, date_option, limit, cursor):
         data = None
 
         if activity_option == "All":
@@ -76,19 +91,21 @@ if st.session_state["session_token"]:
             else:
                 data = {"date": date_option, "type": activity_option}
 
-        headers = {
-            "Authorization": f"Bearer {st.session_state['session_token']}"
-        }
-        response = requests.put(url, headers=headers, params=data)
+        data["limit"] = limit
+        if cursor is not None:
+            data["cursor"] = cursor
+
+        activities, headers = cached_request("PUT", "/activities/", data)
 
-        return pd.DataFrame(form_dataframe(response.json()))
+        return (
+            pd.DataFrame(form_dataframe(activities)),
+            headers.get("X-Next-Cursor"),
+        )
 
-    def split_frame(input_df, rows):
-        df = [
-            input_df.loc[i: i + rows - 1, :]
-            for i in range(0, len(input_df), rows)
-        ]
-        return df
+    def load_stats(date_from, date_to):
+        params = {"date_from": date_from, "date_to": date_to}
+        response = api_request("GET", "/activities/stats", params=params)
+        return response.json()
 
     col1, col2 = st.columns([0.5, 0.5], gap="small")
 
@@ -117,31 +134,39 @@ if st.session_state["session_token"]:
             on_change=update,
         )
 
-    st.session_state["dataset"] = load_data(
-        st.session_state["activity_option"], st.session_state["date_option"]
-    )
     pagination = st.container()
 
-    bottom_menu = st.columns((4, 1.5, 1))
-    with bottom_menu[2]:
-        batch_size = st.selectbox("Page Size", options=[5, 10])
+    bottom_menu = st.columns((4, 1, 1, 1.5))
+    with bottom_menu[3]:
+        batch_size = st.selectbox(
+            "Page Size", options=[5, 10], on_change=update
+        )
+
+    current_page = len(st.session_state["cursors"])
+    st.session_state["dataset"], next_cursor = load_data(
+        st.session_state["activity_option"],
+        st.session_state["date_option"],
+        batch_size,
+        st.session_state["cursors"][-1],
+    )
+
     with bottom_menu[1]:
-        total_pages = (
-            int(len(st.session_state["dataset"]) / batch_size)
-            if int(len(st.session_state["dataset"]) / batch_size) > 0
-            else 1
+        st.button(
+            "Previous", on_click=previous_page, disabled=current_page == 1
         )
-        current_page = st.number_input(
-            "Page", min_value=1, max_value=total_pages, step=1
+    with bottom_menu[2]:
+        st.button(
+            "Next",
+            on_click=next_page,
+            args=(next_cursor,),
+            disabled=next_cursor is None,
         )
     with bottom_menu[0]:
-        st.markdown(f"Page **{current_page}** of **{total_pages}** ")
-
-    pages = split_frame(st.session_state["dataset"], batch_size)
+        st.markdown(f"Page **{current_page}**")
 
-    if pages:
+    if len(st.session_state["dataset"]):
         pagination.dataframe(
-            data=pages[current_page - 1],
+            data=st.session_state["dataset"],
             column_config={
                 "icon": st.column_config.ImageColumn(
                     "Icon",
@@ -171,5 +196,24 @@ if st.session_state["session_token"]:
             hide_index=True,
             use_container_width=True,
         )
+
+    st.subheader("Time spent in the last 7 days")
+    today = date.today()
+    stats = load_stats(today - timedelta(days=6), today + timedelta(days=1))
+    if stats.get("by_type"):
+        st.bar_chart(
+            pd.DataFrame(
+                {
+                    "activity": [
+                        get_activity_name(total["type_id"])
+                        for total in stats["by_type"]
+                    ],
+                    "hours": [
+                        total["total_seconds"] / 3600
+                        for total in stats["by_type"]
+                    ],
+                }
+            ).set_index("activity")
+        )
 else:
     st.error("Please, login to your user account.")
@@ -1,6 +1,5 @@
 import streamlit as st
-from config import API_URL
-import requests
+from utils.api import api_request
 from utils.functions import activity_types
 
 
@@ -20,7 +19,6 @@ def add_activity(
     duration,
     description,
 ):
-    url = f"{API_URL}/activities/"
     data = {
         "name": activity_name,
         "type_id": type_id,
@@ -31,8 +29,7 @@ def add_activity(
         "description": description,
     }
 
-    headers = {"Authorization": f"Bearer {st.session_state['session_token']}"}
-    response = requests.post(url, headers=headers, json=data)
+    response = api_request("POST", "/activities/", json=data)
     return response.json()
 
 
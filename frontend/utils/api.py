@@ -0,0 +1,73 @@
+import requests
+from requests.structures import CaseInsensitiveDict
+import streamlit as st
+from urllib3.util.request import ACCEPT_ENCODING
+from config import API_URL
+
+# Shared between reruns, so connections to the backend are reused
+session = requests.Session()
+# Accept every encoding urllib3 can decode: gzip always, zstd when the
+# zstandard package is installed. The backend compresses large responses.
+session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+
+def auth_headers():
+    return {"Authorization": f"Bearer {st.session_state['session_token']}"}
+
+
+def save_tokens(response):
+    st.session_state["session_token"] = response["access_token"]
+    st.session_state["refresh_token"] = response.get("refresh_token")
+
+
+# Exchange the refresh token for a new access token, without the password
+def refresh_tokens():
+    refresh_token = st.session_state.get("refresh_token")
+    if not refresh_token:
+        return False
+    response = session.post(
+        f"{API_URL}/token/refresh", json={"refresh_token": refresh_token}
+    )
+    if response.status_code != 200:
+        st.session_state["session_token"] = None
+        st.session_state["refresh_token"] = None
+        return False
+    save_tokens(response.json())
+    return True
+
+
+# Authorized request to the backend. An expired access token is refreshed
+# once and the request is repeated.
+def api_request(method, path, headers=None, **kwargs):
+    url = f"{API_URL}{path}"
+    extra = headers or {}
+    response = session.request(
+        method, url, headers={**auth_headers(), **extra}, **kwargs
+    )
+    if response.status_code == 401 and refresh_tokens():
+        response = session.request(
+            method, url, headers={**auth_headers(), **extra}, **kwargs
+        )
+    return response
+
+
+# Request that revalidates a cached response with If-None-Match. The
+# backend answers 304 while the user's data is unchanged, and the cached
+# body and headers are reused. Returns (json, headers).
+def cached_request(method, path, params=None):
+    cache = st.session_state.setdefault("etag_cache", {})
+    key = (method, path, tuple(sorted((params or {}).items())))
+    cached = cache.get(key)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    response = api_request(method, path, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        return cached["json"], cached["headers"]
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if response.status_code == 200 and etag:
+        cache[key] = {
+            "etag": etag,
+            "json": data,
+            "headers": CaseInsensitiveDict(response.headers),
+        }
+    return data, response.headers